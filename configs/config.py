@@ -15,9 +15,44 @@ class DatabaseConfig:
 class MLConfig:
     tfidf_max_features: int = 250
     tfidf_ngram_range: tuple = (1, 2)
+    sparse_features: bool = False
+    feature_mode: str = "tfidf"  # "tfidf" or "hashing"
+    hashing_n_features: int = 2 ** 18
+    feature_selection: str = "none"  # "none", "chi2" or "mutual_info"
+    selected_features: int = 150
+    feature_store: bool = False
+    feature_store_batch_size: int = 500
+    training_cap: int = 0  # 0 = train on every reviewed bug
+    training_recent_days: float = 30.0
+    training_half_life_days: float = 180.0
+    mmap_models: bool = True
+    embedding_dim: int = 0  # 0 = duplicate search on raw TF-IDF rows
+    per_project_models: bool = False
+    project_model_cache_size: int = 8
+    shadow_mode: bool = False
+    lazy_rescoring: bool = False
+    rescore_batch_size: int = 500
+    prediction_cache: bool = False  # skipped in hashing mode, where every upload changes the key
+    prediction_cache_max_rows: int = 100_000
     duplicate_threshold: float = 0.92
+    duplicate_block_size: int = 1024
+    cross_cycle_duplicates: bool = False
+    duplicate_mode: str = "exact"  # "exact" or "lsh"
+    duplicate_clustering: bool = False
+    minhash_num_perm: int = 128
+    minhash_bands: int = 32
+    stack_trace_frames: int = 5
     confidence_threshold: float = 0.60
     retrain_override_count: int = 50
+    incremental_learning: bool = False
+    incremental_learning_rate: float = 0.01
+    incremental_batch_size: int = 10  # pending overrides folded together
+    full_retrain_days: int = 7
+    fast_training: bool = False
+    training_n_jobs: int = -1
+    compiled_inference: bool = False
+    cascade_inference: bool = False
+    cascade_margin: float = 0.5
     model_dir: Path = field(default_factory=lambda: BASE_DIR / "data" / "models")
     classification_labels: list = field(
         default_factory=lambda: ["valid", "invalid", "duplicate", "enhancement", "wont_fix"]
@@ -84,6 +119,7 @@ class AppConfig:
     debug: bool = True
     templates_dir: Path = field(default_factory=lambda: BASE_DIR / "templates")
     static_dir: Path = field(default_factory=lambda: BASE_DIR / "static")
+    finished_jobs_kept: int = 100
 
 
 @dataclass
@@ -0,0 +1,170 @@
+"""Offline evaluation reports for tuning the ML pipeline."""
+import sys
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from configs.config import config
+from src.db import crud
+from src.db.database import SessionLocal
+from src.ml.evaluation import (
+    feature_selection_report, load_labeled_csv, lsh_recall, threshold_sweep, training_cap_report,
+)
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug, preprocess_bug_pair
+from src.ml.training_set import review_ages
+
+SYNTHETIC_DIR = Path(__file__).parent / "data" / "synthetic"
+
+
+def _print_table(rows: list[dict]):
+    if not rows:
+        print("No results.")
+        return
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _load(args) -> list[dict]:
+    paths = [Path(p) for p in args.csv] or sorted(SYNTHETIC_DIR.glob("*.csv"))
+    return load_labeled_csv(paths)
+
+
+def cmd_lsh_recall(args):
+    records = _load(args)
+    texts = [preprocess_bug(r["summary"]) for r in records]
+    with tempfile.TemporaryDirectory() as tmp:
+        extractor = FeatureExtractor(model_path=Path(tmp) / "tfidf.joblib")
+        vectors = extractor.fit_transform(texts)
+    settings = [(args.num_perm, int(b)) for b in args.bands.split(",")]
+    _print_table(lsh_recall(
+        vectors, texts, list(range(len(texts))), settings, threshold=args.threshold,
+    ))
+
+
+def cmd_threshold_sweep(args):
+    if args.cycle_id is not None:
+        # Score a stored cycle with the deployed vectorizer against reviewed labels
+        db = SessionLocal()
+        try:
+            bugs = crud.get_bugs_for_cycle(db, args.cycle_id)
+        finally:
+            db.close()
+        extractor = FeatureExtractor()
+        if not extractor.is_fitted:
+            sys.exit("No trained vectorizer found; train a model first.")
+        texts = [preprocess_bug_pair(b.summary, b.description)[1] for b in bugs]
+        labels = [b.final_classification if b.reviewed else None for b in bugs]
+        vectors = extractor.transform(texts)
+    else:
+        records = _load(args)
+        texts = [preprocess_bug(r["summary"]) for r in records]
+        labels = [r["label"] for r in records]
+        if args.embedding_dim is not None:
+            config.ml.embedding_dim = args.embedding_dim
+        with tempfile.TemporaryDirectory() as tmp:
+            extractor = FeatureExtractor(model_path=Path(tmp) / "tfidf.joblib")
+            vectors = extractor.fit_transform(texts)
+    # Score in the space duplicate search uses
+    vectors = extractor.similarity_vectors(vectors)
+
+    thresholds = np.round(np.arange(args.start, args.stop + args.step / 2, args.step), 4).tolist()
+    start = time.perf_counter()
+    rows = threshold_sweep(vectors, labels, thresholds)
+    print(f"Swept {len(thresholds)} thresholds over {len(texts)} bugs in {time.perf_counter() - start:.2f}s")
+    _print_table(rows)
+
+
+def cmd_training_cap(args):
+    if args.from_db:
+        # Reviewed bugs with their real review times
+        db = SessionLocal()
+        try:
+            history = crud.get_review_history(db)
+            bugs = {b.id: b for b in crud.get_reviewed_bugs(db)}
+        finally:
+            db.close()
+        texts = [preprocess_bug(bugs[bug_id].summary, bugs[bug_id].description) for bug_id, *_ in history]
+        labels = [label for _, label, _, _ in history]
+        ages = review_ages([at for _, _, at, _ in history])
+        overrides = [overridden for *_, overridden in history]
+    else:
+        # Synthetic rows have no review time; their created date stands in for it
+        records = [r for r in _load(args) if r["label"]]
+        texts = [preprocess_bug(r["summary"], r["description"]) for r in records]
+        labels = [r["label"] for r in records]
+        created = pd.to_datetime([r["created_date"] for r in records], errors="coerce")
+        ages = ((created.max() - created) / pd.Timedelta(days=1)).to_numpy(dtype=float, na_value=np.inf)
+        overrides = None
+
+    caps = [int(c) for c in args.caps.split(",")]
+    _print_table(training_cap_report(
+        texts, labels, ages, caps, overrides=overrides, holdout_fraction=args.holdout,
+        recent_days=args.recent_days, half_life_days=args.half_life_days,
+    ))
+
+
+def cmd_feature_selection(args):
+    records = [r for r in _load(args) if r["label"]]
+    texts = [preprocess_bug(r["summary"], r["description"]) for r in records]
+    labels = [r["label"] for r in records]
+    if args.max_features is not None:
+        config.ml.tfidf_max_features = args.max_features
+    sizes = [int(s) for s in args.sizes.split(",")]
+    _print_table(feature_selection_report(
+        texts, labels, sizes, method=args.method, holdout_fraction=args.holdout,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    lsh = sub.add_parser("lsh-recall", help="Recall of MinHash/LSH duplicate mode vs the exact detector")
+    lsh.add_argument("--csv", nargs="*", default=[], help="Labeled CSVs (default: data/synthetic)")
+    lsh.add_argument("--num-perm", type=int, default=config.ml.minhash_num_perm)
+    lsh.add_argument("--bands", default="8,16,32,64", help="Comma-separated band counts")
+    lsh.add_argument("--threshold", type=float, default=config.ml.duplicate_threshold)
+    lsh.set_defaults(func=cmd_lsh_recall)
+
+    sweep = sub.add_parser("threshold-sweep", help="Duplicate precision/recall at every threshold in one pass")
+    sweep.add_argument("--csv", nargs="*", default=[], help="Labeled CSVs (default: data/synthetic)")
+    sweep.add_argument("--cycle-id", type=int, help="Sweep a stored cycle against its reviewed labels instead")
+    sweep.add_argument("--start", type=float, default=0.70)
+    sweep.add_argument("--stop", type=float, default=0.99)
+    sweep.add_argument("--step", type=float, default=0.01)
+    sweep.add_argument("--embedding-dim", type=int, help="Fit an SVD embedding of this size (synthetic data only)")
+    sweep.set_defaults(func=cmd_threshold_sweep)
+
+    cap = sub.add_parser("training-cap", help="F1 on the newest reviews vs the training-set cap")
+    cap.add_argument("--csv", nargs="*", default=[], help="Labeled CSVs (default: data/synthetic)")
+    cap.add_argument("--from-db", action="store_true", help="Use reviewed bugs from the database instead")
+    cap.add_argument("--caps", default="50,100,150,200,0", help="Comma-separated caps (0 = no cap)")
+    cap.add_argument("--holdout", type=float, default=0.2, help="Fraction of newest reviews held out")
+    cap.add_argument("--recent-days", type=float, default=config.ml.training_recent_days)
+    cap.add_argument("--half-life-days", type=float, default=config.ml.training_half_life_days)
+    cap.set_defaults(func=cmd_training_cap)
+
+    select = sub.add_parser("feature-selection", help="Model size, latency and F1 vs the selected vocabulary size")
+    select.add_argument("--csv", nargs="*", default=[], help="Labeled CSVs (default: data/synthetic)")
+    select.add_argument("--method", choices=["chi2", "mutual_info"], default="chi2")
+    select.add_argument("--sizes", default="25,50,100,150,0", help="Comma-separated term counts (0 = all)")
+    select.add_argument("--max-features", type=int, help="Vocabulary size before selection")
+    select.add_argument("--holdout", type=float, default=0.2, help="Fraction of rows held out")
+    select.set_defaults(func=cmd_feature_selection)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 """Shared FastAPI dependencies."""
 from src.db.database import get_db
+from src.jobs import TrainingJobs
 from src.pipeline import Pipeline
 
 _pipeline: Pipeline | None = None
+_training_jobs: TrainingJobs | None = None
 
 
 def get_pipeline() -> Pipeline:
@@ -10,3 +12,10 @@ def get_pipeline() -> Pipeline:
     if _pipeline is None:
         _pipeline = Pipeline()
     return _pipeline
+
+
+def get_training_jobs() -> TrainingJobs:
+    global _training_jobs
+    if _training_jobs is None:
+        _training_jobs = TrainingJobs()
+    return _training_jobs
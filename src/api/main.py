@@ -113,7 +113,9 @@ def bug_detail_page(bug_id: int, request: Request, db: Session = Depends(get_db)
         return templates.TemplateResponse("dashboard.html", {"request": request, "projects": []})
     audit_logs = crud.get_audit_logs_for_bug(db, bug_id)
     similar = []
-    if bug.duplicate_of_id:
+    if bug.duplicate_group_id:
+        similar = [b for b in crud.get_duplicate_group(db, bug.duplicate_group_id) if b.id != bug.id]
+    elif bug.duplicate_of_id:
         orig = crud.get_bug(db, bug.duplicate_of_id)
         if orig:
             similar.append(orig)
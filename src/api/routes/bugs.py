@@ -4,25 +4,46 @@ from sqlalchemy.orm import Session
 
 from src.db.database import get_db
 from src.db import crud
+from src.api.dependencies import get_pipeline
+from src.pipeline import Pipeline
 
 router = APIRouter(prefix="/api/bugs", tags=["bugs"])
 
 
 @router.get("/{bug_id}")
-def get_bug(bug_id: int, db: Session = Depends(get_db)):
+def get_bug(
+    bug_id: int,
+    db: Session = Depends(get_db),
+    pipeline: Pipeline = Depends(get_pipeline),
+):
     bug = crud.get_bug(db, bug_id)
     if not bug:
         raise HTTPException(404, "Bug not found")
 
+    # With lazy_rescoring, a bug the background sweep hasn't reached is scored now
+    rescored = pipeline.rescore_if_stale(db, bug)
+
     audit_logs = crud.get_audit_logs_for_bug(db, bug_id)
 
     similar_bugs = []
-    if bug.duplicate_of_id:
+    if bug.duplicate_group_id:
+        for member in crud.get_duplicate_group(db, bug.duplicate_group_id):
+            if member.id != bug.id:
+                similar_bugs.append({
+                    "id": member.id, "summary": member.summary,
+                    "similarity": (
+                        bug.duplicate_similarity if member.id == bug.duplicate_of_id
+                        else member.duplicate_similarity
+                    ),
+                    "canonical": member.id == bug.duplicate_group_id,
+                })
+    elif bug.duplicate_of_id:
         orig = crud.get_bug(db, bug.duplicate_of_id)
         if orig:
             similar_bugs.append({
                 "id": orig.id, "summary": orig.summary,
                 "similarity": bug.duplicate_similarity,
+                "canonical": True,
             })
 
     return {
@@ -39,12 +60,15 @@ def get_bug(bug_id: int, db: Session = Depends(get_db)):
         "ml_classification": bug.ml_classification,
         "ml_confidence": bug.ml_confidence,
         "ml_explanation": bug.ml_explanation,
+        "ml_model_version": bug.ml_model_version,
+        "rescored": rescored,
         "final_classification": bug.final_classification,
         "classification_source": bug.classification_source,
         "reviewed": bug.reviewed, "reviewed_by": bug.reviewed_by,
         "override_reason": bug.override_reason,
         "duplicate_of_id": bug.duplicate_of_id,
         "duplicate_similarity": bug.duplicate_similarity,
+        "duplicate_group_id": bug.duplicate_group_id,
         "similar_bugs": similar_bugs,
         "audit_logs": [
             {
@@ -1,11 +1,12 @@
 """Classification endpoints: classify, override, retrain."""
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.db.database import get_db
 from src.db import crud
-from src.api.dependencies import get_pipeline
+from src.api.dependencies import get_pipeline, get_training_jobs
+from src.jobs import TrainingJobs
 from src.pipeline import Pipeline
 
 router = APIRouter(prefix="/api", tags=["classification"])
@@ -28,7 +29,7 @@ def classify_cycle(
     if not cycle:
         raise HTTPException(404, "Cycle not found")
 
-    if not pipeline.classifier.is_trained:
+    if not pipeline.models_for(cycle.project_id).is_trained:
         raise HTTPException(400, "Model not trained. Upload labeled data or train first.")
 
     result = pipeline.classify_cycle(db, cycle_id)
@@ -40,6 +41,7 @@ def override_classification(
     data: OverrideRequest,
     db: Session = Depends(get_db),
     pipeline: Pipeline = Depends(get_pipeline),
+    jobs: TrainingJobs = Depends(get_training_jobs),
 ):
     bug = crud.get_bug(db, data.bug_id)
     if not bug:
@@ -50,28 +52,68 @@ def override_classification(
         data.changed_by, data.reason,
     )
 
-    retrain_result = pipeline.retrain_if_needed(db)
+    # Full retrains run in the background; incremental folds are batched and
+    # hold the write lock only to swap the updated classifier in
+    if pipeline.full_retrain_due(db):
+        job = jobs.submit_retrain(pipeline, _session_factory(db))
+        retrain_result = {"status": "queued", "job_id": job["id"]}
+    else:
+        retrain_result = pipeline.update_incrementally(db)
 
     return {
         "status": "success",
         "bug_id": updated.id,
         "new_classification": updated.final_classification,
-        "retrain_triggered": retrain_result.get("status") == "retrained",
+        "retrain_triggered": retrain_result.get("status") == "queued",
         "retrain_result": retrain_result,
     }
 
 
+def _session_factory(db: Session) -> sessionmaker:
+    """Sessions for background jobs, bound to the same engine as the request's."""
+    return sessionmaker(bind=db.get_bind(), autoflush=False, expire_on_commit=False)
+
+
 class TrainRequest(BaseModel):
     labeled_data: list[dict]
 
 
-@router.post("/retrain")
+@router.post("/retrain", status_code=202)
 def retrain_model(
     db: Session = Depends(get_db),
     pipeline: Pipeline = Depends(get_pipeline),
+    jobs: TrainingJobs = Depends(get_training_jobs),
+):
+    job = jobs.submit_retrain(pipeline, _session_factory(db))
+    return {"status": "queued", "job_id": job["id"]}
+
+
+@router.post("/projects/{project_id}/model", status_code=202)
+def train_project_model(
+    project_id: int,
+    db: Session = Depends(get_db),
+    pipeline: Pipeline = Depends(get_pipeline),
+    jobs: TrainingJobs = Depends(get_training_jobs),
 ):
-    result = pipeline.active_learner.retrain(db)
-    return result
+    if not crud.get_project(db, project_id):
+        raise HTTPException(404, "Project not found")
+    job = jobs.submit_project_training(pipeline, project_id, _session_factory(db))
+    return {"status": "queued", "job_id": job["id"]}
+
+
+@router.delete("/projects/{project_id}/model")
+def delete_project_model(project_id: int, pipeline: Pipeline = Depends(get_pipeline)):
+    if not pipeline.delete_project_model(project_id):
+        raise HTTPException(404, "Project has no model of its own")
+    return {"status": "deleted"}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, jobs: TrainingJobs = Depends(get_training_jobs)):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
 
 
 @router.post("/train-initial")
@@ -89,3 +131,74 @@ def train_initial(
 
     result = pipeline.train_initial_model(db, data.labeled_data)
     return {"status": "success", **result}
+
+
+@router.get("/models")
+def list_models(db: Session = Depends(get_db)):
+    return [
+        {
+            "version": m.version, "is_active": m.is_active, "is_candidate": m.is_candidate,
+            "trained_at": m.trained_at.isoformat() if m.trained_at else None,
+            "training_samples": m.training_samples, "f1_score": m.f1_score,
+            "artifact_digest": m.artifact_digest,
+        }
+        for m in crud.get_model_versions(db)
+    ]
+
+
+@router.get("/models/cache")
+def model_cache_stats(pipeline: Pipeline = Depends(get_pipeline)):
+    return pipeline.project_models.stats()
+
+
+@router.get("/models/prediction-cache")
+def prediction_cache_stats(db: Session = Depends(get_db), pipeline: Pipeline = Depends(get_pipeline)):
+    return pipeline.prediction_cache.stats(db)
+
+
+@router.get("/models/{version}/shadow")
+def model_shadow_scores(version: str, db: Session = Depends(get_db)):
+    if not crud.get_model_version(db, version):
+        raise HTTPException(404, "Model version not found")
+    return {
+        "version": version,
+        "summary": crud.get_shadow_summary(db, version),
+        "cycles": [
+            {
+                "cycle_id": s.cycle_id, "active_version": s.active_version, "rows": s.rows,
+                "agreement_rate": s.agreement_rate,
+                "active_confidence": s.active_confidence,
+                "candidate_confidence": s.candidate_confidence,
+                "confidence_shift": s.confidence_shift,
+                "active_seconds": s.active_seconds, "candidate_seconds": s.candidate_seconds,
+                "reused_features": s.reused_features,
+                "created_at": s.created_at.isoformat() if s.created_at else None,
+            }
+            for s in crud.get_shadow_scores(db, version)
+        ],
+    }
+
+
+@router.post("/models/rollback")
+def rollback_model(
+    db: Session = Depends(get_db),
+    pipeline: Pipeline = Depends(get_pipeline),
+):
+    try:
+        return pipeline.rollback(db)
+    except LookupError as exc:
+        raise HTTPException(400, str(exc))
+
+
+@router.post("/models/{version}/promote")
+def promote_model(
+    version: str,
+    db: Session = Depends(get_db),
+    pipeline: Pipeline = Depends(get_pipeline),
+):
+    try:
+        return pipeline.promote(db, version)
+    except LookupError as exc:
+        raise HTTPException(404, str(exc))
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
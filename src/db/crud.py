@@ -1,12 +1,14 @@
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import func
+from sqlalchemy import case, delete, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.db.models import (
-    Project, RegressionCycle, BugReport,
-    ClassificationAuditLog, ModelVersion, User,
+    Project, RegressionCycle, BugReport, BugFeatures, CachedPrediction,
+    DocumentFrequencyUpdate,
+    ClassificationAuditLog, ModelVersion, ShadowScore, User,
 )
 
 
@@ -85,6 +87,81 @@ def get_bug(db: Session, bug_id: int) -> Optional[BugReport]:
     return db.query(BugReport).filter(BugReport.id == bug_id).first()
 
 
+def get_bugs_by_ids(db: Session, bug_ids: list[int]) -> list[BugReport]:
+    if not bug_ids:
+        return []
+    return db.query(BugReport).filter(BugReport.id.in_(bug_ids)).all()
+
+
+def get_classified_originals(db: Session, project_id: int) -> list[BugReport]:
+    """Classified, non-duplicate bugs of a project, in insertion order."""
+    return (
+        db.query(BugReport)
+        .join(RegressionCycle, BugReport.cycle_id == RegressionCycle.id)
+        .filter(
+            RegressionCycle.project_id == project_id,
+            BugReport.ml_classification != None,  # noqa: E711
+            BugReport.duplicate_of_id == None,  # noqa: E711
+        )
+        .order_by(BugReport.id)
+        .all()
+    )
+
+
+def get_stale_bugs(
+    db: Session, version: str, limit: int, keep: tuple[str, ...] = (),
+) -> list[BugReport]:
+    """Classified, non-duplicate bugs scored by a model other than ``version``, oldest first.
+
+    Bugs stamped with one of ``keep`` are left out, as are bugs never classified.
+    """
+    return (
+        db.query(BugReport)
+        .filter(
+            BugReport.ml_classification != None,  # noqa: E711
+            BugReport.duplicate_of_id == None,  # noqa: E711
+            or_(
+                BugReport.ml_model_version == None,  # noqa: E711
+                BugReport.ml_model_version.notin_([version, *keep]),
+            ),
+        )
+        .order_by(BugReport.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_fingerprint_originals(
+    db: Session, project_id: int, fingerprints: list[str], before_cycle_id: int,
+) -> dict[str, int]:
+    """Earliest non-duplicate bug per stack fingerprint in a project's older cycles."""
+    if not fingerprints:
+        return {}
+    rows = (
+        db.query(BugReport.stack_fingerprint, func.min(BugReport.id))
+        .join(RegressionCycle, BugReport.cycle_id == RegressionCycle.id)
+        .filter(
+            RegressionCycle.project_id == project_id,
+            BugReport.cycle_id < before_cycle_id,
+            BugReport.stack_fingerprint.in_(fingerprints),
+            BugReport.duplicate_of_id == None,  # noqa: E711
+        )
+        .group_by(BugReport.stack_fingerprint)
+        .all()
+    )
+    return {fingerprint: bug_id for fingerprint, bug_id in rows}
+
+
+def get_duplicate_group(db: Session, group_id: int) -> list[BugReport]:
+    """Every bug in a duplicate family, canonical representative first."""
+    return (
+        db.query(BugReport)
+        .filter(BugReport.duplicate_group_id == group_id)
+        .order_by(BugReport.id)
+        .all()
+    )
+
+
 def get_bugs_for_cycle(db: Session, cycle_id: int) -> list[BugReport]:
     return (
         db.query(BugReport)
@@ -177,6 +254,19 @@ def set_duplicate(
     return bug
 
 
+def bulk_update_bugs(db: Session, rows: list[dict]) -> int:
+    """Apply per-bug column updates keyed by primary key in a single transaction.
+
+    Each row is a dict with an ``id`` key plus the columns to set. Rows sharing
+    the same set of keys are sent as one executemany statement.
+    """
+    if not rows:
+        return 0
+    db.execute(update(BugReport), rows)
+    db.commit()
+    return len(rows)
+
+
 def count_human_overrides(db: Session, since: Optional[datetime] = None) -> int:
     q = db.query(func.count(ClassificationAuditLog.id)).filter(
         ClassificationAuditLog.source == "human"
@@ -186,25 +276,233 @@ def count_human_overrides(db: Session, since: Optional[datetime] = None) -> int:
     return q.scalar() or 0
 
 
-def get_reviewed_bugs(db: Session) -> list[BugReport]:
+def get_human_overrides(db: Session, after_id: int = 0) -> list[ClassificationAuditLog]:
+    """Human audit-log entries newer than ``after_id``, oldest first."""
     return (
-        db.query(BugReport)
-        .filter(BugReport.reviewed == True)  # noqa: E712
+        db.query(ClassificationAuditLog)
+        .filter(ClassificationAuditLog.source == "human", ClassificationAuditLog.id > after_id)
+        .order_by(ClassificationAuditLog.id)
         .all()
     )
 
 
+def get_latest_override_id(db: Session) -> int:
+    return db.query(func.max(ClassificationAuditLog.id)).filter(
+        ClassificationAuditLog.source == "human"
+    ).scalar() or 0
+
+
+def get_review_history(db: Session) -> list[tuple[int, str, Optional[datetime], bool]]:
+    """``(bug id, final label, last human review time, overridden)`` for every reviewed bug, by id.
+
+    A bug is overridden when one of its human reviews changed the label it
+    had at the time. This comes from the audit log, because re-scoring later
+    rewrites ``ml_classification`` and may agree with the human label.
+    """
+    changed = or_(
+        ClassificationAuditLog.previous_classification == None,  # noqa: E711
+        ClassificationAuditLog.previous_classification != ClassificationAuditLog.new_classification,
+    )
+    reviews = (
+        db.query(
+            ClassificationAuditLog.bug_id,
+            func.max(ClassificationAuditLog.timestamp).label("reviewed_at"),
+            func.max(case((changed, 1), else_=0)).label("overridden"),
+        )
+        .filter(ClassificationAuditLog.source == "human")
+        .group_by(ClassificationAuditLog.bug_id)
+        .subquery()
+    )
+    return [
+        (bug_id, label, reviewed_at, bool(overridden))
+        for bug_id, label, reviewed_at, overridden in
+        db.query(
+            BugReport.id, BugReport.final_classification, reviews.c.reviewed_at,
+            reviews.c.overridden,
+        )
+        .outerjoin(reviews, reviews.c.bug_id == BugReport.id)
+        .filter(BugReport.reviewed == True)  # noqa: E712
+        .order_by(BugReport.id)
+    ]
+
+
+def get_reviewed_bugs(db: Session, project_id: Optional[int] = None) -> list[BugReport]:
+    query = db.query(BugReport).filter(BugReport.reviewed == True)  # noqa: E712
+    if project_id is not None:
+        query = query.join(RegressionCycle).filter(RegressionCycle.project_id == project_id)
+    return query.all()
+
+
+# ── Feature Store ──
+
+def get_bug_features(db: Session, bug_ids: list[int], version: str) -> dict[int, dict]:
+    """Stored term counts of ``bug_ids`` in feature space ``version``, by bug id."""
+    if not bug_ids:
+        return {}
+    rows = db.query(BugFeatures.bug_id, BugFeatures.counts_json).filter(
+        BugFeatures.extractor_version == version, BugFeatures.bug_id.in_(bug_ids),
+    )
+    return {bug_id: counts for bug_id, counts in rows}
+
+
+def get_stored_texts(db: Session, bug_ids: list[int]) -> dict[int, str]:
+    """Preprocessed texts of ``bug_ids`` from rows of any version."""
+    if not bug_ids:
+        return {}
+    rows = db.query(BugFeatures.bug_id, BugFeatures.text).filter(BugFeatures.bug_id.in_(bug_ids))
+    return {bug_id: text for bug_id, text in rows}
+
+
+def get_bug_ids_missing_features(db: Session, version: str, limit: int) -> list[int]:
+    """Reviewed or previously stored bugs that have no features in ``version`` yet."""
+    stored = db.query(BugFeatures.bug_id)
+    current = stored.filter(BugFeatures.extractor_version == version)
+    return [
+        bug_id for (bug_id,) in
+        db.query(BugReport.id)
+        .filter(
+            (BugReport.reviewed == True) | BugReport.id.in_(stored),  # noqa: E712
+            BugReport.id.not_in(current),
+        )
+        .order_by(BugReport.id).limit(limit)
+    ]
+
+
+def bulk_create_bug_features(db: Session, rows: list[dict]) -> int:
+    """Insert feature rows; rows another writer stored first are skipped."""
+    if not rows:
+        return 0
+    versions = {row["extractor_version"] for row in rows}
+    existing = set(
+        db.query(BugFeatures.bug_id, BugFeatures.extractor_version).filter(
+            BugFeatures.extractor_version.in_(versions),
+            BugFeatures.bug_id.in_([row["bug_id"] for row in rows]),
+        )
+    )
+    new_rows = [row for row in rows if (row["bug_id"], row["extractor_version"]) not in existing]
+    if not new_rows:
+        return 0
+    try:
+        db.execute(insert(BugFeatures), new_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return 0
+    return len(new_rows)
+
+
+def delete_stale_bug_features(db: Session, version: str) -> int:
+    """Drop stored features from every version but ``version``."""
+    result = db.execute(delete(BugFeatures).where(BugFeatures.extractor_version != version))
+    db.commit()
+    return result.rowcount
+
+
+# ── Document Frequencies ──
+
+def create_document_frequency_update(
+    db: Session, generation: str, n_documents: int, counts: dict, terms: dict,
+) -> int:
+    """Log one batch of hashing-mode document counts; returns its id."""
+    row = DocumentFrequencyUpdate(
+        generation=generation, n_documents=n_documents, counts_json=counts, terms_json=terms,
+    )
+    db.add(row)
+    db.commit()
+    return row.id
+
+
+def get_document_frequency_updates(
+    db: Session, generation: str, after_id: int = 0,
+) -> list[DocumentFrequencyUpdate]:
+    """Updates logged against ``generation`` after ``after_id``, oldest first."""
+    return (
+        db.query(DocumentFrequencyUpdate)
+        .filter(
+            DocumentFrequencyUpdate.generation == generation,
+            DocumentFrequencyUpdate.id > after_id,
+        )
+        .order_by(DocumentFrequencyUpdate.id).all()
+    )
+
+
+# ── Prediction Cache ──
+
+def get_cached_predictions(db: Session, text_hashes: list[str], model_key: str) -> dict:
+    """Cached predictions of ``model_key`` for the given text hashes, by hash.
+
+    Selects plain columns: a cycle's lookup can return thousands of rows.
+    """
+    if not text_hashes:
+        return {}
+    rows = db.query(
+        CachedPrediction.text_hash, CachedPrediction.classification, CachedPrediction.confidence,
+        CachedPrediction.probabilities, CachedPrediction.explanation,
+    ).filter(
+        CachedPrediction.model_key == model_key, CachedPrediction.text_hash.in_(set(text_hashes)),
+    )
+    return {row.text_hash: row for row in rows}
+
+
+def bulk_create_cached_predictions(db: Session, rows: list[dict]) -> int:
+    """Insert cache rows; rows another writer stored first are skipped."""
+    if not rows:
+        return 0
+    keys = {row["model_key"] for row in rows}
+    existing = set(
+        db.query(CachedPrediction.text_hash, CachedPrediction.model_key).filter(
+            CachedPrediction.model_key.in_(keys),
+            CachedPrediction.text_hash.in_([row["text_hash"] for row in rows]),
+        )
+    )
+    new_rows = [row for row in rows if (row["text_hash"], row["model_key"]) not in existing]
+    if not new_rows:
+        return 0
+    try:
+        db.execute(insert(CachedPrediction), new_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return 0
+    return len(new_rows)
+
+
+def count_cached_predictions(db: Session) -> int:
+    return db.query(func.count(CachedPrediction.id)).scalar() or 0
+
+
+def trim_cached_predictions(db: Session, max_rows: int) -> int:
+    """Drop the oldest cache rows beyond the newest ``max_rows``."""
+    cutoff = (
+        db.query(CachedPrediction.id).order_by(CachedPrediction.id.desc())
+        .offset(max_rows).limit(1).scalar()
+    )
+    if cutoff is None:
+        return 0
+    result = db.execute(delete(CachedPrediction).where(CachedPrediction.id <= cutoff))
+    db.commit()
+    return result.rowcount
+
+
 # ── Model Versions ──
 
 def create_model_version(
     db: Session, version: str, training_samples: int,
     accuracy: float, f1_score: float, model_path: str,
+    artifact_digest: Optional[str] = None, activate: bool = True,
 ) -> ModelVersion:
-    db.query(ModelVersion).update({ModelVersion.is_active: False})
+    """Record a trained model; with ``activate=False`` it becomes the shadow candidate instead.
+
+    Either way it supersedes any earlier candidate.
+    """
+    if activate:
+        db.query(ModelVersion).update({ModelVersion.is_active: False})
+    db.query(ModelVersion).update({ModelVersion.is_candidate: False})
     mv = ModelVersion(
         version=version, training_samples=training_samples,
         accuracy=accuracy, f1_score=f1_score,
-        model_path=model_path, is_active=True,
+        model_path=model_path, artifact_digest=artifact_digest,
+        is_active=activate, is_candidate=not activate,
     )
     db.add(mv)
     db.commit()
@@ -212,10 +510,80 @@ def create_model_version(
     return mv
 
 
+def next_model_version(db: Session) -> str:
+    """The next ``vN`` label; ids only grow, so labels stay unique."""
+    last_id = db.query(func.max(ModelVersion.id)).scalar()
+    return f"v{(last_id or 0) + 1}"
+
+
 def get_active_model(db: Session) -> Optional[ModelVersion]:
     return db.query(ModelVersion).filter(ModelVersion.is_active == True).first()  # noqa: E712
 
 
+def get_candidate_model(db: Session) -> Optional[ModelVersion]:
+    return db.query(ModelVersion).filter(ModelVersion.is_candidate == True).first()  # noqa: E712
+
+
+def get_model_version(db: Session, version: str) -> Optional[ModelVersion]:
+    return db.query(ModelVersion).filter(ModelVersion.version == version).first()
+
+
+def get_model_versions(db: Session) -> list[ModelVersion]:
+    return db.query(ModelVersion).order_by(ModelVersion.id.desc()).all()
+
+
+def activate_model_version(db: Session, model_id: int) -> Optional[ModelVersion]:
+    mv = db.get(ModelVersion, model_id)
+    if mv:
+        db.query(ModelVersion).update({ModelVersion.is_active: ModelVersion.id == model_id})
+        mv.is_candidate = False
+        db.commit()
+        db.refresh(mv)
+    return mv
+
+
+# ── Shadow Scores ──
+
+def create_shadow_score(db: Session, **fields) -> ShadowScore:
+    score = ShadowScore(**fields)
+    db.add(score)
+    db.commit()
+    db.refresh(score)
+    return score
+
+
+def get_shadow_scores(db: Session, candidate_version: str) -> list[ShadowScore]:
+    return (
+        db.query(ShadowScore)
+        .filter(ShadowScore.candidate_version == candidate_version)
+        .order_by(ShadowScore.id)
+        .all()
+    )
+
+
+def get_shadow_summary(db: Session, candidate_version: str) -> dict:
+    """Row-weighted averages of a candidate's shadow scores across cycles."""
+    rows = func.sum(ShadowScore.rows)
+    cycles, total, agreed, shift, active_seconds, candidate_seconds = (
+        db.query(
+            func.count(ShadowScore.id), rows,
+            func.sum(ShadowScore.agreement_rate * ShadowScore.rows),
+            func.sum(ShadowScore.confidence_shift * ShadowScore.rows),
+            func.sum(ShadowScore.active_seconds), func.sum(ShadowScore.candidate_seconds),
+        )
+        .filter(ShadowScore.candidate_version == candidate_version)
+        .one()
+    )
+    return {
+        "cycles": cycles,
+        "rows": total or 0,
+        "agreement_rate": round(agreed / total, 4) if total else None,
+        "confidence_shift": round(shift / total, 4) if total else None,
+        "active_seconds": round(active_seconds or 0.0, 4),
+        "candidate_seconds": round(candidate_seconds or 0.0, 4),
+    }
+
+
 # ── Users ──
 
 def create_user(db: Session, username: str, display_name: str, role: str = "viewer") -> User:
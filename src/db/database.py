@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, literal, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from configs.config import config
@@ -20,9 +20,35 @@ def get_db():
         db.close()
 
 
-def init_db():
+def init_db(bind=None):
     from src.db.models import (  # noqa: F401
-        Project, RegressionCycle, BugReport,
-        ClassificationAuditLog, ModelVersion, User,
+        Project, RegressionCycle, BugReport, BugFeatures, CachedPrediction,
+        ClassificationAuditLog, DocumentFrequencyUpdate, ModelVersion, ShadowScore, User,
     )
-    Base.metadata.create_all(bind=engine)
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns(bind)
+
+
+def _add_missing_columns(bind):
+    """Add model columns an existing database predates, with their indexes.
+
+    ``create_all`` creates missing tables but never alters existing ones.
+    New columns must be nullable or carry a scalar default, which fills the
+    rows already there.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing]
+            if not missing:
+                continue
+            for column in missing:
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    value = literal(column.default.arg, column.type)
+                    ddl += f" DEFAULT {value.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 
 from sqlalchemy import (
     Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON,
+    LargeBinary, UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
 
@@ -64,9 +65,13 @@ class BugReport(Base):
     ml_classification = Column(String(50), nullable=True)
     ml_confidence = Column(Float, nullable=True)
     ml_explanation = Column(Text, nullable=True)
+    ml_model_version = Column(String(50), nullable=True, index=True)  # model version that produced ml_classification
     duplicate_of_id = Column(Integer, ForeignKey("bug_reports.id"), nullable=True)
     duplicate_similarity = Column(Float, nullable=True)
+    duplicate_group_id = Column(Integer, nullable=True, index=True)
     tfidf_vector_json = Column(JSON, nullable=True)
+    embedding = Column(LargeBinary, nullable=True)  # float32 SVD vector when embedding_dim > 0
+    stack_fingerprint = Column(String(40), nullable=True, index=True)
 
     # Final classification
     final_classification = Column(String(50), nullable=True)
@@ -78,6 +83,7 @@ class BugReport(Base):
     cycle = relationship("RegressionCycle", back_populates="bugs")
     duplicate_of = relationship("BugReport", remote_side=[id], foreign_keys=[duplicate_of_id])
     audit_logs = relationship("ClassificationAuditLog", back_populates="bug", cascade="all, delete-orphan")
+    features = relationship("BugFeatures", back_populates="bug", cascade="all, delete-orphan")
 
 
 class ClassificationAuditLog(Base):
@@ -95,6 +101,45 @@ class ClassificationAuditLog(Base):
     bug = relationship("BugReport", back_populates="audit_logs")
 
 
+class BugFeatures(Base):
+    __tablename__ = "bug_features"
+    __table_args__ = (UniqueConstraint("bug_id", "extractor_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    bug_id = Column(Integer, ForeignKey("bug_reports.id"), nullable=False, index=True)
+    extractor_version = Column(String(32), nullable=False, index=True)
+    text = Column(Text, nullable=False)
+    counts_json = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=utcnow)
+
+    bug = relationship("BugReport", back_populates="features")
+
+
+class DocumentFrequencyUpdate(Base):
+    __tablename__ = "document_frequency_updates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    generation = Column(String(32), nullable=False, index=True)  # fit of the hashing vectorizer it extends
+    n_documents = Column(Integer, nullable=False)
+    counts_json = Column(JSON, nullable=False)  # per-bucket increments as {"indices", "values"}
+    terms_json = Column(JSON, nullable=False)  # first term seen in newly named buckets
+    created_at = Column(DateTime, default=utcnow)
+
+
+class CachedPrediction(Base):
+    __tablename__ = "prediction_cache"
+    __table_args__ = (UniqueConstraint("text_hash", "model_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    text_hash = Column(String(40), nullable=False)  # preprocessor.text_hash of the preprocess_bug output
+    model_key = Column(String(64), nullable=False, index=True)  # fingerprint of the pair that scored it
+    classification = Column(String(50), nullable=False)
+    confidence = Column(Float, nullable=False)
+    probabilities = Column(JSON, nullable=False)
+    explanation = Column(Text, default="")
+    created_at = Column(DateTime, default=utcnow)
+
+
 class ModelVersion(Base):
     __tablename__ = "model_versions"
 
@@ -105,7 +150,27 @@ class ModelVersion(Base):
     accuracy = Column(Float, nullable=True)
     f1_score = Column(Float, nullable=True)
     model_path = Column(String(500), nullable=True)
+    artifact_digest = Column(String(64), nullable=True)  # registry object holding this version's files
     is_active = Column(Boolean, default=False)
+    is_candidate = Column(Boolean, default=False)  # trained in shadow mode, not yet promoted
+
+
+class ShadowScore(Base):
+    __tablename__ = "shadow_scores"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cycle_id = Column(Integer, ForeignKey("regression_cycles.id"), nullable=False, index=True)
+    candidate_version = Column(String(50), nullable=False, index=True)
+    active_version = Column(String(50), nullable=True)
+    rows = Column(Integer, default=0)
+    agreement_rate = Column(Float, nullable=True)
+    active_confidence = Column(Float, nullable=True)
+    candidate_confidence = Column(Float, nullable=True)
+    confidence_shift = Column(Float, nullable=True)
+    active_seconds = Column(Float, nullable=True)
+    candidate_seconds = Column(Float, nullable=True)
+    reused_features = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=utcnow)
 
 
 class User(Base):
@@ -0,0 +1,131 @@
+"""Background training jobs and the lock that guards model swaps."""
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from configs.config import config
+
+
+class ReadWriteLock:
+    """Any number of readers or a single writer.
+
+    A waiting writer blocks new readers, so a model swap cannot be starved
+    by a steady stream of classify requests.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class TrainingJobs:
+    """Runs training jobs one at a time on a worker thread and tracks their status.
+
+    Only the newest ``max_finished`` finished jobs are remembered.
+    """
+
+    def __init__(self, max_finished: Optional[int] = None):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training")
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.max_finished = max_finished or config.app.finished_jobs_kept
+
+    def submit(self, kind: str, fn: Callable[[Callable[[str], None]], dict]) -> dict:
+        """Queue ``fn(progress)``, reusing a queued or running job of the same kind."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["kind"] == kind and job["status"] in ("queued", "running"):
+                    return dict(job)
+            job = {
+                "id": uuid.uuid4().hex, "kind": kind, "status": "queued",
+                "stage": None, "result": None, "error": None,
+                "created_at": _now(), "finished_at": None,
+            }
+            self._jobs[job["id"]] = job
+            snapshot = dict(job)
+        self._executor.submit(self._run, job["id"], fn)
+        return snapshot
+
+    def submit_retrain(self, pipeline, session_factory) -> dict:
+        """Queue a full retrain of ``pipeline`` using a session of its own."""
+        def run(progress):
+            db = session_factory()
+            try:
+                return pipeline.retrain(db, progress=progress)
+            finally:
+                db.close()
+        return self.submit("retrain", run)
+
+    def submit_project_training(self, pipeline, project_id: int, session_factory) -> dict:
+        """Queue fitting ``project_id``'s own model pair."""
+        def run(progress):
+            db = session_factory()
+            try:
+                return pipeline.train_project_model(db, project_id, progress=progress)
+            finally:
+                db.close()
+        return self.submit(f"project-model-{project_id}", run)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _finish(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, finished_at=_now())
+            finished = [k for k, job in self._jobs.items() if job["finished_at"]]
+            # Jobs are kept in submission order, so the oldest finished go first
+            for k in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[k]
+
+    def _run(self, job_id: str, fn):
+        self._update(job_id, status="running", stage="starting")
+        try:
+            result = fn(lambda stage: self._update(job_id, stage=stage))
+        except Exception as exc:
+            self._finish(job_id, status="failed", error=str(exc))
+        else:
+            self._finish(job_id, status="succeeded", stage="done", result=result)
@@ -1,4 +1,8 @@
 """Active learning: retrain model when enough human overrides accumulate."""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
 import numpy as np
 from sqlalchemy.orm import Session
 
@@ -7,6 +11,8 @@ from src.db import crud
 from src.ml.preprocessor import preprocess_bug
 from src.ml.feature_extractor import FeatureExtractor
 from src.ml.classifier import BugClassifier
+from src.ml.feature_store import FeatureStore
+from src.ml.training_set import TrainingSetManager, review_ages
 
 
 class ActiveLearner:
@@ -19,30 +25,99 @@ class ActiveLearner:
         self.feature_extractor = feature_extractor
         self.classifier = classifier
         self.retrain_threshold = retrain_threshold or config.ml.retrain_override_count
+        self.feature_store = FeatureStore(feature_extractor) if config.ml.feature_store else None
+        self.training_set = TrainingSetManager()
 
     def should_retrain(self, db: Session) -> bool:
-        active_model = crud.get_active_model(db)
-        since = active_model.trained_at if active_model else None
+        latest = _latest_model(db)
+        since = latest.trained_at if latest else None
         override_count = crud.count_human_overrides(db, since=since)
         return override_count >= self.retrain_threshold
 
-    def retrain(self, db: Session) -> dict:
-        reviewed_bugs = crud.get_reviewed_bugs(db)
+    def rebuild_due(self, db: Session) -> bool:
+        """In incremental mode, whether the scheduled full retrain is due."""
+        latest = _latest_model(db)
+        if not latest or not latest.trained_at:
+            return False
+        trained_at = latest.trained_at
+        if trained_at.tzinfo is None:
+            trained_at = trained_at.replace(tzinfo=timezone.utc)
+        age = datetime.now(timezone.utc) - trained_at
+        return (
+            age >= timedelta(days=config.ml.full_retrain_days)
+            and crud.count_human_overrides(db, since=latest.trained_at) > 0
+        )
+
+    def update(self, db: Session, min_batch: int = 1) -> dict:
+        """Fold the overrides made since the last update into the classifier.
+
+        Nothing is folded until at least ``min_batch`` overrides are pending.
+        The vectorizer is not refit, so terms new since the last full retrain
+        are ignored until the next scheduled rebuild.
+        """
+        overrides = crud.get_human_overrides(db, after_id=self.classifier.folded_through)
+        if not overrides or not self.classifier.is_trained:
+            return {"status": "not_needed"}
+        if self.classifier.online is None:
+            # Fitted before incremental mode was on; overrides wait for a full fit
+            return {"status": "needs_full_fit"}
+        if len(overrides) < min_batch:
+            return {"status": "pending", "pending": len(overrides)}
+
+        bugs = crud.get_bugs_by_ids(db, sorted({log.bug_id for log in overrides}))
+        labels = np.array([b.final_classification for b in bugs])
+
+        start = time.perf_counter()
+        X = self._features(db, bugs)
+        result = self.classifier.partial_fit(X, labels, folded_through=overrides[-1].id)
+        return {
+            "status": "updated",
+            **result,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def _features(self, db: Session, bugs: list, fit: bool = False):
+        if self.feature_store is not None:
+            if fit:
+                return self.feature_store.fit_transform(db, bugs)
+            return self.feature_store.transform(db, bugs)
+        texts = [preprocess_bug(b.summary, b.description) for b in bugs]
+        if fit:
+            return self.feature_extractor.fit_transform(texts)
+        return self.feature_extractor.transform(texts)
+
+    def retrain(
+        self, db: Session,
+        on_fitted: Optional[Callable[[FeatureExtractor, BugClassifier], Optional[str]]] = None,
+        activate: bool = True,
+    ) -> dict:
+        """Refit the vectorizer and classifier on every reviewed bug.
+
+        ``on_fitted`` is called with the fitted pair before the new model
+        version is recorded; the pipeline uses it to publish a pair trained
+        off to the side, and returns the registry digest to record with it.
+        With ``activate=False`` the version is recorded as the shadow candidate.
+        """
+        # Everything up to here is in the training set, so later updates start after it
+        latest_override_id = crud.get_latest_override_id(db)
+        reviewed_bugs, training_set = self._training_bugs(db)
 
         if len(reviewed_bugs) < 10:
             return {"status": "skipped", "reason": "Not enough reviewed samples (need >= 10)"}
 
-        texts = [preprocess_bug(b.summary, b.description) for b in reviewed_bugs]
         labels = np.array([b.final_classification for b in reviewed_bugs])
 
         unique_labels = set(labels)
         if len(unique_labels) < 2:
             return {"status": "skipped", "reason": "Need at least 2 distinct labels"}
 
-        X = self.feature_extractor.fit_transform(texts)
+        X = self._features(db, reviewed_bugs, fit=True)
+        X = self.feature_extractor.select_features(X, labels)
+        self.classifier.folded_through = latest_override_id
         metrics = self.classifier.fit(X, labels)
+        digest = on_fitted(self.feature_extractor, self.classifier) if on_fitted else None
 
-        version = f"v{len(db.query(crud.ModelVersion).all()) + 1}"
+        version = crud.next_model_version(db)
         avg_f1 = (metrics["svm_f1"] + metrics["lr_f1"]) / 2
         crud.create_model_version(
             db,
@@ -51,10 +126,32 @@ class ActiveLearner:
             accuracy=avg_f1,
             f1_score=avg_f1,
             model_path=str(self.classifier.model_path),
+            artifact_digest=digest,
+            activate=activate,
         )
 
         return {
             "status": "retrained",
             "version": version,
+            "activated": activate,
             "metrics": metrics,
+            "training_set": training_set,
         }
+
+    def _training_bugs(self, db: Session) -> tuple[list, dict]:
+        """The reviewed bugs to fit on, capped by the training-set manager."""
+        if not self.training_set.cap:
+            bugs = crud.get_reviewed_bugs(db)
+            return bugs, {"available": len(bugs), "selected": len(bugs), "cap": 0}
+        history = crud.get_review_history(db)
+        chosen, stats = self.training_set.select(
+            [label for _, label, _, _ in history],
+            review_ages([at for _, _, at, _ in history]),
+            overrides=[overridden for *_, overridden in history],
+        )
+        return crud.get_bugs_by_ids(db, [history[i][0] for i in chosen]), stats
+
+
+def _latest_model(db: Session):
+    """The shadow candidate if there is one, otherwise the active model."""
+    return crud.get_candidate_model(db) or crud.get_active_model(db)
@@ -1,15 +1,21 @@
 """SVM + Logistic Regression ensemble classifier for bug validity."""
+import os
+import threading
+import time
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import joblib
 from sklearn.svm import LinearSVC
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.calibration import CalibratedClassifierCV
-from sklearn.model_selection import cross_val_score
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, cross_val_score
+from sklearn.utils.class_weight import compute_class_weight
 
 from configs.config import config
+from src.ml.cascade import cascade_proba
 
 
 class BugClassifier:
@@ -17,25 +23,90 @@ class BugClassifier:
         self.model_path = model_path or config.ml.model_dir / "classifier.joblib"
         self.svm: Optional[CalibratedClassifierCV] = None
         self.lr: Optional[LogisticRegression] = None
+        # One-vs-rest LR half for incremental mode, updated by partial_fit between full fits
+        self.online: Optional[SGDClassifier] = None
+        # Id of the last human override folded into the model
+        self.folded_through = 0
         self.classes_: Optional[np.ndarray] = None
         self._load()
 
     def _load(self):
         if self.model_path.exists():
-            data = joblib.load(self.model_path)
+            data = joblib.load(self.model_path, mmap_mode="r" if config.ml.mmap_models else None)
             self.svm = data["svm"]
             self.lr = data["lr"]
+            self.online = data.get("online")
+            self.folded_through = data.get("folded_through", 0)
             self.classes_ = data["classes"]
 
     def _save(self):
+        # Replace rather than rewrite: the old file may be memory-mapped or registry-linked
         self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _writer_path(self.model_path)
         joblib.dump({
             "svm": self.svm,
             "lr": self.lr,
+            "online": self.online,
+            "folded_through": self.folded_through,
             "classes": self.classes_,
-        }, self.model_path)
+        }, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self.export()
+
+    @property
+    def compiled_path(self) -> Path:
+        return self.model_path.with_suffix(".npz")
+
+    def export(self, path: Optional[Path] = None) -> Path:
+        """Write the ensemble as plain arrays for ``CompiledEnsemble``."""
+        path = path or self.compiled_path
+        coef, intercept, a, b, folds, class_index = [], [], [], [], [], []
+        for fold, calibrated in enumerate(self.svm.calibrated_classifiers_):
+            svm = calibrated.estimator
+            # Binary SVMs have a single row scoring the positive class
+            rows = [1] if len(self.classes_) == 2 else np.searchsorted(self.classes_, svm.classes_)
+            for row, (cls, calibrator) in enumerate(zip(rows, calibrated.calibrators)):
+                coef.append(svm.coef_[row])
+                intercept.append(svm.intercept_[row])
+                a.append(calibrator.a_)
+                b.append(calibrator.b_)
+                folds.append(fold)
+                class_index.append(cls)
+
+        lr = self.online if self.online is not None else self.lr
+        if len(self.classes_) == 2:
+            lr_kind = "binary"
+        elif isinstance(lr, LogisticRegression):
+            lr_kind = "multinomial"
+        else:
+            lr_kind = "ovr"
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _writer_path(path)
+        np.savez(
+            tmp_path,
+            classes=self.classes_.astype(str),
+            svm_coef=np.array(coef), svm_intercept=np.array(intercept),
+            svm_a=np.array(a), svm_b=np.array(b),
+            svm_fold=np.array(folds), svm_class=np.array(class_index),
+            lr_coef=lr.coef_, lr_intercept=lr.intercept_, lr_kind=np.array(lr_kind),
+        )
+        os.replace(tmp_path, path)
+        return path
 
     def fit(self, X: np.ndarray, y: np.ndarray) -> dict:
+        start = time.perf_counter()
+        if config.ml.fast_training:
+            metrics = self._fit_fast(X, y)
+        else:
+            metrics = self._fit_full(X, y)
+
+        self.classes_ = np.unique(y)
+        self.online = self._online_start(X, y) if config.ml.incremental_learning else None
+        self._save()
+        return {**metrics, "training_samples": len(y), "fit_seconds": round(time.perf_counter() - start, 4)}
+
+    def _fit_full(self, X: np.ndarray, y: np.ndarray) -> dict:
         raw_svm = LinearSVC(max_iter=5000, class_weight="balanced")
         self.svm = CalibratedClassifierCV(raw_svm, cv=min(3, len(set(y))))
         self.svm.fit(X, y)
@@ -45,11 +116,8 @@ class BugClassifier:
         )
         self.lr.fit(X, y)
 
-        self.classes_ = np.unique(y)
-        self._save()
-
         # Evaluate
-        n_splits = min(5, min(np.bincount(np.searchsorted(self.classes_, y))))
+        n_splits = min(5, min(np.bincount(np.searchsorted(np.unique(y), y))))
         n_splits = max(2, n_splits)
         svm_scores = cross_val_score(
             CalibratedClassifierCV(LinearSVC(max_iter=5000, class_weight="balanced"), cv=min(3, len(set(y)))),
@@ -60,29 +128,125 @@ class BugClassifier:
         return {
             "svm_f1": float(np.mean(svm_scores)),
             "lr_f1": float(np.mean(lr_scores)),
-            "training_samples": len(y),
         }
 
+    def _fit_fast(self, X: np.ndarray, y: np.ndarray) -> dict:
+        """Fit once per fold and score on the folds the calibration already holds out.
+
+        The served models are the same as in ``_fit_full``; only the metrics
+        differ. SVM scores come from each fold's calibrated model on its own
+        held-out fold (the SVM never saw it, the sigmoid did), and LR scores
+        from out-of-fold predictions on the same folds.
+        """
+        n_jobs = config.ml.training_n_jobs
+        folds = list(StratifiedKFold(n_splits=min(3, len(set(y)))).split(X, y))
+
+        self.svm = CalibratedClassifierCV(
+            LinearSVC(max_iter=5000, class_weight="balanced"), cv=folds, n_jobs=n_jobs,
+        )
+        self.svm.fit(X, y)
+        svm_oof = np.empty(len(y), dtype=object)
+        for (_, test), calibrated in zip(folds, self.svm.calibrated_classifiers_):
+            proba = calibrated.predict_proba(X[test])
+            svm_oof[test] = self.svm.classes_[np.argmax(proba, axis=1)]
+
+        self.lr = LogisticRegression(max_iter=1000, class_weight="balanced")
+        lr_oof = cross_val_predict(self.lr, X, y, cv=folds, n_jobs=n_jobs)
+        self.lr.fit(X, y)
+
+        return {
+            "svm_f1": float(f1_score(y, svm_oof.astype(y.dtype), average="weighted")),
+            "lr_f1": float(f1_score(y, lr_oof, average="weighted")),
+        }
+
+    def _online_start(self, X: np.ndarray, y: np.ndarray) -> SGDClassifier:
+        """An SGD log-loss model that already predicts what its first zero-step update would.
+
+        SGD scores classes one-vs-rest, so the starting weights come from one
+        binary LR per class (one in total for two classes) rather than from
+        the multinomial LR. Both use the balanced class weights of the full
+        training set, and ``alpha`` is LR's L2 penalty per sample.
+        """
+        weights = dict(zip(self.classes_, compute_class_weight("balanced", classes=self.classes_, y=y)))
+        sample_weight = np.array([weights[label] for label in y])
+        positives = self.classes_[1:] if len(self.classes_) == 2 else self.classes_
+        coef, intercept = [], []
+        for cls in positives:
+            lr = LogisticRegression(max_iter=1000).fit(X, y == cls, sample_weight=sample_weight)
+            coef.append(lr.coef_[0])
+            intercept.append(lr.intercept_[0])
+
+        online = SGDClassifier(
+            loss="log_loss", learning_rate="constant", eta0=config.ml.incremental_learning_rate,
+            alpha=1.0 / len(y), class_weight=weights,
+        )
+        online.classes_ = self.classes_
+        online.coef_ = np.array(coef)
+        online.intercept_ = np.array(intercept)
+        return online
+
+    def partial_fit(self, X: np.ndarray, y: np.ndarray, folded_through: int) -> dict:
+        """Fold a batch of newly labeled samples into the model without refitting.
+
+        Updates the one-vs-rest LR half fitted alongside the ensemble when
+        ``incremental_learning`` is on; the calibrated SVM stays as fitted.
+        Labels the model has never seen need a full ``fit`` and are skipped.
+        """
+        if not self.is_trained:
+            raise RuntimeError("Classifier not trained. Call fit() first.")
+        if self.online is None:
+            raise RuntimeError("Classifier was fitted without incremental_learning. Call fit() first.")
+
+        known = np.isin(y, self.classes_)
+        if known.any():
+            if not self.online.coef_.flags.writeable:
+                # Loaded memory-mapped; SGD updates its weights in place
+                self.online.coef_ = np.array(self.online.coef_)
+                self.online.intercept_ = np.array(self.online.intercept_)
+            self.online.partial_fit(X[known], y[known], classes=self.classes_)
+
+        self.folded_through = folded_through
+        self._save()
+        return {"samples": int(known.sum()), "skipped": int((~known).sum())}
+
     def predict(self, X: np.ndarray) -> list[dict]:
         if self.svm is None or self.lr is None:
             raise RuntimeError("Classifier not trained. Call fit() first.")
 
         svm_proba = self.svm.predict_proba(X)
-        lr_proba = self.lr.predict_proba(X)
+        lr_proba = self._lr_proba(X)
 
         # Ensemble: average probabilities
         ensemble_proba = (svm_proba + lr_proba) / 2.0
+        return self._records(ensemble_proba)
+
+    def predict_cascade(self, X: np.ndarray, margin: Optional[float] = None) -> tuple[list[dict], dict]:
+        """Score with LR alone; only rows it is unsure about also go through the SVM.
+
+        Returns the predictions and the per-stage counters from ``cascade_proba``.
+        """
+        if self.svm is None or self.lr is None:
+            raise RuntimeError("Classifier not trained. Call fit() first.")
+        proba, stats = cascade_proba(
+            X, self._lr_proba, self.svm.predict_proba,
+            config.ml.cascade_margin if margin is None else margin,
+        )
+        return self._records(proba), stats
+
+    def _lr_proba(self, X: np.ndarray) -> np.ndarray:
+        return (self.online if self.online is not None else self.lr).predict_proba(X)
 
+    def _records(self, proba: np.ndarray) -> list[dict]:
         results = []
-        for i in range(len(X)):
-            pred_idx = np.argmax(ensemble_proba[i])
+        for i in range(proba.shape[0]):
+            pred_idx = np.argmax(proba[i])
             label = str(self.classes_[pred_idx])
-            confidence = float(ensemble_proba[i][pred_idx])
+            confidence = float(proba[i][pred_idx])
             results.append({
                 "classification": label,
                 "confidence": confidence,
                 "probabilities": {
-                    str(self.classes_[j]): float(ensemble_proba[i][j])
+                    str(self.classes_[j]): float(proba[i][j])
                     for j in range(len(self.classes_))
                 },
             })
@@ -94,3 +258,12 @@ class BugClassifier:
     @property
     def is_trained(self) -> bool:
         return self.svm is not None and self.lr is not None
+
+
+def _writer_path(path: Path) -> Path:
+    """Temporary file for one writer of ``path``.
+
+    Overrides, retrains and rescoring sweeps may save the same classifier
+    from different threads or worker processes at once.
+    """
+    return path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp{path.suffix}")
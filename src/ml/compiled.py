@@ -0,0 +1,105 @@
+"""NumPy-only inference for an exported SVM + LR ensemble.
+
+``BugClassifier.export`` writes the ensemble's weights and calibration
+parameters to an ``.npz`` file; ``CompiledEnsemble`` scores batches from it
+with a few matrix multiplies and never imports sklearn. Only scoring is
+covered: features still come from the pickled ``TfidfVectorizer``.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from src.ml.cascade import cascade_proba
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # tanh form avoids overflow in exp for large |x|
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class CompiledEnsemble:
+    """Exported ensemble weights.
+
+    SVM rows are stacked across calibration folds: row ``r`` belongs to fold
+    ``svm_fold[r]``, scores class ``svm_class[r]`` and is calibrated with
+    ``sigmoid(-(a[r] * d + b[r]))``, as in ``CalibratedClassifierCV``.
+    ``lr_kind`` is ``binary``, ``multinomial`` (LogisticRegression) or
+    ``ovr`` (the incremental SGD model).
+    """
+
+    def __init__(self, path: Path):
+        data = np.load(path, allow_pickle=False)
+        self.classes = data["classes"]
+        self.svm_coef = data["svm_coef"]
+        self.svm_intercept = data["svm_intercept"]
+        self.svm_a = data["svm_a"]
+        self.svm_b = data["svm_b"]
+        self.svm_fold = data["svm_fold"]
+        self.svm_class = data["svm_class"]
+        self.n_folds = int(self.svm_fold.max()) + 1
+        self.lr_coef = data["lr_coef"]
+        self.lr_intercept = data["lr_intercept"]
+        self.lr_kind = str(data["lr_kind"])
+
+    def svm_proba(self, X) -> np.ndarray:
+        n, k = X.shape[0], len(self.classes)
+        decision = np.asarray(X @ self.svm_coef.T) + self.svm_intercept
+        calibrated = _sigmoid(-(self.svm_a * decision + self.svm_b))
+        proba = np.zeros((n, self.n_folds, k))
+        proba[:, self.svm_fold, self.svm_class] = calibrated
+        if k == 2:
+            proba[:, :, 0] = 1.0 - proba[:, :, 1]
+        else:
+            total = proba.sum(axis=2, keepdims=True)
+            proba = np.divide(proba, total, out=np.full_like(proba, 1.0 / k), where=total != 0)
+        return proba.mean(axis=1)
+
+    def lr_proba(self, X) -> np.ndarray:
+        z = np.asarray(X @ self.lr_coef.T) + self.lr_intercept
+        if self.lr_kind == "binary":
+            positive = _sigmoid(z[:, 0])
+            return np.column_stack([1.0 - positive, positive])
+        if self.lr_kind == "multinomial":
+            return _softmax(z)
+        proba = _sigmoid(z)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> dict:
+        """Columnar predictions: labels, confidences and the (n, classes) probabilities."""
+        return self._columns((self.svm_proba(X) + self.lr_proba(X)) / 2.0)
+
+    def _columns(self, proba: np.ndarray) -> dict:
+        best = np.argmax(proba, axis=1)
+        return {
+            "classification": self.classes[best],
+            "confidence": proba[np.arange(len(best)), best],
+            "probabilities": proba,
+        }
+
+    def predict_cascade(self, X, margin: float) -> tuple[dict, dict]:
+        """Columnar predictions with LR first, as in ``BugClassifier.predict_cascade``."""
+        proba, stats = cascade_proba(X, self.lr_proba, self.svm_proba, margin)
+        return self._columns(proba), stats
+
+    def predict_records(self, X) -> list[dict]:
+        """The same rows ``BugClassifier.predict`` returns."""
+        return self.records(self.predict(X))
+
+    def records(self, columns: dict) -> list[dict]:
+        classes = [str(c) for c in self.classes]
+        return [
+            {
+                "classification": str(label),
+                "confidence": float(confidence),
+                "probabilities": dict(zip(classes, row.tolist())),
+            }
+            for label, confidence, row in zip(
+                columns["classification"], columns["confidence"], columns["probabilities"],
+            )
+        ]
@@ -1,57 +1,333 @@
 """Detect duplicate bug reports using cosine similarity on TF-IDF vectors."""
 import numpy as np
+import scipy.sparse as sp
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
 from configs.config import config
+from src.ml.minhash import MinHashLSH
+from src.ml.preprocessor import text_hash
+
+
+class _UnionFind:
+    """Disjoint sets over positions; the smallest position is always the root."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int):
+        a, b = self.find(i), self.find(j)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
 
 
 class DuplicateDetector:
-    def __init__(self, threshold: float | None = None):
+    def __init__(
+        self, threshold: float | None = None, block_size: int | None = None,
+        mode: str | None = None, lsh: MinHashLSH | None = None,
+        clustering: bool | None = None,
+    ):
         self.threshold = threshold or config.ml.duplicate_threshold
+        self.block_size = block_size or config.ml.duplicate_block_size
+        self.mode = mode or config.ml.duplicate_mode
+        self.clustering = config.ml.duplicate_clustering if clustering is None else clustering
+        self._lsh = lsh
+
+    @property
+    def lsh(self) -> MinHashLSH:
+        if self._lsh is None:
+            self._lsh = MinHashLSH()
+        return self._lsh
 
     def find_duplicates(
         self, vectors: np.ndarray, bug_ids: list[int],
+        texts: list[str] | None = None,
+        fingerprints: list[str | None] | None = None,
     ) -> list[dict]:
-        if len(vectors) < 2:
+        """Mark each bug as a duplicate of its most similar earlier non-duplicate.
+
+        When the preprocessed ``texts`` are given, verbatim re-filings are
+        resolved first by hashing, then bugs sharing a stack-trace fingerprint,
+        and only the remaining bugs are scored.
+        In ``exact`` mode rows are processed in blocks of ``block_size`` so peak
+        memory is one block x block similarity tile instead of the full n x n
+        matrix. In ``lsh`` mode only MinHash bucket-mates of each bug are scored.
+        With ``clustering`` enabled, see :meth:`find_clusters`.
+        """
+        n = vectors.shape[0]
+        if n < 2:
             return []
+        if texts is None and self.mode == "lsh":
+            raise ValueError("LSH duplicate mode needs the preprocessed texts")
+        if self.clustering:
+            return self.find_clusters(vectors, bug_ids, texts, fingerprints)
+
+        keep = list(range(n))
+        grouped = []
+        if texts is not None:
+            verbatim, keep = self.find_exact_duplicates(texts, bug_ids)
+            grouped += verbatim
+        if fingerprints is not None:
+            crashes, kept = self._group_by_key([fingerprints[i] for i in keep], [bug_ids[i] for i in keep])
+            grouped += [{**d, "match": "stack_trace"} for d in crashes]
+            keep = [keep[i] for i in kept]
+
+        similar = self._find_similar(
+            vectors[keep], [bug_ids[i] for i in keep],
+            [texts[i] for i in keep] if texts is not None else None,
+        )
 
-        sim_matrix = cosine_similarity(vectors)
-        np.fill_diagonal(sim_matrix, 0.0)
+        # A group follows its first member if that one turned out to be a
+        # duplicate; a chain is only as similar as its weakest link. The new
+        # original need not share the member's stack trace or text.
+        links = {d["bug_id"]: d for d in similar}
+        for dup in reversed(grouped):
+            target = links.get(dup["duplicate_of_id"])
+            if target:
+                dup["duplicate_of_id"] = target["duplicate_of_id"]
+                dup["similarity"] = min(dup["similarity"], target["similarity"])
+                dup.pop("match", None)
+            links[dup["bug_id"]] = dup
+
+        position = {bug_id: i for i, bug_id in enumerate(bug_ids)}
+        return sorted(grouped + similar, key=lambda d: position[d["bug_id"]])
+
+    def find_clusters(
+        self, vectors, bug_ids: list[int],
+        texts: list[str] | None = None,
+        fingerprints: list[str | None] | None = None,
+        pinned: dict[int, dict] | None = None,
+    ) -> list[dict]:
+        """Group bugs into connected components of above-threshold pairs.
+
+        Every pair above the threshold is a link, including pairs involving
+        bugs already known to be duplicates, so a family is never split or
+        chained. Each member is reported as a duplicate of its group's
+        earliest bug; ``similarity`` is the member's strongest text link into
+        the group. A member that shares the earliest bug's stack trace is
+        reported as a ``stack_trace`` match instead; one linked in only by its
+        crash mates gets their strongest text link.
+
+        ``pinned`` maps bug ids already matched to an original outside
+        ``bug_ids`` (an earlier cycle) to that match. They still link other
+        bugs in, and their whole group joins the earliest such original's
+        family; pinned bugs keep their own match.
+        """
+        n = vectors.shape[0]
+        groups = _UnionFind(n)
+        best = np.zeros(n)
+        position = {bug_id: i for i, bug_id in enumerate(bug_ids)}
+
+        def link(i: int, j: int, similarity: float):
+            groups.union(i, j)
+            for k in (i, j):
+                best[k] = max(best[k], similarity)
+
+        keep = list(range(n))
+        if texts is not None:
+            verbatim, keep = self.find_exact_duplicates(texts, bug_ids)
+            for d in verbatim:
+                link(position[d["bug_id"]], position[d["duplicate_of_id"]], 1.0)
+        if fingerprints is not None:
+            # Crash mates still get scored: their text can link other bugs in
+            crashes, _ = self._group_by_key([fingerprints[i] for i in keep], [bug_ids[i] for i in keep])
+            for d in crashes:
+                groups.union(position[d["bug_id"]], position[d["duplicate_of_id"]])
+
+        if len(keep) > 1:
+            for i, j, similarity in self._similar_pairs(
+                vectors[keep], [texts[i] for i in keep] if texts is not None else None,
+            ):
+                link(keep[i], keep[j], similarity)
+
+        crash_best: dict[str, float] = {}
+        if fingerprints is not None:
+            for i, f in enumerate(fingerprints):
+                if f:
+                    crash_best[f] = max(crash_best.get(f, 0.0), best[i])
+
+        pinned = pinned or {}
+        # Earlier original of each group with a pinned member, and the traces known to match it
+        prior: dict[int, int] = {}
+        prior_traces: set[tuple[int, str]] = set()
+        for bug_id, match in pinned.items():
+            root = groups.find(position[bug_id])
+            prior[root] = min(prior.get(root, match["duplicate_of_id"]), match["duplicate_of_id"])
+        for bug_id, match in pinned.items():
+            f = fingerprints[position[bug_id]] if fingerprints is not None else None
+            if f and match.get("match") == "stack_trace":
+                prior_traces.add((match["duplicate_of_id"], f))
 
         duplicates = []
-        marked_as_dup = set()
-        originals = set()
+        for i in range(n):
+            if bug_ids[i] in pinned:
+                duplicates.append(pinned[bug_ids[i]])
+                continue
+            root = groups.find(i)
+            f = fingerprints[i] if fingerprints is not None else None
+            if root in prior:
+                original = prior[root]
+                same_trace = (original, f) in prior_traces
+            elif root != i:
+                original = bug_ids[root]
+                same_trace = bool(f) and f == fingerprints[root]
+            else:
+                continue
+            dup = {"bug_id": bug_ids[i], "duplicate_of_id": original}
+            if same_trace:
+                dup.update(similarity=1.0, match="stack_trace")
+            else:
+                dup["similarity"] = float(best[i] or crash_best.get(f, 0.0))
+            duplicates.append(dup)
+        return duplicates
+
+    def _similar_pairs(self, vectors, texts: list[str] | None):
+        """Yield ``(i, j, similarity)`` for every pair ``j < i`` above the threshold."""
+        X = normalize(vectors)
+        if self.mode == "lsh":
+            for i, earlier in enumerate(self.lsh.candidates(self.lsh.signatures(texts))):
+                if earlier:
+                    sims = self._similarity_tile(X[[i]], X[earlier])[0]
+                    for j, sim in zip(earlier, sims):
+                        if sim > 0.0:
+                            yield i, j, float(sim)
+            return
+
+        n = X.shape[0]
+        for start in range(0, n, self.block_size):
+            rows = X[start:start + self.block_size]
+            for col_start in range(0, start + 1, self.block_size):
+                tile = self._similarity_tile(rows, X[col_start:col_start + self.block_size])
+                if col_start == start:
+                    tile = np.tril(tile, -1)
+                for k, j in zip(*np.nonzero(tile)):
+                    yield start + int(k), col_start + int(j), float(tile[k, j])
+
+    def find_exact_duplicates(
+        self, texts: list[str], bug_ids: list[int],
+    ) -> tuple[list[dict], list[int]]:
+        """Group bugs by a hash of their preprocessed text.
+
+        Returns the later members of each group as duplicates of the first
+        (similarity 1.0) and the positions of all remaining bugs.
+        """
+        return self._group_by_key([text_hash(t) if t else None for t in texts], bug_ids)
+
+    def _group_by_key(
+        self, keys: list[str | None], bug_ids: list[int],
+    ) -> tuple[list[dict], list[int]]:
+        first_seen: dict[str, int] = {}
+        duplicates = []
+        keep = []
+        for i, key in enumerate(keys):
+            if key is None:
+                keep.append(i)
+            elif key in first_seen:
+                duplicates.append({
+                    "bug_id": bug_ids[i],
+                    "duplicate_of_id": bug_ids[first_seen[key]],
+                    "similarity": 1.0,
+                })
+            else:
+                first_seen[key] = i
+                keep.append(i)
+        return duplicates, keep
+
+    def _find_similar(self, vectors, bug_ids: list[int], texts: list[str] | None) -> list[dict]:
+        if vectors.shape[0] < 2:
+            return []
+        if self.mode == "lsh":
+            return self._find_duplicates_lsh(vectors, bug_ids, texts)
+        return self._find_duplicates_blocked(vectors, bug_ids)
+
+    def _find_duplicates_blocked(self, vectors, bug_ids: list[int]) -> list[dict]:
+        n = vectors.shape[0]
+        X = normalize(vectors)
+        is_dup = np.zeros(n, dtype=bool)
+        duplicates = []
 
         # Process in order: later bugs are more likely to be duplicates of earlier ones
-        for i in range(len(vectors)):
-            if bug_ids[i] in marked_as_dup:
+        for start in range(0, n, self.block_size):
+            stop = min(start + self.block_size, n)
+            rows = X[start:stop]
+            best_sim = np.zeros(stop - start)
+            best_j = np.full(stop - start, -1)
+
+            # Earlier blocks are final, so their duplicates can be masked up front
+            for col_start in range(0, start, self.block_size):
+                col_stop = col_start + self.block_size
+                sims = self._similarity_tile(rows, X[col_start:col_stop])
+                sims[:, is_dup[col_start:col_stop]] = 0.0
+                block_j = np.argmax(sims, axis=1)
+                block_sim = sims[np.arange(len(block_j)), block_j]
+                better = block_sim > best_sim
+                best_sim[better] = block_sim[better]
+                best_j[better] = block_j[better] + col_start
+
+            # Within the block, earlier rows can become duplicates as we go
+            tile = self._similarity_tile(rows, rows)
+            has_candidates = np.tril(tile, -1).any(axis=1)
+            for k in range(stop - start):
+                if has_candidates[k]:
+                    sims = np.where(is_dup[start:start + k], 0.0, tile[k, :k])
+                    j = int(np.argmax(sims))
+                    if sims[j] > best_sim[k]:
+                        best_sim[k] = sims[j]
+                        best_j[k] = start + j
+
+                if best_sim[k] > 0.0 and best_j[k] >= 0:
+                    duplicates.append({
+                        "bug_id": bug_ids[start + k],
+                        "duplicate_of_id": bug_ids[best_j[k]],
+                        "similarity": float(best_sim[k]),
+                    })
+                    is_dup[start + k] = True
+
+        return duplicates
+
+    def _find_duplicates_lsh(
+        self, vectors: np.ndarray, bug_ids: list[int], texts: list[str],
+    ) -> list[dict]:
+        X = normalize(vectors)
+        candidates = self.lsh.candidates(self.lsh.signatures(texts))
+        is_dup = np.zeros(len(bug_ids), dtype=bool)
+        duplicates = []
+        for i, earlier in enumerate(candidates):
+            earlier = [j for j in earlier if not is_dup[j]]
+            if not earlier:
                 continue
-            # Only compare against earlier bugs that aren't already dups
-            best_sim = 0.0
-            best_j = -1
-            for j in range(i):
-                if bug_ids[j] in marked_as_dup:
-                    continue
-                if sim_matrix[i][j] > best_sim:
-                    best_sim = sim_matrix[i][j]
-                    best_j = j
-
-            if best_sim >= self.threshold and best_j >= 0:
+            # Exact re-scoring against the cosine threshold
+            sims = self._similarity_tile(X[[i]], X[earlier])[0]
+            best = int(np.argmax(sims))
+            if sims[best] > 0.0:
                 duplicates.append({
                     "bug_id": bug_ids[i],
-                    "duplicate_of_id": bug_ids[best_j],
-                    "similarity": float(best_sim),
+                    "duplicate_of_id": bug_ids[earlier[best]],
+                    "similarity": float(sims[best]),
                 })
-                marked_as_dup.add(bug_ids[i])
-                originals.add(bug_ids[best_j])
-
+                is_dup[i] = True
         return duplicates
 
+    def _similarity_tile(self, rows, cols) -> np.ndarray:
+        """Cosine similarities of normalized rows, zeroed below the threshold."""
+        sims = rows @ cols.T
+        sims = sims.toarray() if sp.issparse(sims) else np.array(sims, dtype=float)
+        sims[sims < self.threshold] = 0.0
+        return sims
+
     def check_single(
         self, vector: np.ndarray, existing_vectors: np.ndarray,
         existing_ids: list[int],
     ) -> dict | None:
-        if len(existing_vectors) == 0:
+        if existing_vectors.shape[0] == 0:
             return None
 
         sims = cosine_similarity(vector.reshape(1, -1), existing_vectors)[0]
@@ -0,0 +1,164 @@
+"""Persistent per-project index of summary vectors for cross-cycle duplicate lookup."""
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from configs.config import config
+from src.ml.duplicate_detector import DuplicateDetector
+
+
+class DuplicateIndex:
+    """Summary vectors of every non-duplicate bug already classified in a project.
+
+    The index is stored as one ``.npz`` file per project and tagged with the
+    feature-extractor version it was built from and the ``source`` database
+    rows it describes (see ``Pipeline._index_source``). Lookups only score rows that
+    share one of the query's heaviest terms: with unit-length vectors, a row
+    sharing none of them cannot reach the duplicate threshold. Dense
+    embeddings are kept as one contiguous float32 array and scored against
+    every row with a blocked matrix product instead.
+    """
+
+    def __init__(
+        self, project_id: int, index_dir: Optional[Path] = None,
+        detector: Optional[DuplicateDetector] = None,
+    ):
+        self.path = (index_dir or config.ml.model_dir / "duplicate_index") / f"project_{project_id}.npz"
+        self.detector = detector or DuplicateDetector()
+        self.version = ""
+        self.source = ""
+        self.vectors: sp.csr_matrix | np.ndarray = sp.csr_matrix((0, 0))
+        self.bug_ids = np.empty(0, dtype=np.int64)
+        self.cycle_ids = np.empty(0, dtype=np.int64)
+        self._postings: Optional[sp.csr_matrix] = None
+        self._load()
+
+    def _load(self):
+        if self.path.exists():
+            data = np.load(self.path, allow_pickle=False)
+            self.version = str(data["version"])
+            self.source = str(data["source"]) if "source" in data else ""
+            if "embeddings" in data:
+                self.vectors = data["embeddings"]
+            else:
+                self.vectors = sp.csr_matrix(
+                    (data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]),
+                )
+            self.bug_ids = data["bug_ids"]
+            self.cycle_ids = data["cycle_ids"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        if self.dense:
+            vectors = {"embeddings": self.vectors}
+        else:
+            vectors = {
+                "data": self.vectors.data, "indices": self.vectors.indices,
+                "indptr": self.vectors.indptr, "shape": np.array(self.vectors.shape),
+            }
+        np.savez(
+            tmp_path, version=np.array(self.version), source=np.array(self.source),
+            bug_ids=self.bug_ids, cycle_ids=self.cycle_ids, **vectors,
+        )
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.bug_ids)
+
+    @property
+    def dense(self) -> bool:
+        return isinstance(self.vectors, np.ndarray)
+
+    def reset(self, version: str, source: str = "", dense: bool = False):
+        """Drop all rows; used when the feature space or the database they describe changes.
+
+        ``dense`` indexes take dense embedding rows instead of sparse TF-IDF rows.
+        """
+        self.version = version
+        self.source = source
+        self.vectors = np.empty((0, 0), dtype=np.float32) if dense else sp.csr_matrix((0, 0))
+        self.bug_ids = np.empty(0, dtype=np.int64)
+        self.cycle_ids = np.empty(0, dtype=np.int64)
+        self._postings = None
+
+    def add(self, vectors, bug_ids: list[int], cycle_id: int):
+        """Insert or replace rows for ``bug_ids``."""
+        keep = ~np.isin(self.bug_ids, bug_ids)
+        if self.dense:
+            rows = np.asarray(vectors, dtype=np.float32)
+            if len(rows):
+                rows = normalize(rows)
+            existing = self.vectors[keep] if len(self) else rows[:0]
+            self.vectors = np.ascontiguousarray(np.vstack([existing, rows]), dtype=np.float32)
+        else:
+            rows = sp.csr_matrix(vectors)
+            if rows.shape[0]:
+                rows = normalize(rows)
+            existing = self.vectors[np.flatnonzero(keep)] if len(self) else rows[:0]
+            self.vectors = sp.vstack([existing, rows], format="csr")
+        self.bug_ids = np.concatenate([self.bug_ids[keep], np.asarray(bug_ids, dtype=np.int64)])
+        self.cycle_ids = np.concatenate([
+            self.cycle_ids[keep], np.full(len(bug_ids), cycle_id, dtype=np.int64),
+        ])
+        self._postings = None
+
+    def query(self, vectors, before_cycle_id: int) -> list[Optional[dict]]:
+        """Best match among bugs from cycles older than ``before_cycle_id``, per row."""
+        n = vectors.shape[0]
+        if not len(self) or n == 0:
+            return [None] * n
+        eligible = self.cycle_ids < before_cycle_id
+        if self.dense:
+            return self._query_dense(normalize(vectors), eligible)
+        if self._postings is None:
+            # Term -> rows lookup (the transpose of the row-major vectors)
+            self._postings = sp.csr_matrix(self.vectors.T)
+
+        queries = normalize(sp.csr_matrix(vectors))
+        results = []
+        for i in range(n):
+            candidates = self._candidates(queries[i])
+            candidates = candidates[eligible[candidates]]
+            if len(candidates) == 0:
+                results.append(None)
+                continue
+            results.append(self.detector.check_single(
+                queries[i], self.vectors[candidates], self.bug_ids[candidates].tolist(),
+            ))
+        return results
+
+    def _query_dense(self, queries: np.ndarray, eligible: np.ndarray) -> list[Optional[dict]]:
+        results = []
+        block_size = self.detector.block_size
+        for start in range(0, len(queries), block_size):
+            sims = queries[start:start + block_size].astype(np.float32) @ self.vectors.T
+            sims[:, ~eligible] = -1.0
+            best = np.argmax(sims, axis=1)
+            for j, sim in zip(best, sims[np.arange(len(best)), best]):
+                if sim >= self.detector.threshold:
+                    results.append({
+                        "duplicate_of_id": int(self.bug_ids[j]), "similarity": float(sim),
+                    })
+                else:
+                    results.append(None)
+        return results
+
+    def _candidates(self, query: sp.csr_matrix) -> np.ndarray:
+        order = np.argsort(query.data)[::-1]
+        weights = query.data[order]
+        # Norm of the terms left after each prefix; once it drops below the
+        # threshold, a row sharing none of the prefix terms cannot qualify.
+        suffix_norms = np.sqrt(np.cumsum((weights ** 2)[::-1])[::-1])
+        below = np.flatnonzero(suffix_norms < self.detector.threshold)
+        prefix = order[:below[0]] if len(below) else order
+        terms = query.indices[prefix]
+        terms = terms[terms < self._postings.shape[0]]
+        rows = [self._postings.indices[self._postings.indptr[t]:self._postings.indptr[t + 1]] for t in terms]
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(rows))
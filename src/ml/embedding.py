@@ -0,0 +1,44 @@
+"""Low-rank dense embeddings of TF-IDF rows for similarity search and storage."""
+import numpy as np
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+
+class SvdEmbedding:
+    """TruncatedSVD projection of TF-IDF rows onto unit-length float32 vectors.
+
+    Only the feature columns seen while fitting are kept: the SVD components
+    are zero on every other column, so a hashed feature space of 2**18
+    columns costs no more than the vocabulary it actually used.
+    """
+
+    def __init__(self, n_components: int):
+        self.n_components = n_components
+        self.columns = np.empty(0, dtype=np.int32)
+        self.components = np.empty((0, 0), dtype=np.float32)
+
+    def fit(self, X) -> "SvdEmbedding":
+        X = sp.csr_matrix(X)
+        self.columns = np.unique(X.indices).astype(np.int32)
+        X = X[:, self.columns]
+        n_components = min(self.n_components, min(X.shape) - 1)
+        if n_components < 1:
+            raise ValueError("Too few rows or terms to fit an embedding")
+        svd = TruncatedSVD(n_components=n_components, random_state=0).fit(X)
+        self.components = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        return self
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[1]
+
+    def transform(self, X) -> np.ndarray:
+        """Contiguous ``(n, dim)`` float32 rows with unit L2 norm (zero rows stay zero)."""
+        X = X[:, self.columns]
+        if sp.issparse(X):
+            X = X.astype(np.float32)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+        embedded = np.asarray(X @ self.components, dtype=np.float32)
+        return np.ascontiguousarray(normalize(embedded, copy=False))
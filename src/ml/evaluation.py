@@ -0,0 +1,219 @@
+"""Offline evaluation helpers used to tune ML settings against labeled data."""
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics import f1_score
+from sklearn.preprocessing import normalize
+
+from configs.config import config
+from src.ingest.parser import parse_upload
+from src.ml.classifier import BugClassifier
+from src.ml.duplicate_detector import DuplicateDetector
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.minhash import MinHashLSH
+from src.ml.training_set import TrainingSetManager
+
+
+def load_labeled_csv(paths: list[Path]) -> list[dict]:
+    """Read synthetic CSVs, keeping the ``_true_label`` column as ``label``."""
+    records = []
+    for path in paths:
+        rows, _ = parse_upload(path)
+        for row in rows:
+            records.append({
+                "summary": str(row.get("summary", "")),
+                "description": str(row.get("description", "")),
+                "created_date": str(row.get("created_date", "")),
+                "label": row.get("_true_label") or None,
+            })
+    return records
+
+
+def _pairs(duplicates: list[dict]) -> set[tuple[int, int]]:
+    return {(d["bug_id"], d["duplicate_of_id"]) for d in duplicates}
+
+
+def lsh_recall(
+    vectors, texts: list[str], bug_ids: list[int],
+    settings: list[tuple[int, int]], threshold: float | None = None,
+) -> list[dict]:
+    """Compare LSH mode against the exact detector for each ``(num_perm, bands)``.
+
+    ``pair_recall`` counts identical (bug, original) links; ``bug_recall``
+    counts bugs flagged as duplicates regardless of which original was chosen.
+    """
+    start = time.perf_counter()
+    exact = DuplicateDetector(threshold=threshold, mode="exact").find_duplicates(vectors, bug_ids)
+    exact_seconds = time.perf_counter() - start
+    exact_pairs = _pairs(exact)
+    exact_bugs = {bug_id for bug_id, _ in exact_pairs}
+
+    results = []
+    for num_perm, bands in settings:
+        lsh = MinHashLSH(num_perm=num_perm, bands=bands)
+        detector = DuplicateDetector(threshold=threshold, mode="lsh", lsh=lsh)
+        start = time.perf_counter()
+        found = detector.find_duplicates(vectors, bug_ids, texts=texts)
+        seconds = time.perf_counter() - start
+        found_pairs = _pairs(found)
+        found_bugs = {bug_id for bug_id, _ in found_pairs}
+        candidates = sum(len(c) for c in lsh.candidates(lsh.signatures(texts)))
+        results.append({
+            "num_perm": num_perm,
+            "bands": bands,
+            "rows_per_band": num_perm // bands,
+            "exact_duplicates": len(exact_pairs),
+            "lsh_duplicates": len(found_pairs),
+            "pair_recall": round(len(found_pairs & exact_pairs) / len(exact_pairs), 4) if exact_pairs else 1.0,
+            "bug_recall": round(len(found_bugs & exact_bugs) / len(exact_bugs), 4) if exact_bugs else 1.0,
+            "candidate_pairs": candidates,
+            "seconds": round(seconds, 4),
+            "exact_seconds": round(exact_seconds, 4),
+        })
+    return results
+
+
+def best_earlier_similarity(vectors, block_size: int | None = None) -> np.ndarray:
+    """Cosine similarity of each row to its most similar earlier row (0.0 for the first)."""
+    block_size = block_size or config.ml.duplicate_block_size
+    X = normalize(vectors)
+    n = X.shape[0]
+    best = np.zeros(n)
+    for start in range(0, n, block_size):
+        rows = X[start:start + block_size]
+        for col_start in range(0, start + 1, block_size):
+            tile = rows @ X[col_start:col_start + block_size].T
+            tile = tile.toarray() if sp.issparse(tile) else np.asarray(tile, dtype=float)
+            if col_start == start:
+                tile = np.tril(tile, -1)
+            np.maximum(best[start:start + len(tile)], tile.max(axis=1), out=best[start:start + len(tile)])
+    return best
+
+
+def threshold_sweep(
+    vectors, labels: list[str | None], thresholds: list[float],
+    block_size: int | None = None,
+) -> list[dict]:
+    """Duplicate count and precision/recall at every threshold from one scoring pass.
+
+    A bug is counted as flagged at threshold ``t`` when some earlier bug is at
+    least ``t`` similar. That is exact for clustering mode; pairwise mode can
+    differ slightly where the nearest earlier bug was itself a duplicate.
+    Precision and recall only consider bugs with a label (``None`` = unreviewed).
+    """
+    best = best_earlier_similarity(vectors, block_size)
+    is_dup = np.array([label == "duplicate" for label in labels], dtype=bool)
+    labeled = np.array([label is not None for label in labels], dtype=bool)
+    order = np.argsort(-best, kind="stable")
+    descending = best[order]
+    true_positives = np.concatenate([[0], np.cumsum(is_dup[order])])
+    labeled_flagged = np.concatenate([[0], np.cumsum(labeled[order])])
+    total_duplicates = int(is_dup.sum())
+
+    results = []
+    for t in sorted(thresholds):
+        flagged = int(np.searchsorted(-descending, -t, side="right"))
+        tp = int(true_positives[flagged])
+        precision = tp / labeled_flagged[flagged] if labeled_flagged[flagged] else 0.0
+        recall = tp / total_duplicates if total_duplicates else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        results.append({
+            "threshold": round(t, 4),
+            "duplicates": flagged,
+            "true_positives": tp,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+        })
+    return results
+
+
+def training_cap_report(
+    texts: list[str], labels: list[str], ages: np.ndarray, caps: list[int],
+    overrides: Optional[list[bool]] = None, holdout_fraction: float = 0.2, **manager_options,
+) -> list[dict]:
+    """Weighted F1 on the most recent reviews when training on a capped sample of the rest.
+
+    The newest ``holdout_fraction`` of rows (smallest ``ages``) is held out;
+    for each cap the ``TrainingSetManager`` picks from the older rows and a
+    fresh vectorizer and classifier are fit on its choice. ``cap = 0`` uses
+    every older row. ``overrides`` marks rows whose human label differed
+    from the model's; without it every recent row counts as an override.
+    """
+    labels = np.asarray(labels)
+    order = np.argsort(ages, kind="stable")
+    n_test = max(1, int(len(order) * holdout_fraction))
+    test, pool = order[:n_test], order[n_test:]
+    # Ages relative to the newest training row, as they were when it was reviewed
+    pool_ages = np.asarray(ages, dtype=float)[pool] - float(np.min(np.asarray(ages)[pool]))
+
+    results = []
+    for cap in caps:
+        chosen, stats = TrainingSetManager(cap=cap, **manager_options).select(
+            labels[pool], pool_ages, None if overrides is None else np.asarray(overrides)[pool],
+        )
+        train = pool[chosen]
+        with tempfile.TemporaryDirectory() as tmp:
+            extractor = FeatureExtractor(model_path=Path(tmp) / "tfidf.joblib")
+            classifier = BugClassifier(model_path=Path(tmp) / "classifier.joblib")
+            start = time.perf_counter()
+            X = extractor.fit_transform([texts[i] for i in train])
+            classifier.fit(X, labels[train])
+            seconds = time.perf_counter() - start
+            predicted = [p["classification"] for p in classifier.predict(extractor.transform([texts[i] for i in test]))]
+        results.append({
+            "cap": cap or "all",
+            "training_samples": len(train),
+            "recent_kept": stats["recent"],
+            "test_samples": n_test,
+            "f1": round(float(f1_score(labels[test], predicted, average="weighted")), 4),
+            "fit_seconds": round(seconds, 4),
+        })
+    return results
+
+
+def feature_selection_report(
+    texts: list[str], labels: list[str], sizes: list[int], method: str = "chi2",
+    holdout_fraction: float = 0.2,
+) -> list[dict]:
+    """Model size, predict latency and weighted F1 at each selected vocabulary size.
+
+    A fixed random ``holdout_fraction`` of rows is held out. For each size a
+    fresh vectorizer is fit on the rest, pruned to that many terms by
+    ``method`` and used to fit a classifier; ``size = 0`` keeps the full
+    vocabulary. ``model_kb`` is the saved vectorizer plus classifier.
+    """
+    labels = np.asarray(labels)
+    order = np.random.default_rng(0).permutation(len(texts))
+    n_test = max(1, int(len(order) * holdout_fraction))
+    test, train = order[:n_test], order[n_test:]
+    train_texts, test_texts = [texts[i] for i in train], [texts[i] for i in test]
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            extractor = FeatureExtractor(model_path=Path(tmp) / "tfidf.joblib")
+            classifier = BugClassifier(model_path=Path(tmp) / "classifier.joblib")
+            start = time.perf_counter()
+            X = extractor.fit_transform(train_texts)
+            if size:
+                X = extractor.select_features(X, labels[train], k=size, method=method)
+            classifier.fit(X, labels[train])
+            fit_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            predicted = [p["classification"] for p in classifier.predict(extractor.transform(test_texts))]
+            predict_seconds = time.perf_counter() - start
+            model_bytes = extractor.model_path.stat().st_size + classifier.model_path.stat().st_size
+        results.append({
+            "features": extractor.n_features,
+            "method": method if size else "none",
+            "model_kb": round(model_bytes / 1024, 1),
+            "fit_seconds": round(fit_seconds, 4),
+            "predict_ms_per_bug": round(predict_seconds * 1000 / n_test, 4),
+            "f1": round(float(f1_score(labels[test], predicted, average="weighted")), 4),
+        })
+    return results
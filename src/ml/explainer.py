@@ -1,5 +1,6 @@
 """Feature-importance explanations for bug classifications."""
 import numpy as np
+import scipy.sparse as sp
 from typing import Optional
 
 
@@ -11,17 +12,24 @@ class ClassificationExplainer:
         self, tfidf_vector: np.ndarray, classification: str,
         probabilities: dict, top_n: int = 5,
     ) -> str:
-        nonzero_indices = np.nonzero(tfidf_vector)[0] if tfidf_vector.ndim == 1 else np.nonzero(tfidf_vector[0])[0]
-        vec = tfidf_vector.flatten()
+        if sp.issparse(tfidf_vector):
+            row = sp.csr_matrix(tfidf_vector)
+            row.sort_indices()
+            nonzero_indices, weights = row.indices, row.data
+        else:
+            vec = tfidf_vector.flatten()
+            nonzero_indices = np.nonzero(vec)[0]
+            weights = vec[nonzero_indices]
 
         if len(nonzero_indices) == 0:
             return f"Classified as '{classification}' with confidence {probabilities.get(classification, 0):.0%}. No significant text features detected."
 
-        top_indices = nonzero_indices[np.argsort(vec[nonzero_indices])[::-1][:top_n]]
+        top_positions = np.argsort(weights)[::-1][:top_n]
         top_features = []
-        for idx in top_indices:
+        for pos in top_positions:
+            idx = nonzero_indices[pos]
             if idx < len(self.feature_names):
-                top_features.append((self.feature_names[idx], float(vec[idx])))
+                top_features.append((self.feature_names[idx], float(weights[pos])))
 
         conf = probabilities.get(classification, 0)
         feature_strs = [f"'{f}' ({w:.3f})" for f, w in top_features]
@@ -38,6 +46,13 @@ class ClassificationExplainer:
 
         return explanation
 
+    def explain_crash_duplicate(self, duplicate_summary: str) -> str:
+        return (
+            f"Marked as DUPLICATE: same stack trace as '{duplicate_summary[:80]}...'"
+            if len(duplicate_summary) > 80
+            else f"Marked as DUPLICATE: same stack trace as '{duplicate_summary}'"
+        )
+
     def explain_duplicate(
         self, bug_summary: str, duplicate_summary: str,
         similarity: float,
@@ -1,50 +1,430 @@
 """TF-IDF feature extraction for bug reports."""
+import hashlib
+import os
+import threading
+from collections import Counter
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import joblib
+import scipy.sparse as sp
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import chi2
+from sklearn.preprocessing import normalize
+from sqlalchemy.orm import Session
 
 from configs.config import config
+from src.db import crud
+from src.ml.embedding import SvdEmbedding
+from src.ml.hashing import HashingTfidf
 
 
 class FeatureExtractor:
-    def __init__(self, model_path: Optional[Path] = None):
+    """Fits and applies the TF-IDF vocabulary.
+
+    With ``sparse=True`` (default ``config.ml.sparse_features``) matrices are
+    returned as CSR so memory scales with nonzeros rather than n x vocabulary.
+    With ``feature_mode = "hashing"`` terms are hashed into a fixed feature
+    space (always sparse) and only document frequencies are learned.
+    ``select_features`` can then prune the vocabulary to the terms that best
+    separate the training labels.
+    With ``embedding_dim > 0`` a TruncatedSVD embedding is fitted alongside
+    the vectorizer for duplicate search (see ``similarity_vectors``).
+    """
+
+    def __init__(self, model_path: Optional[Path] = None, sparse: Optional[bool] = None):
         self.model_path = model_path or config.ml.model_dir / "tfidf_vectorizer.joblib"
-        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.hashing = config.ml.feature_mode == "hashing"
+        self.sparse = self.hashing or (config.ml.sparse_features if sparse is None else sparse)
+        self.vectorizer: Optional[TfidfVectorizer | HashingTfidf] = None
+        self.embedding: Optional[SvdEmbedding] = None
+        self._update_lock = threading.Lock()
         self._load()
 
     def _load(self):
         if self.model_path.exists():
-            self.vectorizer = joblib.load(self.model_path)
+            data = joblib.load(
+                self.model_path, mmap_mode="r" if config.ml.mmap_models else None,
+            )
+            # Saved with an embedding, the file holds both parts
+            if isinstance(data, dict):
+                self.vectorizer, self.embedding = data["vectorizer"], data["embedding"]
+            else:
+                self.vectorizer = data
 
-    def fit(self, texts: list[str]) -> "FeatureExtractor":
-        self.vectorizer = TfidfVectorizer(
-            max_features=config.ml.tfidf_max_features,
-            ngram_range=config.ml.tfidf_ngram_range,
-            sublinear_tf=True,
-            strip_accents="unicode",
+    def _dump(self):
+        # Replace rather than rewrite: the old file may be memory-mapped or registry-linked
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per process: in hashing mode every worker saves merged document counts
+        tmp_path = self.model_path.with_suffix(f".{os.getpid()}.tmp.joblib")
+        joblib.dump(
+            self.vectorizer if self.embedding is None
+            else {"vectorizer": self.vectorizer, "embedding": self.embedding},
+            tmp_path,
         )
+        os.replace(tmp_path, self.model_path)
+
+    def fit(self, texts: list[str]) -> "FeatureExtractor":
+        self.fit_transform(texts)
+        return self
+
+    def fit_transform(self, texts: list[str]) -> np.ndarray | sp.csr_matrix:
+        if self.hashing:
+            self.vectorizer = HashingTfidf(
+                config.ml.hashing_n_features, config.ml.tfidf_ngram_range,
+            )
+        else:
+            self.vectorizer = TfidfVectorizer(
+                max_features=config.ml.tfidf_max_features,
+                ngram_range=config.ml.tfidf_ngram_range,
+                sublinear_tf=True,
+                strip_accents="unicode",
+            )
         self.vectorizer.fit(texts)
-        self.model_path.parent.mkdir(parents=True, exist_ok=True)
-        joblib.dump(self.vectorizer, self.model_path)
+        X = self.vectorizer.transform(texts)
+        self._fit_embedding(X)
+        self._dump()
+        return self._output(X)
+
+    def _fit_embedding(self, X: sp.csr_matrix):
+        self.embedding = None
+        if config.ml.embedding_dim > 0 and min(X.shape) > 1 and X.nnz:
+            self.embedding = SvdEmbedding(config.ml.embedding_dim).fit(X)
+
+    def select_features(
+        self, X, labels, k: Optional[int] = None, method: Optional[str] = None,
+    ) -> np.ndarray | sp.csr_matrix:
+        """Keep the ``k`` terms that best separate ``labels`` and return ``X`` restricted to them.
+
+        ``X`` must be the output of the last fit. Terms are ranked by chi² or
+        by the mutual information of term presence, and the vectorizer is
+        replaced by one with the pruned vocabulary and IDF weights, so the
+        returned rows equal ``transform`` of the training texts. A no-op with
+        ``method = "none"`` and in hashing mode, whose columns are fixed buckets.
+        """
+        method = method or config.ml.feature_selection
+        k = k or config.ml.selected_features
+        if method == "none" or self.supports_partial_fit or k >= self.n_features:
+            return X
+        if method == "chi2":
+            scores, _ = chi2(X, labels)
+        elif method == "mutual_info":
+            scores = _presence_mutual_info(X, labels)
+        else:
+            raise ValueError(f"Unknown feature selection method: {method}")
+
+        ranked = np.argsort(-np.nan_to_num(scores), kind="stable")
+        keep = np.sort(ranked[:k])
+        terms = self.vectorizer.get_feature_names_out()[keep]
+        pruned = clone(self.vectorizer).set_params(vocabulary={t: i for i, t in enumerate(terms)})
+        pruned.idf_ = self.vectorizer.idf_[keep]
+        self.vectorizer = pruned
+
+        X = X[:, keep]
+        if pruned.norm is not None:
+            X = normalize(X, norm=pruned.norm)
+        self._fit_embedding(sp.csr_matrix(X))
+        self._dump()
+        return X
+
+    def partial_fit(self, texts: list[str]) -> "FeatureExtractor":
+        """Add documents to the running IDF statistics (hashing mode only).
+
+        Only this process sees them; use ``record_documents`` where several
+        worker processes share the vectorizer file.
+        """
+        if not self.supports_partial_fit:
+            raise RuntimeError("partial_fit needs a fitted extractor in hashing feature mode.")
+        with self._update_lock:
+            self.vectorizer.partial_fit(texts)
+            self._dump()
         return self
 
-    def transform(self, texts: list[str]) -> np.ndarray:
+    def record_documents(self, db: Session, texts: list[str]) -> "FeatureExtractor":
+        """Add documents to the IDF statistics of every process sharing this fit (hashing mode only).
+
+        The increments are logged in the database rather than written into
+        the vectorizer file, so concurrent workers never overwrite each
+        other's counts; each one merges the log in ``refresh_documents``.
+        """
+        if not self.supports_partial_fit:
+            raise RuntimeError("record_documents needs a fitted extractor in hashing feature mode.")
+        n_docs, increments, terms = self.vectorizer.increments(texts)
+        indices = np.flatnonzero(increments)
+        crud.create_document_frequency_update(
+            db, self.vectorizer.generation, n_docs,
+            {"indices": indices.tolist(), "values": increments[indices].tolist()},
+            {str(b): term for b, term in terms.items()},
+        )
+        self.refresh_documents(db)
+        return self
+
+    def refresh_documents(self, db: Session) -> int:
+        """Merge document counts logged since this process last looked; returns how many updates.
+
+        The file is saved together with the id of the last update it
+        includes, so whichever worker's save wins, a reload replays the rest.
+        """
+        if not self.supports_partial_fit:
+            return 0
+        with self._update_lock:
+            vectorizer = self.vectorizer
+            updates = crud.get_document_frequency_updates(
+                db, vectorizer.generation, vectorizer.applied_through,
+            )
+            if not updates:
+                return 0
+            increments = np.zeros(vectorizer.n_features, dtype=np.int64)
+            terms = {}
+            for update in updates:
+                np.add.at(increments, update.counts_json["indices"], update.counts_json["values"])
+                for b, term in update.terms_json.items():
+                    terms.setdefault(int(b), term)
+            vectorizer.add(
+                sum(u.n_documents for u in updates), increments, terms,
+                applied_through=updates[-1].id,
+            )
+            self._dump()
+        return len(updates)
+
+    def fit_counts(self, counts: sp.csr_matrix) -> np.ndarray | sp.csr_matrix:
+        """Restart the IDF statistics from stored term counts and weight them (hashing mode only).
+
+        The counts must come from this hashed feature space, e.g. from ``counts``.
+        """
+        if not self.supports_partial_fit:
+            raise RuntimeError("fit_counts needs a fitted extractor in hashing feature mode.")
+        with self._update_lock:
+            self.vectorizer.fit_counts(counts)
+            X = self._weight(sp.csr_matrix(counts, dtype=self.vectorizer.dtype, copy=True))
+            self._fit_embedding(X)
+            self._dump()
+        return self._output(X)
+
+    @property
+    def supports_partial_fit(self) -> bool:
+        return isinstance(self.vectorizer, HashingTfidf)
+
+    def transform(self, texts: list[str]) -> np.ndarray | sp.csr_matrix:
+        if self.vectorizer is None:
+            raise RuntimeError("Vectorizer not fitted. Call fit() first.")
+        return self._output(self.vectorizer.transform(texts))
+
+    def transform_pair(
+        self, full_texts: list[str], summary_texts: list[str],
+    ) -> tuple[np.ndarray | sp.csr_matrix, np.ndarray | sp.csr_matrix]:
+        """Vectorize full texts and summary-only texts from shared token streams.
+
+        Equivalent to ``(transform(full_texts), transform(summary_texts))``, but
+        when a full text starts with its summary the summary is tokenized once
+        and only the remainder plus the n-grams spanning the join are added.
+        """
         if self.vectorizer is None:
             raise RuntimeError("Vectorizer not fitted. Call fit() first.")
-        return self.vectorizer.transform(texts).toarray()
 
-    def fit_transform(self, texts: list[str]) -> np.ndarray:
-        self.fit(texts)
-        return self.vectorizer.transform(texts).toarray()
+        preprocess = self.vectorizer.build_preprocessor()
+        tokenize = self.vectorizer.build_tokenizer()
+        min_n, max_n = self.vectorizer.ngram_range
+
+        full_terms, summary_terms = [], []
+        for full, summary in zip(full_texts, summary_texts):
+            summary_tokens = tokenize(preprocess(summary))
+            terms = _word_ngrams(summary_tokens, min_n, max_n)
+            summary_terms.append(terms)
+            if full == summary:
+                full_terms.append(terms)
+            elif summary and full.startswith(summary + " "):
+                rest_tokens = tokenize(preprocess(full[len(summary) + 1:]))
+                full_terms.append(
+                    terms + _word_ngrams(rest_tokens, min_n, max_n)
+                    + _joining_ngrams(summary_tokens, rest_tokens, min_n, max_n)
+                )
+            else:
+                full_terms.append(_word_ngrams(tokenize(preprocess(full)), min_n, max_n))
+
+        return (
+            self._output(self._weight(self._count(full_terms))),
+            self._output(self._weight(self._count(summary_terms))),
+        )
+
+    def counts(self, texts: list[str]) -> sp.csr_matrix:
+        """Raw term counts in the fitted feature space, before TF-IDF weighting."""
+        if self.vectorizer is None:
+            raise RuntimeError("Vectorizer not fitted. Call fit() first.")
+        analyze = self.vectorizer.build_analyzer()
+        return self._count([analyze(text) for text in texts])
+
+    def weigh(self, counts: sp.csr_matrix) -> np.ndarray | sp.csr_matrix:
+        """TF-IDF vectors from ``counts``; ``weigh(counts(t))`` equals ``transform(t)``."""
+        X = sp.csr_matrix(counts, dtype=self.vectorizer.dtype, copy=True)
+        return self._output(self._weight(X))
+
+    def _output(self, X: sp.csr_matrix) -> np.ndarray | sp.csr_matrix:
+        return sp.csr_matrix(X) if self.sparse else X.toarray()
+
+    def _count(self, documents: list[list[str]]) -> sp.csr_matrix:
+        if self.supports_partial_fit:
+            bucket = self.vectorizer.bucket
+            columns = (lambda terms: (bucket(t) for t in terms))
+        else:
+            vocabulary = self.vectorizer.vocabulary_
+            columns = (lambda terms: (vocabulary[t] for t in terms if t in vocabulary))
+        indices, values, indptr = [], [], [0]
+        for terms in documents:
+            counts = Counter(columns(terms))
+            indices.extend(counts.keys())
+            values.extend(counts.values())
+            indptr.append(len(indices))
+        X = sp.csr_matrix(
+            (np.asarray(values, dtype=np.intc), np.asarray(indices, dtype=np.int32), indptr),
+            shape=(len(documents), self.n_features), dtype=self.vectorizer.dtype,
+        )
+        X.sort_indices()
+        return X
+
+    def _weight(self, X: sp.csr_matrix) -> sp.csr_matrix:
+        """Apply the fitted TF-IDF weighting exactly as TfidfVectorizer.transform does."""
+        if self.vectorizer.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.vectorizer.use_idf:
+            X.data *= self.vectorizer.idf_[X.indices]
+        if self.vectorizer.norm is not None:
+            X = normalize(X, norm=self.vectorizer.norm, copy=False)
+        return X
+
+    def embed(self, X) -> np.ndarray:
+        """Dense unit-length float32 embeddings of feature rows."""
+        if self.embedding is None:
+            raise RuntimeError("No embedding fitted. Set embedding_dim and refit.")
+        return self.embedding.transform(X)
+
+    def similarity_vectors(self, X):
+        """The rows duplicate search compares: embeddings if fitted, else ``X`` itself."""
+        return X if self.embedding is None else self.embed(X)
 
     @property
     def is_fitted(self) -> bool:
         return self.vectorizer is not None
 
-    def get_feature_names(self) -> list[str]:
+    @property
+    def n_features(self) -> int:
+        if self.vectorizer is None:
+            return 0
+        if self.supports_partial_fit:
+            return self.vectorizer.n_features
+        return len(self.vectorizer.vocabulary_)
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the fitted feature space; changes whenever it is refit."""
+        if self.vectorizer is None:
+            return ""
+        if getattr(self, "_version_of", None) is not self.vectorizer:
+            digest = hashlib.sha1()
+            if self.supports_partial_fit:
+                # Hashed columns never move, so stored counts stay valid. IDF
+                # drift from uploads is deliberately left out: see idf_version
+                digest.update(f"hashing {self.vectorizer.n_features} {self.vectorizer.ngram_range}".encode())
+            else:
+                digest.update(" ".join(self.vectorizer.get_feature_names_out()).encode())
+                digest.update(self.vectorizer.idf_.tobytes())
+            self._version = digest.hexdigest()[:16]
+            self._version_of = self.vectorizer
+        return self._version
+
+    @property
+    def idf_version(self) -> str:
+        """Fingerprint of the feature space and its current IDF weights.
+
+        Equals ``version`` except in hashing mode, where every upload moves
+        the IDF without changing ``version``.
+        """
+        if not self.supports_partial_fit:
+            return self.version
+        counts = self.vectorizer.counts
+        cached = getattr(self, "_idf_version", None)
+        # One tuple, like the counts themselves, so a concurrent upload cannot mismatch the pair
+        if cached is None or cached[0] is not counts:
+            n_docs, df = counts
+            digest = hashlib.sha1(f"{self.version} {n_docs}".encode())
+            digest.update(df.tobytes())
+            cached = self._idf_version = (counts, digest.hexdigest()[:16])
+        return cached[1]
+
+    @property
+    def similarity_version(self) -> str:
+        """Fingerprint of the space ``similarity_vectors`` returns."""
+        if self.embedding is None:
+            return self.version
+        if getattr(self, "_similarity_version_of", None) is not self.embedding:
+            digest = hashlib.sha1(self.version.encode())
+            digest.update(np.ascontiguousarray(self.embedding.components).tobytes())
+            self._similarity_version = digest.hexdigest()[:16]
+            self._similarity_version_of = self.embedding
+        return self._similarity_version
+
+    def get_feature_names(self) -> Sequence[str]:
         if self.vectorizer is None:
             return []
+        if self.supports_partial_fit:
+            return self.vectorizer.get_feature_names_out()
         return list(self.vectorizer.get_feature_names_out())
+
+
+def vector_to_json(vector) -> list | dict:
+    """Serialize one feature row for ``BugReport.tfidf_vector_json``.
+
+    Dense rows are stored as a plain list; sparse rows keep only their
+    nonzeros as ``{"size", "indices", "values"}``.
+    """
+    if sp.issparse(vector):
+        row = sp.csr_matrix(vector)
+        return {
+            "size": row.shape[1],
+            "indices": row.indices.tolist(),
+            "values": row.data.tolist(),
+        }
+    return np.asarray(vector).ravel().tolist()
+
+
+def _presence_mutual_info(X, labels) -> np.ndarray:
+    """Mutual information (nats) between each term's presence and the label."""
+    classes, y = np.unique(labels, return_inverse=True)
+    presence = (sp.csr_matrix(X) > 0).astype(np.float64)
+    onehot = sp.csr_matrix((np.ones(len(y)), (np.arange(len(y)), y)), shape=(len(y), len(classes)))
+    n = len(y)
+    # Joint counts of (term present, class) and (term absent, class), terms x classes
+    present = np.asarray((presence.T @ onehot).todense())
+    absent = np.bincount(y, minlength=len(classes)) - present
+    term = present.sum(axis=1, keepdims=True)
+    label = present + absent
+    scores = np.zeros(presence.shape[1])
+    for joint, marginal in ((present, term), (absent, n - term)):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terms = joint / n * np.log(joint * n / (marginal * label))
+        scores += np.nansum(terms, axis=1)
+    return scores
+
+
+def _word_ngrams(tokens: list[str], min_n: int, max_n: int) -> list[str]:
+    terms = []
+    for n in range(min_n, min(max_n, len(tokens)) + 1):
+        for i in range(len(tokens) - n + 1):
+            terms.append(" ".join(tokens[i:i + n]))
+    return terms
+
+
+def _joining_ngrams(left: list[str], right: list[str], min_n: int, max_n: int) -> list[str]:
+    """N-grams of ``left + right`` that start in ``left`` and end in ``right``."""
+    tail, head = left[-(max_n - 1):] if max_n > 1 else [], right[:max_n - 1]
+    window = tail + head
+    terms = []
+    for n in range(max(min_n, 2), max_n + 1):
+        for i in range(len(tail)):
+            if i + n > len(tail) and i + n <= len(window):
+                terms.append(" ".join(window[i:i + n]))
+    return terms
@@ -0,0 +1,112 @@
+"""Stored per-bug features, keyed by bug and feature-extractor version."""
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.orm import Session
+
+from configs.config import config
+from src.db import crud
+from src.db.models import BugReport
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug
+
+
+class FeatureStore:
+    """Preprocessed texts and term counts of bugs, so retraining and rescoring skip the text work.
+
+    Rows are keyed by bug id and ``FeatureExtractor.version``. Raw counts are
+    stored rather than weighted vectors, so they stay exact while hashing-mode
+    IDF drifts; every read weights them with the current statistics. When the
+    version changes, bugs are re-counted from their stored text.
+    """
+
+    def __init__(self, feature_extractor: FeatureExtractor, batch_size: Optional[int] = None):
+        self.feature_extractor = feature_extractor
+        self.batch_size = batch_size or config.ml.feature_store_batch_size
+
+    def texts(self, db: Session, bugs: list[BugReport]) -> list[str]:
+        """Preprocessed texts, from any stored version when available."""
+        stored = crud.get_stored_texts(db, [b.id for b in bugs])
+        return [
+            stored[b.id] if b.id in stored else preprocess_bug(b.summary, b.description)
+            for b in bugs
+        ]
+
+    def counts(
+        self, db: Session, bugs: list[BugReport], texts: Optional[list[str]] = None,
+    ) -> sp.csr_matrix:
+        """Term counts of ``bugs`` in the current feature space; missing rows are computed and stored."""
+        version = self.feature_extractor.version
+        # Read ids up front: storing commits, which may expire the bug objects
+        bug_ids = [b.id for b in bugs]
+        stored = crud.get_bug_features(db, bug_ids, version)
+        missing = [i for i, bug_id in enumerate(bug_ids) if bug_id not in stored]
+        if missing:
+            missing_texts = (
+                [texts[i] for i in missing] if texts else self.texts(db, [bugs[i] for i in missing])
+            )
+            counts = self.feature_extractor.counts(missing_texts)
+            stored.update(self._store(db, [bug_ids[i] for i in missing], missing_texts, counts, version))
+        return _matrix([stored[bug_id] for bug_id in bug_ids], self.feature_extractor.n_features)
+
+    def transform(self, db: Session, bugs: list[BugReport]) -> np.ndarray | sp.csr_matrix:
+        """Equivalent to transforming the bugs' preprocessed texts."""
+        return self.feature_extractor.weigh(self.counts(db, bugs))
+
+    def fit_transform(self, db: Session, bugs: list[BugReport]) -> np.ndarray | sp.csr_matrix:
+        """Refit the extractor on ``bugs`` and return their vectors.
+
+        In hashing mode the stored counts are reused and only the document
+        frequencies are recomputed. Otherwise the vocabulary is refit on the
+        stored texts; the new version's rows are left to ``rebuild``.
+        """
+        if self.feature_extractor.supports_partial_fit:
+            return self.feature_extractor.fit_counts(self.counts(db, bugs))
+        return self.feature_extractor.fit_transform(self.texts(db, bugs))
+
+    def rebuild(self, db: Session) -> dict:
+        """Store the current version's rows for reviewed and previously stored bugs, then drop other versions."""
+        version = self.feature_extractor.version
+        rebuilt = 0
+        while True:
+            bug_ids = crud.get_bug_ids_missing_features(db, version, self.batch_size)
+            if not bug_ids:
+                break
+            self.counts(db, crud.get_bugs_by_ids(db, bug_ids))
+            rebuilt += len(bug_ids)
+        removed = crud.delete_stale_bug_features(db, version)
+        return {"version": version, "rebuilt": rebuilt, "removed": removed}
+
+    @staticmethod
+    def _store(
+        db: Session, bug_ids: list[int], texts: list[str], counts: sp.csr_matrix, version: str,
+    ) -> dict[int, dict]:
+        """Save counts rows (in ``vector_to_json`` form) and return them by bug id."""
+        indptr, indices, values = counts.indptr, counts.indices.tolist(), counts.data.tolist()
+        rows = {
+            bug_id: {
+                "size": counts.shape[1],
+                "indices": indices[indptr[i]:indptr[i + 1]],
+                "values": values[indptr[i]:indptr[i + 1]],
+            }
+            for i, bug_id in enumerate(bug_ids)
+        }
+        crud.bulk_create_bug_features(db, [
+            {"bug_id": bug_id, "extractor_version": version, "text": text, "counts_json": rows[bug_id]}
+            for bug_id, text in zip(bug_ids, texts)
+        ])
+        return rows
+
+
+def _matrix(rows: list[dict], n_features: int) -> sp.csr_matrix:
+    """Stack stored count rows into one CSR matrix."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row["indices"]) for row in rows])
+    indices = np.fromiter(
+        (i for row in rows for i in row["indices"]), dtype=np.int32, count=indptr[-1],
+    )
+    values = np.fromiter(
+        (v for row in rows for v in row["values"]), dtype=np.float64, count=indptr[-1],
+    )
+    return sp.csr_matrix((values, indices, indptr), shape=(len(rows), n_features))
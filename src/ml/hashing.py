@@ -0,0 +1,173 @@
+"""TF-IDF over hashed n-grams with running document-frequency counts."""
+import threading
+import uuid
+from collections.abc import Sequence
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+
+class HashedFeatureNames(Sequence):
+    """Feature names for explanations: the first term seen in each bucket."""
+
+    def __init__(self, terms: dict[int, str], n_features: int):
+        self._terms = terms
+        self._n_features = n_features
+
+    def __len__(self) -> int:
+        return self._n_features
+
+    def __getitem__(self, index: int) -> str:
+        return self._terms.get(int(index), f"#{index}")
+
+
+class HashingTfidf:
+    """Stateless featurization with incrementally maintained IDF.
+
+    Terms map to columns by hashing, so the feature space never changes and
+    any process can vectorize without a fitted vocabulary. Only the document
+    frequencies are state; ``partial_fit`` adds new documents to them.
+    Processes sharing one fit exchange them as ``increments`` tagged with the
+    fit's ``generation``; ``applied_through`` is the last such update merged.
+    Weighting matches ``TfidfVectorizer(sublinear_tf=True)`` with smoothed IDF.
+    """
+
+    sublinear_tf = True
+    use_idf = True
+    norm = "l2"
+    dtype = np.float64
+
+    def __init__(self, n_features: int, ngram_range: tuple = (1, 2)):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.hasher = HashingVectorizer(
+            n_features=n_features, ngram_range=self.ngram_range,
+            strip_accents="unicode", alternate_sign=False, norm=None,
+        )
+        self.terms: dict[int, str] = {}
+        # (documents seen, per-bucket document frequency), replaced as one value
+        self._counts = (0, np.zeros(n_features, dtype=np.int64))
+        self.generation = uuid.uuid4().hex
+        self.applied_through = 0
+        self._idf = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        with self._lock:
+            state = self.__dict__.copy()
+            state["terms"] = dict(self.terms)
+        del state["_lock"]
+        state["_idf"] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("generation", "")
+        state.setdefault("applied_through", 0)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def bucket(self, term: str) -> int:
+        """Column of ``term``, as HashingVectorizer computes it."""
+        return abs(murmurhash3_32(term, seed=0)) % self.n_features
+
+    def fit(self, texts: list[str]) -> "HashingTfidf":
+        """Restart the document frequencies from ``texts``."""
+        with self._lock:
+            self.terms = {}
+            self._restart(0, np.zeros(self.n_features, dtype=np.int64))
+        return self.partial_fit(texts)
+
+    def fit_counts(self, X: sp.csr_matrix) -> "HashingTfidf":
+        """Restart the document frequencies from a matrix of term counts.
+
+        Bucket names already recorded stay valid, since hashing never changes.
+        """
+        df = np.bincount(sp.csr_matrix(X).indices, minlength=self.n_features)
+        with self._lock:
+            self._restart(X.shape[0], df.astype(np.int64))
+        return self
+
+    def _restart(self, n_docs: int, df: np.ndarray):
+        # A new fit: updates logged against the previous one no longer apply
+        self._counts = (n_docs, df)
+        self.generation = uuid.uuid4().hex
+        self.applied_through = 0
+
+    def increments(self, texts: list[str]) -> tuple[int, np.ndarray, dict[int, str]]:
+        """What ``partial_fit(texts)`` would add, without adding it.
+
+        Returns the document count, the per-bucket document-frequency
+        increments and the first term seen in each bucket not yet named.
+        """
+        analyze = self.hasher.build_analyzer()
+        seen = []
+        new_terms = {}
+        for text in texts:
+            buckets = set()
+            for term in analyze(text):
+                b = self.bucket(term)
+                buckets.add(b)
+                if b not in self.terms:
+                    new_terms.setdefault(b, term)
+            seen.extend(buckets)
+        increments = np.bincount(np.asarray(seen, dtype=np.int64), minlength=self.n_features)
+        return len(texts), increments, new_terms
+
+    def add(
+        self, n_docs: int, increments: np.ndarray, terms: dict[int, str],
+        applied_through: int | None = None,
+    ) -> "HashingTfidf":
+        """Add increments from ``increments``, here or in another process.
+
+        ``applied_through`` records the last logged update they include.
+        """
+        with self._lock:
+            total, df = self._counts
+            self._counts = (total + n_docs, df + increments)
+            for b, term in terms.items():
+                self.terms.setdefault(b, term)
+            if applied_through is not None:
+                self.applied_through = max(self.applied_through, applied_through)
+        return self
+
+    def partial_fit(self, texts: list[str]) -> "HashingTfidf":
+        return self.add(*self.increments(texts))
+
+    @property
+    def n_documents(self) -> int:
+        return self._counts[0]
+
+    @property
+    def counts(self) -> tuple[int, np.ndarray]:
+        """(documents seen, per-bucket document frequency); a new tuple after every change."""
+        return self._counts
+
+    @property
+    def idf_(self) -> np.ndarray:
+        counts = self._counts
+        if self._idf is None or self._idf[0] is not counts:
+            n_docs, df = counts
+            self._idf = (counts, np.log((1 + n_docs) / (1 + df)) + 1.0)
+        return self._idf[1]
+
+    def transform(self, texts: list[str]) -> sp.csr_matrix:
+        X = sp.csr_matrix(self.hasher.transform(texts))
+        np.log(X.data, X.data)
+        X.data += 1.0
+        X.data *= self.idf_[X.indices]
+        return normalize(X, norm=self.norm, copy=False)
+
+    def build_analyzer(self):
+        return self.hasher.build_analyzer()
+
+    def build_preprocessor(self):
+        return self.hasher.build_preprocessor()
+
+    def build_tokenizer(self):
+        return self.hasher.build_tokenizer()
+
+    def get_feature_names_out(self) -> HashedFeatureNames:
+        return HashedFeatureNames(self.terms, self.n_features)
@@ -0,0 +1,70 @@
+"""MinHash signatures and banded LSH for approximate duplicate candidate search."""
+import zlib
+
+import numpy as np
+
+from configs.config import config
+
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_EMPTY = np.iinfo(np.uint64).max
+
+
+def shingles(text: str, ngram_range: tuple = (1, 2)) -> set[str]:
+    """Word n-grams of a preprocessed text (the same units TF-IDF counts)."""
+    tokens = text.split()
+    min_n, max_n = ngram_range
+    return {
+        " ".join(tokens[i:i + n])
+        for n in range(min_n, max_n + 1)
+        for i in range(len(tokens) - n + 1)
+    }
+
+
+class MinHashLSH:
+    """Banded LSH over MinHash signatures.
+
+    Two texts whose shingle sets have Jaccard similarity ``s`` share at least
+    one bucket with probability ``1 - (1 - s**rows)**bands``.
+    """
+
+    def __init__(
+        self, num_perm: int | None = None, bands: int | None = None,
+        ngram_range: tuple | None = None, seed: int = 1,
+    ):
+        self.num_perm = num_perm or config.ml.minhash_num_perm
+        self.bands = bands or config.ml.minhash_bands
+        if self.num_perm % self.bands:
+            raise ValueError("minhash_num_perm must be divisible by minhash_bands")
+        self.rows = self.num_perm // self.bands
+        self.ngram_range = ngram_range or config.ml.tfidf_ngram_range
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x + b inside uint64 for 32-bit shingle hashes
+        self._a = rng.integers(1, 2 ** 31, self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, self.num_perm, dtype=np.uint64)
+
+    def signatures(self, texts: list[str]) -> np.ndarray:
+        sigs = np.full((len(texts), self.num_perm), _EMPTY, dtype=np.uint64)
+        for i, text in enumerate(texts):
+            hashes = np.array(
+                [zlib.crc32(s.encode()) for s in shingles(text, self.ngram_range)],
+                dtype=np.uint64,
+            )
+            if len(hashes):
+                permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+                sigs[i] = permuted.min(axis=1)
+        return sigs
+
+    def candidates(self, signatures: np.ndarray) -> list[list[int]]:
+        """For each row, the earlier rows sharing at least one band bucket."""
+        n = len(signatures)
+        found: list[set[int]] = [set() for _ in range(n)]
+        non_empty = signatures[:, 0] != _EMPTY
+        for band in range(self.bands):
+            buckets: dict[bytes, list[int]] = {}
+            band_sigs = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for i in np.flatnonzero(non_empty):
+                bucket = buckets.setdefault(band_sigs[i].tobytes(), [])
+                found[i].update(bucket)
+                bucket.append(i)
+        return [sorted(c) for c in found]
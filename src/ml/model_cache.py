@@ -0,0 +1,154 @@
+"""Per-project vectorizer/classifier pairs and the LRU cache that serves them."""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from configs.config import config
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.classifier import BugClassifier
+from src.ml.compiled import CompiledEnsemble
+from src.ml.explainer import ClassificationExplainer
+
+
+class ModelSet:
+    """A fitted pair plus the explainer and compiled kernel built from it on first use."""
+
+    def __init__(self, feature_extractor: FeatureExtractor, classifier: BugClassifier):
+        self.feature_extractor = feature_extractor
+        self.classifier = classifier
+        self._explainer = None
+        self._compiled = None
+        self._weights_digest = None
+        self._fingerprint = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.feature_extractor.is_fitted and self.classifier.is_trained
+
+    @property
+    def compiled(self) -> CompiledEnsemble:
+        if self._compiled is None:
+            if not self.classifier.compiled_path.exists():
+                self.classifier.export()
+            self._compiled = CompiledEnsemble(self.classifier.compiled_path)
+        return self._compiled
+
+    @property
+    def explainer(self):
+        if self._explainer is None and self.feature_extractor.is_fitted:
+            self._explainer = ClassificationExplainer(
+                self.feature_extractor.get_feature_names()
+            )
+        return self._explainer
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the vectorizer's IDF state and the exported classifier weights.
+
+        Unlike a ``model_versions`` row it also changes with incremental
+        updates, and a pair restored from the registry hashes the same again.
+        In hashing mode every upload moves the IDF, so the fingerprint
+        follows ``idf_version`` rather than ``version``.
+        """
+        idf_version = self.feature_extractor.idf_version
+        cached = self._fingerprint
+        if cached is None or cached[0] != idf_version:
+            weights = self._weights_digest
+            if weights is None:
+                if not self.classifier.compiled_path.exists():
+                    self.classifier.export()
+                digest = hashlib.sha1()
+                with np.load(self.classifier.compiled_path) as arrays:
+                    for name in sorted(arrays.files):
+                        digest.update(name.encode())
+                        digest.update(arrays[name].tobytes())
+                weights = self._weights_digest = digest.hexdigest()
+            digest = hashlib.sha1(f"{idf_version} {weights}".encode())
+            cached = self._fingerprint = (idf_version, digest.hexdigest()[:16])
+        return cached[1]
+
+    def reset(self):
+        """Drop what was derived from the models after they change in place."""
+        self._explainer = None
+        self._compiled = None
+        self._weights_digest = None
+        self._fingerprint = None
+
+    def predict(self, X) -> tuple[list[dict], dict | None]:
+        """Predictions plus per-stage cascade counters (``None`` outside cascade mode)."""
+        if config.ml.cascade_inference:
+            if config.ml.compiled_inference:
+                columns, stats = self.compiled.predict_cascade(X, config.ml.cascade_margin)
+                return self.compiled.records(columns), stats
+            return self.classifier.predict_cascade(X)
+        if config.ml.compiled_inference:
+            return self.compiled.predict_records(X), None
+        return self.classifier.predict(X), None
+
+
+class ModelCache:
+    """The most recently used per-project ``ModelSet``s, loaded from disk on a miss.
+
+    ``loader(project_id)`` returns the project's set, or ``None`` when the
+    project has no model of its own; lookups of that kind are neither cached
+    nor counted. Once ``max_size`` sets are resident the least recently used
+    is dropped.
+    """
+
+    def __init__(
+        self, loader: Callable[[int], Optional[ModelSet]], max_size: Optional[int] = None,
+    ):
+        self.loader = loader
+        self.max_size = max_size or config.ml.project_model_cache_size
+        self._sets: OrderedDict[int, ModelSet] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, project_id: int) -> Optional[ModelSet]:
+        with self._lock:
+            models = self._sets.get(project_id)
+            if models is not None:
+                self._sets.move_to_end(project_id)
+                self.hits += 1
+                return models
+        # Load outside the lock so one slow load doesn't stall other projects
+        models = self.loader(project_id)
+        if models is not None:
+            with self._lock:
+                self.misses += 1
+                models = self._sets.setdefault(project_id, models)
+                self._sets.move_to_end(project_id)
+                self._evict()
+        return models
+
+    def put(self, project_id: int, models: ModelSet):
+        with self._lock:
+            self._sets[project_id] = models
+            self._sets.move_to_end(project_id)
+            self._evict()
+
+    def invalidate(self, project_id: int):
+        with self._lock:
+            self._sets.pop(project_id, None)
+
+    def _evict(self):
+        while len(self._sets) > self.max_size:
+            self._sets.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "resident": list(self._sets),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,69 @@
+"""Persistent cache of predictions for texts a model has already scored."""
+import threading
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from configs.config import config
+from src.db import crud
+from src.ml.preprocessor import text_hash
+
+
+class PredictionCache:
+    """Predictions and explanations keyed by preprocessed-text hash and model fingerprint.
+
+    Bugs re-uploaded unchanged in a later cycle preprocess to the same text,
+    so the model only runs on texts it has not scored before. Entries live
+    in the ``prediction_cache`` table; beyond ``max_rows`` the oldest go.
+    """
+
+    def __init__(self, max_rows: Optional[int] = None):
+        self.max_rows = max_rows or config.ml.prediction_cache_max_rows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    text_hash = staticmethod(text_hash)
+
+    def lookup(self, db: Session, text_hashes: list[str], model_key: str) -> dict[str, dict]:
+        """Cached prediction records (plus ``explanation``) by hash; counts a hit or miss per row."""
+        rows = crud.get_cached_predictions(db, text_hashes, model_key)
+        found = {
+            h: {
+                "classification": row.classification,
+                "confidence": row.confidence,
+                "probabilities": row.probabilities,
+                "explanation": row.explanation,
+            }
+            for h, row in rows.items()
+        }
+        hits = sum(h in found for h in text_hashes)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(text_hashes) - hits
+        return found
+
+    def store(self, db: Session, model_key: str, entries: dict[str, dict]) -> int:
+        """Save prediction records (with ``explanation``) by text hash."""
+        stored = crud.bulk_create_cached_predictions(db, [
+            {
+                "text_hash": h, "model_key": model_key,
+                "classification": e["classification"], "confidence": e["confidence"],
+                "probabilities": e["probabilities"], "explanation": e["explanation"],
+            }
+            for h, e in entries.items()
+        ])
+        if stored:
+            crud.trim_cached_predictions(db, self.max_rows)
+        return stored
+
+    def stats(self, db: Session) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": crud.count_cached_predictions(db),
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
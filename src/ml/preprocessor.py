@@ -1,4 +1,5 @@
 """Text preprocessing for bug reports."""
+import hashlib
 import re
 import string
 
@@ -19,6 +20,9 @@ _HTML_TAG_RE = re.compile(r"<[^>]+>")
 _URL_RE = re.compile(r"https?://\S+")
 _JIRA_KEY_RE = re.compile(r"[A-Z]+-\d+")
 _MULTI_SPACE_RE = re.compile(r"\s+")
+_JAVA_FRAME_RE = re.compile(r"\bat\s+(?:[\w.@]+/)?([A-Za-z_$][\w$]*(?:\.[\w$<>]+)+)\s*\(")
+_PYTHON_FRAME_RE = re.compile(r'File "([^"]+)", line \d+, in ([\w<>]+)')
+_SYNTHETIC_SUFFIX_RE = re.compile(r"\$(?:\$\w+|\d+)")
 
 STOP_WORDS = {
     "the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
@@ -74,3 +78,50 @@ def preprocess_text(text: str) -> str:
 def preprocess_bug(summary: str, description: str = "") -> str:
     combined = f"{summary} {description}"
     return preprocess_text(combined)
+
+
+def extract_stack_frames(text: str, top_n: int = 5) -> list[str]:
+    """Normalized innermost frames of the first Java or Python stack trace in ``text``.
+
+    Line numbers, file paths and compiler-generated suffixes (``$1``,
+    ``$$Lambda$12``) are dropped so the same crash reported from different
+    builds yields the same frames.
+    """
+    if not text:
+        return []
+    java = _JAVA_FRAME_RE.findall(text)
+    if java:
+        return [_SYNTHETIC_SUFFIX_RE.sub("", frame) for frame in java[:top_n]]
+    # Python tracebacks list the innermost frame last
+    python = _PYTHON_FRAME_RE.findall(text)
+    frames = [f"{path.replace(chr(92), '/').rsplit('/', 1)[-1]}:{func}" for path, func in python]
+    return frames[::-1][:top_n]
+
+
+def stack_fingerprint(text: str, top_n: int = 5) -> str | None:
+    """Hash of the top stack frames, or None when there is no usable trace."""
+    frames = extract_stack_frames(text, top_n)
+    if len(frames) < 2:
+        return None
+    return hashlib.sha1("\n".join(frames).encode()).hexdigest()
+
+
+def text_hash(text: str) -> str:
+    """Stable digest of an already-preprocessed text."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def preprocess_bug_pair(summary: str, description: str = "") -> tuple[str, str]:
+    """Return ``(preprocess_bug(summary, description), preprocess_bug(summary))``.
+
+    Each field is cleaned once and the full text is the join of the two
+    cleaned fields, which is token-for-token what the combined pass yields.
+    """
+    summary, description = f"{summary}", f"{description}"
+    if "<" in strip_html(summary) and ">" in description:
+        # An HTML tag opened in the summary could close in the description
+        return preprocess_bug(summary, description), preprocess_text(summary)
+    summary_text = preprocess_text(summary)
+    description_text = preprocess_text(description)
+    full_text = f"{summary_text} {description_text}".strip()
+    return full_text, summary_text
@@ -0,0 +1,74 @@
+"""Content-addressed store of trained model artifacts."""
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from configs.config import config
+
+
+class ModelRegistry:
+    """Immutable copies of every trained version's files, named by their content hash.
+
+    ``commit`` files into ``objects/<digest>/``; ``activate`` points the
+    live file paths at a committed version. Files are hard-linked where the
+    filesystem allows, so both operations are renames rather than copies,
+    and processes that memory-map the live files share one set of pages.
+    Everything that writes model files replaces them atomically, so a
+    linked file is never modified in place.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or config.ml.model_dir / "registry"
+
+    def path(self, digest: str) -> Path:
+        return self.root / "objects" / digest
+
+    def commit(self, files: dict[str, Path]) -> str:
+        """Store each path under its name and return the digest; identical content is stored once."""
+        digest = _digest(files)
+        target = self.path(digest)
+        if target.exists():
+            return digest
+        tmp = self.root / "tmp" / uuid.uuid4().hex
+        tmp.mkdir(parents=True)
+        for name, path in files.items():
+            _link(path, tmp / name)
+            os.chmod(tmp / name, 0o444)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # Committed concurrently with the same content
+            shutil.rmtree(tmp, ignore_errors=True)
+        return digest
+
+    def activate(self, digest: str, targets: list[Path]):
+        """Replace each target with the committed file of the same name."""
+        source = self.path(digest)
+        missing = [t.name for t in targets if not (source / t.name).exists()]
+        if missing:
+            raise FileNotFoundError(f"Model {digest} has no {', '.join(missing)}")
+        for target in targets:
+            tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+            _link(source / target.name, tmp)
+            os.replace(tmp, target)
+
+
+def _digest(files: dict[str, Path]) -> str:
+    digest = hashlib.sha256()
+    for name, path in sorted(files.items()):
+        digest.update(name.encode() + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _link(source: Path, target: Path):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
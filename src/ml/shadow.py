@@ -0,0 +1,81 @@
+"""Shadow scoring: a candidate model re-scores classified cycles off the request path."""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.db import crud
+from src.ml.model_cache import ModelSet
+
+
+def compare_predictions(active: list[dict], candidate: list[dict]) -> dict:
+    """How often the two models pick the same class, and how confidence moves."""
+    if not active:
+        return {
+            "rows": 0, "agreement_rate": None, "active_confidence": None,
+            "candidate_confidence": None, "confidence_shift": None,
+        }
+    agree = np.mean([a["classification"] == c["classification"] for a, c in zip(active, candidate)])
+    active_confidence = float(np.mean([a["confidence"] for a in active]))
+    candidate_confidence = float(np.mean([c["confidence"] for c in candidate]))
+    return {
+        "rows": len(active),
+        "agreement_rate": round(float(agree), 4),
+        "active_confidence": round(active_confidence, 4),
+        "candidate_confidence": round(candidate_confidence, 4),
+        "confidence_shift": round(candidate_confidence - active_confidence, 4),
+    }
+
+
+class ShadowScorer:
+    """Scores each cycle with the candidate on one background thread and records the comparison.
+
+    The active model's feature matrix is reused when the candidate's
+    vectorizer has the same ``version`` (the same feature space); otherwise
+    only the already preprocessed texts are reused.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+
+    def submit(
+        self, session_factory: Callable[[], Session], candidate: ModelSet, candidate_version: str,
+        cycle_id: int, X, texts: list[str], active: list[dict], active_version: str | None,
+        active_seconds: float, feature_version: str,
+    ) -> Future:
+        def run():
+            db = session_factory()
+            try:
+                return self.score(
+                    db, candidate, candidate_version, cycle_id, X, texts,
+                    active, active_version, active_seconds, feature_version,
+                )
+            finally:
+                db.close()
+        return self._executor.submit(run)
+
+    def score(
+        self, db: Session, candidate: ModelSet, candidate_version: str,
+        cycle_id: int, X, texts: list[str], active: list[dict], active_version: str | None,
+        active_seconds: float, feature_version: str,
+    ):
+        start = time.perf_counter()
+        reused = candidate.feature_extractor.version == feature_version
+        if not reused:
+            X = candidate.feature_extractor.transform(texts)
+        predictions, _ = candidate.predict(X)
+        candidate_seconds = time.perf_counter() - start
+        return crud.create_shadow_score(
+            db, cycle_id=cycle_id,
+            candidate_version=candidate_version, active_version=active_version,
+            active_seconds=round(active_seconds, 4),
+            candidate_seconds=round(candidate_seconds, 4),
+            reused_features=reused,
+            **compare_predictions(active, predictions),
+        )
+
+    def drain(self):
+        """Wait until every cycle submitted so far has been scored."""
+        self._executor.submit(lambda: None).result()
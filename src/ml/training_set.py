@@ -0,0 +1,124 @@
+"""Bounded, class-stratified training samples drawn from the review history."""
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from configs.config import config
+
+# Calibration folds nested inside the classifier's cross-validation need a
+# few rows of every class
+MIN_PER_CLASS = 5
+
+
+def review_ages(reviewed_at: list[Optional[datetime]], now: Optional[datetime] = None) -> np.ndarray:
+    """Days since each review; naive times are UTC and unknown times are infinitely old."""
+    now = now or datetime.now(timezone.utc)
+    ages = np.full(len(reviewed_at), np.inf)
+    for i, at in enumerate(reviewed_at):
+        if at is not None:
+            if at.tzinfo is None:
+                at = at.replace(tzinfo=timezone.utc)
+            ages[i] = max((now - at).total_seconds() / 86400.0, 0.0)
+    return ages
+
+
+class TrainingSetManager:
+    """Chooses which reviewed bugs a retrain fits on.
+
+    With ``cap`` set, every recent override (a bug reviewed within
+    ``recent_days`` whose human label differs from the model's) is kept, up
+    to ``cap`` of them, newest first. The rest of the cap is split across classes in proportion to their share
+    of the history (at least ``MIN_PER_CLASS`` slots each). Each class fills
+    its slots by weighted sampling without replacement, where a review's
+    weight halves every ``half_life_days``. Sampling is seeded, so the same history gives
+    the same sample. ``cap = 0`` keeps everything; the per-class floor can
+    push a sample past the cap.
+    """
+
+    def __init__(
+        self, cap: Optional[int] = None, recent_days: Optional[float] = None,
+        half_life_days: Optional[float] = None, seed: int = 0,
+    ):
+        self.cap = config.ml.training_cap if cap is None else cap
+        self.recent_days = config.ml.training_recent_days if recent_days is None else recent_days
+        self.half_life_days = config.ml.training_half_life_days if half_life_days is None else half_life_days
+        self.seed = seed
+
+    def select(
+        self, labels, ages: np.ndarray, overrides: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, dict]:
+        """Sorted indices of the chosen rows, and counts describing the choice.
+
+        ``overrides`` marks rows whose human label differs from the model's;
+        without it every row counts as one.
+        """
+        labels = np.asarray(labels)
+        ages = np.asarray(ages, dtype=float)
+        n = len(labels)
+        recent = ages <= self.recent_days
+        if overrides is not None:
+            recent &= np.asarray(overrides, dtype=bool)
+        if self.cap and recent.sum() > self.cap:
+            # Confirmations never count, and a busy month of overrides still fits the cap
+            newest = np.flatnonzero(recent)[np.argsort(ages[recent], kind="stable")[:self.cap]]
+            recent = np.zeros(n, dtype=bool)
+            recent[newest] = True
+        if not self.cap or n <= self.cap:
+            chosen = np.arange(n)
+        else:
+            chosen = self._sample(labels, ages, recent)
+        return chosen, {
+            "available": n,
+            "selected": len(chosen),
+            "recent": int(recent.sum()),
+            "cap": self.cap,
+        }
+
+    def _sample(self, labels: np.ndarray, ages: np.ndarray, recent: np.ndarray) -> np.ndarray:
+        # Reviews of unknown age rank with the oldest known ones
+        known = np.isfinite(ages)
+        ages = np.where(known, ages, ages[known].max() if known.any() else 0.0)
+        # Gumbel-top-k: the k largest log(weight) + Gumbel keys are a weighted
+        # sample without replacement, and log weights cannot underflow.
+        rng = np.random.default_rng(self.seed)
+        keys = -ages * np.log(2) / self.half_life_days + rng.gumbel(size=len(ages))
+
+        classes, class_of, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        recent_counts = np.bincount(class_of[recent], minlength=len(classes))
+        # Recent reviews use up their class's share first; the remaining
+        # budget goes to the classes still short of theirs.
+        shortfall = np.clip(_quotas(counts, self.cap) - recent_counts, 0, counts - recent_counts)
+        budget = max(self.cap - int(recent.sum()), 0)
+        if shortfall.sum() > budget:
+            shortfall = _quotas(shortfall, budget)
+        # Never starve a class below the floor the classifier needs
+        shortfall = np.maximum(shortfall, np.minimum(counts, MIN_PER_CLASS) - recent_counts)
+
+        chosen = [np.flatnonzero(recent)]
+        for c, extra in enumerate(shortfall):
+            members = np.flatnonzero((class_of == c) & ~recent)
+            chosen.append(members[np.argsort(-keys[members], kind="stable")[:extra]])
+        return np.sort(np.concatenate(chosen))
+
+
+def _quotas(counts: np.ndarray, cap: int) -> np.ndarray:
+    """Split ``cap`` in proportion to ``counts`` (largest remainder, with a per-class floor when it fits)."""
+    cap = min(cap, int(counts.sum()))
+    floor = np.minimum(counts, MIN_PER_CLASS)
+    if floor.sum() > cap:
+        floor = np.zeros_like(counts)
+    room = counts - floor
+    share = (cap - floor.sum()) * room / room.sum() if room.sum() else np.zeros(len(counts))
+    quotas = floor + np.floor(share).astype(int)
+    leftover = cap - quotas.sum()
+    for i in np.argsort(-(share - np.floor(share)), kind="stable")[:max(leftover, 0)]:
+        quotas[i] += 1
+    quotas = np.minimum(quotas, counts)
+    # Hand slots a class cannot fill to the classes with the most rows to spare
+    for i in np.argsort(quotas - counts, kind="stable"):
+        extra = min(cap - int(quotas.sum()), int(counts[i] - quotas[i]))
+        if extra <= 0:
+            break
+        quotas[i] += extra
+    return quotas
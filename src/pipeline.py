@@ -1,34 +1,108 @@
 """Orchestrator: upload -> preprocess -> classify -> store."""
+import copy
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
 import numpy as np
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from configs.config import config
 from src.db import crud
 from src.ingest.parser import parse_upload
 from src.ingest.normalizer import normalize_records
-from src.ml.preprocessor import preprocess_bug
-from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug, preprocess_bug_pair, stack_fingerprint
+from src.ml.feature_extractor import FeatureExtractor, vector_to_json
+from src.ml.feature_store import FeatureStore
 from src.ml.duplicate_detector import DuplicateDetector
+from src.ml.duplicate_index import DuplicateIndex
 from src.ml.classifier import BugClassifier
-from src.ml.explainer import ClassificationExplainer
 from src.ml.active_learner import ActiveLearner
+from src.ml.model_cache import ModelCache, ModelSet
+from src.ml.prediction_cache import PredictionCache
+from src.ml.registry import ModelRegistry
+from src.ml.shadow import ShadowScorer
+from src.jobs import ReadWriteLock
+
+
+# Stamp of bugs scored by a project's own pair (see ``Pipeline._model_stamp``)
+PROJECT_MODEL_STAMP = "project"
+
+
+def _explain(models: ModelSet, vectors, predictions: list[dict]) -> list[str]:
+    if not models.explainer:
+        return [""] * len(predictions)
+    return [
+        models.explainer.explain(vectors[i], pred["classification"], pred["probabilities"])
+        for i, pred in enumerate(predictions)
+    ]
+
+
+def _index_source(project) -> str:
+    """Identity of the project's database rows a duplicate index describes.
+
+    A database reset can hand out the same project and bug ids again; the
+    project's creation time tells the new rows from the ones an index on
+    disk was built from.
+    """
+    return f"project-{project.id}@{project.created_at.isoformat()}"
+
+
+def _staging_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.staging{path.suffix}")
+
+
+def _folding_path(path: Path) -> Path:
+    # Apart from the retrain's staging files, which a background retrain may be writing
+    return path.with_name(f"{path.stem}.folding{path.suffix}")
+
+
+def _model_files(feature_extractor: FeatureExtractor, classifier: BugClassifier) -> list[Path]:
+    return [feature_extractor.model_path, classifier.model_path, classifier.compiled_path]
 
 
 class Pipeline:
     def __init__(self):
-        self.feature_extractor = FeatureExtractor()
+        # Classification reads the models; swapping in a newly trained pair writes
+        self.lock = ReadWriteLock()
+        self.models = ModelSet(FeatureExtractor(), BugClassifier())
         self.duplicate_detector = DuplicateDetector()
-        self.classifier = BugClassifier()
         self.active_learner = ActiveLearner(self.feature_extractor, self.classifier)
-        self._explainer = None
+        self.registry = ModelRegistry()
+        # Pairs of projects that have their own (``per_project_models``)
+        self.project_models = ModelCache(self._load_project_models)
+        self.shadow = ShadowScorer()
+        self.prediction_cache = PredictionCache()
+        # (version, pair) of the shadow candidate, loaded from the registry
+        self._candidate: tuple[str, ModelSet] | None = None
+        # Background re-scoring of bugs stamped with an older model (``lazy_rescoring``)
+        self._sweeper = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rescore")
+        self._sweep_lock = threading.Lock()
+        self.sweep: Future | None = None
+        # Duplicate-index files are rewritten whole, so updates to one project's take turns
+        self._index_locks: dict[int, threading.Lock] = {}
+        self._index_locks_guard = threading.Lock()
+        # Incremental folds take turns; each starts from the pair the last one published
+        self._fold_lock = threading.Lock()
 
     @property
-    def explainer(self):
-        if self._explainer is None and self.feature_extractor.is_fitted:
-            self._explainer = ClassificationExplainer(
-                self.feature_extractor.get_feature_names()
-            )
-        return self._explainer
+    def feature_extractor(self) -> FeatureExtractor:
+        return self.models.feature_extractor
+
+    @property
+    def classifier(self) -> BugClassifier:
+        return self.models.classifier
+
+    def models_for(self, project_id: int) -> ModelSet:
+        """The project's own pair if it has one, otherwise the shared pair."""
+        if config.ml.per_project_models:
+            models = self.project_models.get(project_id)
+            if models is not None:
+                return models
+        return self.models
 
     def process_upload(
         self, db: Session, file_source, filename: str,
@@ -51,103 +125,704 @@ class Pipeline:
             "source_system": detected_source,
         }
 
-        if self.feature_extractor.is_fitted and self.classifier.is_trained:
+        models = self.models_for(project_id)
+        if models.feature_extractor.supports_partial_fit:
+            # Hashed features need no refit; each upload only extends the IDF
+            # counts, logged in the database so every worker process sees them
+            with self.lock.read():
+                models.feature_extractor.record_documents(
+                    db, [preprocess_bug(b.summary, b.description) for b in bugs],
+                )
+
+        if models.is_trained:
             classify_result = self.classify_cycle(db, cycle.id)
             result.update(classify_result)
 
         return result
 
     def classify_cycle(self, db: Session, cycle_id: int) -> dict:
+        with self.lock.read():
+            return self._classify_cycle(db, cycle_id)
+
+    def _classify_cycle(self, db: Session, cycle_id: int) -> dict:
         bugs = crud.get_bugs_for_cycle(db, cycle_id)
         if not bugs:
             return {"classified": 0}
 
-        texts = [preprocess_bug(b.summary, b.description) for b in bugs]
-        vectors = self.feature_extractor.transform(texts)
-
-        # Duplicate detection - use summary-only vectors for more precise matching
-        summary_texts = [preprocess_bug(b.summary) for b in bugs]
-        summary_vectors = self.feature_extractor.transform(summary_texts)
+        models = self.models_for(bugs[0].cycle.project_id)
+        # Pick up document counts other workers' uploads added since the last cycle
+        models.feature_extractor.refresh_documents(db)
+        # Duplicate detection uses summary-only vectors for more precise matching;
+        # both matrices are built from one tokenization of each field.
+        texts, summary_texts = zip(*(preprocess_bug_pair(b.summary, b.description) for b in bugs))
+        vectors, summary_vectors = models.feature_extractor.transform_pair(texts, summary_texts)
+        # Duplicate search runs on the low-rank embedding when one is fitted
+        summary_vectors = models.feature_extractor.similarity_vectors(summary_vectors)
 
         bug_ids = [b.id for b in bugs]
-        duplicates = self.duplicate_detector.find_duplicates(summary_vectors, bug_ids)
+        positions = {bug_id: i for i, bug_id in enumerate(bug_ids)}
+        bugs_by_id = {b.id: b for b in bugs}
+        fingerprints = [
+            stack_fingerprint(b.description, config.ml.stack_trace_frames) for b in bugs
+        ]
+        duplicates, index = self._find_duplicates(
+            db, bugs, summary_texts, summary_vectors, fingerprints, models.feature_extractor,
+        )
+        for prior in crud.get_bugs_by_ids(
+            db, [d["duplicate_of_id"] for d in duplicates if d["duplicate_of_id"] not in bugs_by_id],
+        ):
+            bugs_by_id[prior.id] = prior
+
+        # Each family is keyed by its canonical (earliest) bug's id
+        heads = {d["duplicate_of_id"] for d in duplicates}
+        group_of = {
+            head: bugs_by_id[head].duplicate_group_id or head for head in heads
+        }
+
         dup_ids = set()
+        rows = [
+            {"id": head, "duplicate_group_id": head}
+            for head in sorted(heads)
+            if head not in positions and bugs_by_id[head].duplicate_group_id is None
+        ]
         for dup in duplicates:
-            crud.set_duplicate(db, dup["bug_id"], dup["duplicate_of_id"], dup["similarity"])
-            dup_ids.add(dup["bug_id"])
-
-            if self.explainer:
-                dup_bug = crud.get_bug(db, dup["bug_id"])
-                orig_bug = crud.get_bug(db, dup["duplicate_of_id"])
-                if dup_bug and orig_bug:
-                    explanation = self.explainer.explain_duplicate(
-                        dup_bug.summary, orig_bug.summary, dup["similarity"]
+            dup_bug = bugs_by_id[dup["bug_id"]]
+            explanation = dup_bug.ml_explanation
+            confidence = dup_bug.ml_confidence
+            if models.explainer:
+                original = bugs_by_id[dup["duplicate_of_id"]]
+                if dup.get("match") == "stack_trace":
+                    explanation = models.explainer.explain_crash_duplicate(original.summary)
+                else:
+                    explanation = models.explainer.explain_duplicate(
+                        dup_bug.summary, original.summary, dup["similarity"],
                     )
-                    dup_bug.ml_explanation = explanation
-                    dup_bug.ml_confidence = dup["similarity"]
-                    db.commit()
+                confidence = dup["similarity"]
+            rows.append({
+                "id": dup_bug.id,
+                "duplicate_of_id": dup["duplicate_of_id"],
+                "duplicate_group_id": group_of[dup["duplicate_of_id"]],
+                "duplicate_similarity": dup["similarity"],
+                "ml_classification": "duplicate",
+                "final_classification": "duplicate",
+                "ml_confidence": confidence,
+                "ml_explanation": explanation,
+                "stack_fingerprint": fingerprints[positions[dup_bug.id]],
+            })
+            dup_ids.add(dup["bug_id"])
 
         # Classification for non-duplicates
         non_dup_indices = [i for i, b in enumerate(bugs) if b.id not in dup_ids]
         classified = 0
         low_confidence = 0
+        cascade = None
+        cache_stats = None
 
         if non_dup_indices:
             non_dup_vectors = vectors[non_dup_indices]
-            predictions = self.classifier.predict(non_dup_vectors)
-
-            for idx, pred in zip(non_dup_indices, predictions):
+            start = time.perf_counter()
+            predictions, explanations, cascade, cache_stats = self._predict(
+                db, models, non_dup_vectors, [texts[i] for i in non_dup_indices],
+            )
+            predict_seconds = time.perf_counter() - start
+            predicted = self._prediction_rows(
+                [bugs[i] for i in non_dup_indices], models, non_dup_vectors,
+                predictions, explanations, self._model_stamp(db, models),
+            )
+            for row, idx, pred in zip(predicted, non_dup_indices, predictions):
                 bug = bugs[idx]
-                explanation = ""
-                if self.explainer:
-                    explanation = self.explainer.explain(
-                        vectors[idx], pred["classification"],
-                        pred["probabilities"],
-                    )
-
-                crud.update_bug_classification(
-                    db, bug.id,
-                    classification=pred["classification"],
-                    confidence=pred["confidence"],
-                    explanation=explanation,
+                row["stack_fingerprint"] = fingerprints[idx]
+                # A head keeps its family, which may reach into later cycles
+                row["duplicate_group_id"] = (
+                    bug.id if bug.id in heads or bug.duplicate_group_id == bug.id else None
                 )
-
-                # Store TF-IDF vector
-                bug.tfidf_vector_json = vectors[idx].tolist()
-                db.commit()
+                rows.append(row)
 
                 classified += 1
                 if pred["confidence"] < config.ml.confidence_threshold:
                     low_confidence += 1
 
+        write_stats = self._write_results(db, rows)
+        shadow_version = None
+        if non_dup_indices and models is self.models:
+            shadow_version = self._submit_shadow(
+                db, cycle_id, non_dup_vectors, [texts[i] for i in non_dup_indices],
+                predictions, predict_seconds,
+            )
+
+        if index is not None:
+            originals = [i for i, bug_id in enumerate(bug_ids) if bug_id not in dup_ids]
+            self._add_to_index(
+                db, bugs[0].cycle.project, models.feature_extractor,
+                summary_vectors[originals], [bug_ids[i] for i in originals], cycle_id,
+            )
+
         return {
             "classified": classified,
             "duplicates_found": len(duplicates),
             "low_confidence": low_confidence,
+            **write_stats,
+            **({"cascade": cascade} if cascade else {}),
+            **({"prediction_cache": cache_stats} if cache_stats else {}),
+            **({"shadow_version": shadow_version} if shadow_version else {}),
+        }
+
+    def _predict(
+        self, db: Session, models: ModelSet, vectors, texts: list[str],
+    ) -> tuple[list[dict], list[str], dict | None, dict | None]:
+        """Predictions, explanations, cascade counters and cache counters for ``vectors``.
+
+        With ``prediction_cache`` on, only texts this pair has not scored
+        before go through the model; the rest come from the cache. Hashing
+        mode skips the cache: every upload moves the IDF and so the key,
+        and no later cycle would read the rows stored under the old one.
+        """
+        if not config.ml.prediction_cache or models.feature_extractor.supports_partial_fit:
+            predictions, cascade = models.predict(vectors)
+            return predictions, _explain(models, vectors, predictions), cascade, None
+
+        key = models.fingerprint
+        if config.ml.cascade_inference:
+            key = f"{key}:cascade{config.ml.cascade_margin}"
+        hashes = [PredictionCache.text_hash(t) for t in texts]
+        cached = self.prediction_cache.lookup(db, hashes, key)
+        misses = [i for i, h in enumerate(hashes) if h not in cached]
+        cascade = None
+        if misses:
+            fresh, cascade = models.predict(vectors[misses])
+            explanations = _explain(models, vectors[misses], fresh)
+            for i, pred, explanation in zip(misses, fresh, explanations):
+                cached[hashes[i]] = {**pred, "explanation": explanation}
+            self.prediction_cache.store(db, key, {hashes[i]: cached[hashes[i]] for i in misses})
+
+        entries = [cached[h] for h in hashes]
+        predictions = [
+            {k: e[k] for k in ("classification", "confidence", "probabilities")} for e in entries
+        ]
+        stats = {"hits": len(hashes) - len(misses), "misses": len(misses)}
+        return predictions, [e["explanation"] for e in entries], cascade, stats
+
+    def _prediction_rows(
+        self, bugs: list, models: ModelSet, vectors, predictions: list[dict],
+        explanations: list[str], stamp: Optional[str],
+    ) -> list[dict]:
+        """Update rows recording each bug's prediction and the model version that made it."""
+        embeddings = None
+        if models.feature_extractor.embedding is not None:
+            embeddings = models.feature_extractor.embed(vectors)
+        rows = []
+        for i, (bug, pred, explanation) in enumerate(zip(bugs, predictions, explanations)):
+            # Reviewed bugs keep their human label; the keys stay uniform
+            # so every classification row goes out in the same executemany.
+            rows.append({
+                "id": bug.id,
+                "ml_classification": pred["classification"],
+                "ml_confidence": pred["confidence"],
+                "ml_explanation": explanation,
+                "ml_model_version": stamp,
+                "final_classification": (
+                    bug.final_classification if bug.reviewed else pred["classification"]
+                ),
+                "classification_source": (
+                    bug.classification_source if bug.reviewed else "ml"
+                ),
+                # With an embedding, its float32 bytes replace the sparse JSON row
+                "tfidf_vector_json": vector_to_json(vectors[i]) if embeddings is None else None,
+                "embedding": embeddings[i].tobytes() if embeddings is not None else None,
+            })
+        return rows
+
+    def _model_stamp(self, db: Session, models: ModelSet) -> Optional[str]:
+        """The version bugs scored by ``models`` are stamped with.
+
+        Project pairs are not versioned and share one stamp, so the stale
+        sweep leaves their bugs alone.
+        """
+        if models is not self.models:
+            return PROJECT_MODEL_STAMP
+        active = crud.get_active_model(db)
+        return active.version if active else None
+
+    def rescore_if_stale(self, db: Session, bug) -> bool:
+        """Re-score one classified bug now if a newer model serves it than the one that scored it."""
+        if not config.ml.lazy_rescoring or bug.ml_classification is None or bug.duplicate_of_id:
+            return False
+        with self.lock.read():
+            stamp = self._model_stamp(db, self.models_for(bug.cycle.project_id))
+            if stamp is None or bug.ml_model_version == stamp:
+                return False
+            rescored = self._rescore_bugs(db, [bug])
+        db.refresh(bug)
+        return bool(rescored)
+
+    def rescore_stale(self, db: Session) -> dict:
+        """Re-score, a batch at a time, every bug stamped with an older model than the active one.
+
+        Each batch holds the read lock only while it is scored, so a model
+        swap waits for at most one batch; later batches pick up the new version.
+        """
+        rescored = batches = 0
+        while True:
+            active = crud.get_active_model(db)
+            if active is None:
+                break
+            bugs = crud.get_stale_bugs(
+                db, active.version, config.ml.rescore_batch_size, keep=(PROJECT_MODEL_STAMP,),
+            )
+            if not bugs:
+                break
+            with self.lock.read():
+                written = self._rescore_bugs(db, bugs)
+            if not written:
+                break
+            rescored += written
+            batches += 1
+        return {"rescored": rescored, "batches": batches, "version": active.version if active else None}
+
+    def schedule_rescore(self, db: Session) -> bool:
+        """Start a background ``rescore_stale`` sweep unless one is already waiting to start."""
+        if not config.ml.lazy_rescoring:
+            return False
+        session_factory = sessionmaker(bind=db.get_bind(), autoflush=False, expire_on_commit=False)
+
+        def run():
+            sweep_db = session_factory()
+            try:
+                return self.rescore_stale(sweep_db)
+            finally:
+                sweep_db.close()
+
+        with self._sweep_lock:
+            # A running sweep may already have read the old version; only a queued one covers the new
+            if self.sweep is not None and not (self.sweep.running() or self.sweep.done()):
+                return False
+            self.sweep = self._sweeper.submit(run)
+        return True
+
+    def _rescore_bugs(self, db: Session, bugs: list) -> int:
+        """Score ``bugs`` with the pair that serves each one's project and stamp them."""
+        groups: dict[int, tuple[ModelSet, list]] = {}
+        for bug in bugs:
+            models = self.models_for(bug.cycle.project_id)
+            groups.setdefault(id(models), (models, []))[1].append(bug)
+        rows = []
+        for models, group in groups.values():
+            if not models.is_trained:
+                continue
+            if config.ml.feature_store and models is self.models:
+                store = FeatureStore(models.feature_extractor)
+                texts = store.texts(db, group)
+                vectors = models.feature_extractor.weigh(store.counts(db, group, texts))
+            else:
+                texts = [preprocess_bug(b.summary, b.description) for b in group]
+                vectors = models.feature_extractor.transform(texts)
+            predictions, explanations, _, _ = self._predict(db, models, vectors, texts)
+            rows += self._prediction_rows(
+                group, models, vectors, predictions, explanations, self._model_stamp(db, models),
+            )
+        return crud.bulk_update_bugs(db, rows)
+
+    def _submit_shadow(
+        self, db: Session, cycle_id: int, X, texts: list[str],
+        predictions: list[dict], seconds: float,
+    ) -> Optional[str]:
+        """Queue the candidate's pass over a classified cycle; returns the candidate's version."""
+        if not config.ml.shadow_mode:
+            return None
+        candidate = self._candidate_models(db)
+        if candidate is None:
+            return None
+        version, models = candidate
+        active = crud.get_active_model(db)
+        self.shadow.submit(
+            sessionmaker(bind=db.get_bind(), autoflush=False, expire_on_commit=False),
+            models, version, cycle_id, X, texts, predictions,
+            active.version if active else None, seconds, self.feature_extractor.version,
+        )
+        return version
+
+    def _candidate_models(self, db: Session) -> tuple[str, ModelSet] | None:
+        """The shadow candidate's pair, loaded from its registry object once per candidate."""
+        candidate = crud.get_candidate_model(db)
+        if candidate is None or not candidate.artifact_digest:
+            return None
+        if self._candidate is None or self._candidate[0] != candidate.version:
+            source = self.registry.path(candidate.artifact_digest)
+            self._candidate = (candidate.version, ModelSet(
+                FeatureExtractor(
+                    model_path=source / self.feature_extractor.model_path.name,
+                    sparse=self.feature_extractor.sparse,
+                ),
+                BugClassifier(model_path=source / self.classifier.model_path.name),
+            ))
+        return self._candidate
+
+    def _find_duplicates(
+        self, db: Session, bugs: list, summary_texts, summary_vectors,
+        fingerprints: list[str | None], feature_extractor: FeatureExtractor,
+    ) -> tuple[list[dict], DuplicateIndex | None]:
+        """Link each bug to an earlier original: prior cycles first, then within the cycle.
+
+        Re-reports of bugs from earlier cycles are matched first (crash
+        fingerprints by indexed lookup, then the similarity index), so the
+        in-cycle pass only has to consider bugs new to the project.
+        """
+        cycle_id = bugs[0].cycle_id
+        project = bugs[0].cycle.project
+        bug_ids = [b.id for b in bugs]
+
+        prior_crashes = crud.get_fingerprint_originals(
+            db, project.id, sorted({f for f in fingerprints if f}), cycle_id,
+        )
+        duplicates = [
+            {"bug_id": bug_ids[i], "duplicate_of_id": prior_crashes[f],
+             "similarity": 1.0, "match": "stack_trace"}
+            for i, f in enumerate(fingerprints) if f in prior_crashes
+        ]
+        remaining = [i for i, f in enumerate(fingerprints) if f not in prior_crashes]
+
+        index = None
+        if config.ml.cross_cycle_duplicates:
+            index = self._duplicate_index(db, project, feature_extractor)
+            matches = index.query(summary_vectors[remaining], before_cycle_id=cycle_id)
+            matched = {m["duplicate_of_id"] for m in matches if m}
+            if matched - {b.id for b in crud.get_bugs_by_ids(db, sorted(matched))}:
+                # The index names bugs that were deleted since it was saved
+                index = self._duplicate_index(db, project, feature_extractor, rebuild=True)
+                matches = index.query(summary_vectors[remaining], before_cycle_id=cycle_id)
+            duplicates += [
+                {"bug_id": bug_ids[i], **m} for i, m in zip(remaining, matches) if m
+            ]
+            remaining = [i for i, m in zip(remaining, matches) if not m]
+
+        if self.duplicate_detector.clustering and duplicates:
+            # Bugs matched to earlier cycles stay in the graph, so in-cycle
+            # bugs resembling them join the same family
+            duplicates = self.duplicate_detector.find_clusters(
+                summary_vectors, bug_ids, texts=list(summary_texts), fingerprints=fingerprints,
+                pinned={d["bug_id"]: d for d in duplicates},
+            )
+        else:
+            duplicates += self.duplicate_detector.find_duplicates(
+                summary_vectors[remaining], [bug_ids[i] for i in remaining],
+                texts=[summary_texts[i] for i in remaining],
+                fingerprints=[fingerprints[i] for i in remaining],
+            )
+        return duplicates, index
+
+    def _index_lock(self, project_id: int) -> threading.Lock:
+        with self._index_locks_guard:
+            return self._index_locks.setdefault(project_id, threading.Lock())
+
+    def _duplicate_index(
+        self, db: Session, project, feature_extractor: FeatureExtractor, rebuild: bool = False,
+    ) -> DuplicateIndex:
+        with self._index_lock(project.id):
+            return self._load_index(db, project, feature_extractor, rebuild)
+
+    def _add_to_index(
+        self, db: Session, project, feature_extractor: FeatureExtractor,
+        vectors, bug_ids: list[int], cycle_id: int,
+    ):
+        """Add a cycle's originals to the saved index.
+
+        The file is read again under the project's lock, so rows another
+        cycle saved since this one queried the index are kept.
+        """
+        with self._index_lock(project.id):
+            index = self._load_index(db, project, feature_extractor)
+            index.add(vectors, bug_ids, cycle_id)
+            index.save()
+
+    def _load_index(
+        self, db: Session, project, feature_extractor: FeatureExtractor, rebuild: bool = False,
+    ) -> DuplicateIndex:
+        """Load the project's index, rebuilding it if the vectorizer or the database changed."""
+        index = DuplicateIndex(project.id, detector=self.duplicate_detector)
+        source = _index_source(project)
+        if rebuild or index.version != feature_extractor.similarity_version or index.source != source:
+            index.reset(
+                feature_extractor.similarity_version, source,
+                dense=feature_extractor.embedding is not None,
+            )
+            by_cycle: dict[int, list] = {}
+            for bug in crud.get_classified_originals(db, project.id):
+                by_cycle.setdefault(bug.cycle_id, []).append(bug)
+            for prior_cycle_id, prior_bugs in by_cycle.items():
+                prior_vectors = feature_extractor.similarity_vectors(feature_extractor.transform(
+                    [preprocess_bug(b.summary) for b in prior_bugs]
+                ))
+                index.add(prior_vectors, [b.id for b in prior_bugs], prior_cycle_id)
+            index.save()
+        return index
+
+    def _write_results(self, db: Session, rows: list[dict]) -> dict:
+        """Persist a cycle's predictions in one transaction and time the write."""
+        start = time.perf_counter()
+        written = crud.bulk_update_bugs(db, rows)
+        elapsed = time.perf_counter() - start
+        return {
+            "rows_written": written,
+            "write_seconds": round(elapsed, 4),
+            "rows_per_second": round(written / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def staged_models(self) -> tuple[FeatureExtractor, BugClassifier]:
+        """An unfitted vectorizer/classifier pair that saves next to the live files.
+
+        With the feature store in hashing mode the staged vectorizer starts as
+        a copy of the live one, so a retrain can reuse stored counts (and the
+        names already seen for each hashed column).
+        """
+        feature_extractor = FeatureExtractor(
+            model_path=_staging_path(self.feature_extractor.model_path),
+            sparse=self.feature_extractor.sparse,
+        )
+        if config.ml.feature_store and self.feature_extractor.supports_partial_fit:
+            feature_extractor.vectorizer = copy.deepcopy(self.feature_extractor.vectorizer)
+        return feature_extractor, BugClassifier(model_path=_staging_path(self.classifier.model_path))
+
+    def swap_models(self, feature_extractor: FeatureExtractor, classifier: BugClassifier) -> str:
+        """Publish a staged pair; classification never sees a half-replaced pair.
+
+        The pair is committed to the registry under the live file names
+        first, so it can be promoted again later. Returns its digest.
+        """
+        digest = self._commit(feature_extractor, classifier)
+        with self.lock.write():
+            os.replace(feature_extractor.model_path, self.feature_extractor.model_path)
+            os.replace(classifier.compiled_path, self.classifier.compiled_path)
+            os.replace(classifier.model_path, self.classifier.model_path)
+            feature_extractor.model_path = self.feature_extractor.model_path
+            classifier.model_path = self.classifier.model_path
+            self._use_models(feature_extractor, classifier)
+        return digest
+
+    def stage_candidate(self, feature_extractor: FeatureExtractor, classifier: BugClassifier) -> str:
+        """Commit a staged pair to the registry without serving it; returns its digest."""
+        digest = self._commit(feature_extractor, classifier)
+        for path in _model_files(feature_extractor, classifier):
+            path.unlink()
+        return digest
+
+    def _commit(self, feature_extractor: FeatureExtractor, classifier: BugClassifier) -> str:
+        live_files = _model_files(self.feature_extractor, self.classifier)
+        return self.registry.commit({
+            live.name: staged
+            for live, staged in zip(live_files, _model_files(feature_extractor, classifier))
+        })
+
+    def _use_models(self, feature_extractor: FeatureExtractor, classifier: BugClassifier):
+        self.models = ModelSet(feature_extractor, classifier)
+        self.active_learner = ActiveLearner(feature_extractor, classifier)
+
+    def promote(self, db: Session, version: str) -> dict:
+        """Serve a previously trained version again, straight from the registry."""
+        model = crud.get_model_version(db, version)
+        if model is None:
+            raise LookupError(f"Unknown model version {version}")
+        if not model.artifact_digest:
+            raise ValueError(f"Model {version} has no registry artifacts")
+
+        start = time.perf_counter()
+        with self.lock.write():
+            self.registry.activate(
+                model.artifact_digest, _model_files(self.feature_extractor, self.classifier),
+            )
+            self._use_models(
+                FeatureExtractor(
+                    model_path=self.feature_extractor.model_path,
+                    sparse=self.feature_extractor.sparse,
+                ),
+                BugClassifier(model_path=self.classifier.model_path),
+            )
+        crud.activate_model_version(db, model.id)
+        return {
+            "status": "promoted",
+            "version": version,
+            "seconds": round(time.perf_counter() - start, 4),
+            **({"rescore_scheduled": True} if self.schedule_rescore(db) else {}),
         }
 
+    def rollback(self, db: Session) -> dict:
+        """Promote the newest registered version older than the active one."""
+        active = crud.get_active_model(db)
+        previous = next((
+            m for m in crud.get_model_versions(db)
+            if m.artifact_digest and (active is None or m.id < active.id)
+        ), None)
+        if previous is None:
+            raise LookupError("No earlier model version to roll back to")
+        return self.promote(db, previous.version)
+
     def train_initial_model(self, db: Session, labeled_data: list[dict]) -> dict:
         texts = [preprocess_bug(d["summary"], d.get("description", "")) for d in labeled_data]
         labels = np.array([d["label"] for d in labeled_data])
 
-        X = self.feature_extractor.fit_transform(texts)
-        metrics = self.classifier.fit(X, labels)
-        self._explainer = None  # Reset so it picks up new feature names
+        feature_extractor, classifier = self.staged_models()
+        X = feature_extractor.fit_transform(texts)
+        X = feature_extractor.select_features(X, labels)
+        metrics = classifier.fit(X, labels)
+        digest = self.swap_models(feature_extractor, classifier)
 
-        version = "v1"
+        version = crud.next_model_version(db)
         avg_f1 = (metrics["svm_f1"] + metrics["lr_f1"]) / 2
         crud.create_model_version(
             db, version=version,
             training_samples=metrics["training_samples"],
             accuracy=avg_f1, f1_score=avg_f1,
             model_path=str(self.classifier.model_path),
+            artifact_digest=digest,
         )
 
-        return {"status": "trained", "version": version, "metrics": metrics}
+        return {
+            "status": "trained", "version": version, "metrics": metrics,
+            **({"rescore_scheduled": True} if self.schedule_rescore(db) else {}),
+        }
 
-    def retrain_if_needed(self, db: Session) -> dict:
-        if self.active_learner.should_retrain(db):
-            result = self.active_learner.retrain(db)
-            self._explainer = None
+    def retrain(self, db: Session, progress: Optional[Callable[[str], None]] = None) -> dict:
+        """Fully retrain off to the side, then swap the new pair in.
+
+        In ``shadow_mode`` the new pair is only registered as the candidate;
+        it shadow-scores classified cycles until it is promoted. Safe to run
+        on a worker thread while cycles are being classified; ``progress`` is
+        told which stage the job has reached.
+        """
+        shadow = config.ml.shadow_mode
+
+        def publish(feature_extractor, classifier):
+            if progress:
+                progress("staging" if shadow else "swapping")
+            if shadow:
+                digest = self.stage_candidate(feature_extractor, classifier)
+            else:
+                digest = self.swap_models(feature_extractor, classifier)
+            if progress:
+                progress("recording")
+            return digest
+
+        if progress:
+            progress("fitting")
+        result = ActiveLearner(*self.staged_models()).retrain(
+            db, on_fitted=publish, activate=not shadow,
+        )
+        if config.ml.feature_store and result["status"] == "retrained" and not shadow:
+            # Re-count everything else stored under the old vectorizer
+            if progress:
+                progress("features")
+            result["features"] = FeatureStore(self.feature_extractor).rebuild(db)
+        if result["status"] == "retrained" and not shadow and self.schedule_rescore(db):
+            # Existing bugs are re-scored in the background rather than as part of the retrain
+            result["rescore_scheduled"] = True
+        return result
+
+    def _project_paths(self, project_id: int) -> tuple[Path, Path]:
+        """Where a project's own vectorizer and classifier are saved."""
+        project_dir = config.ml.model_dir / "projects" / f"project_{project_id}"
+        return (
+            project_dir / self.feature_extractor.model_path.name,
+            project_dir / self.classifier.model_path.name,
+        )
+
+    def _load_project_models(self, project_id: int) -> Optional[ModelSet]:
+        vectorizer_path, classifier_path = self._project_paths(project_id)
+        if not classifier_path.exists():
+            return None
+        return ModelSet(
+            FeatureExtractor(model_path=vectorizer_path, sparse=self.feature_extractor.sparse),
+            BugClassifier(model_path=classifier_path),
+        )
+
+    def train_project_model(
+        self, db: Session, project_id: int, progress: Optional[Callable[[str], None]] = None,
+    ) -> dict:
+        """Fit a pair on one project's reviewed bugs and serve that project from it.
+
+        Only used while ``per_project_models`` is on; other projects keep the
+        shared pair. Project pairs are refit on demand and are not updated
+        incrementally or recorded as model versions.
+        """
+        bugs = crud.get_reviewed_bugs(db, project_id=project_id)
+        labels = np.array([b.final_classification for b in bugs])
+        if len(bugs) < 10:
+            return {"status": "skipped", "reason": "Not enough reviewed samples (need >= 10)"}
+        if len(set(labels)) < 2:
+            return {"status": "skipped", "reason": "Need at least 2 distinct labels"}
+
+        if progress:
+            progress("fitting")
+        vectorizer_path, classifier_path = self._project_paths(project_id)
+        feature_extractor = FeatureExtractor(
+            model_path=_staging_path(vectorizer_path), sparse=self.feature_extractor.sparse,
+        )
+        classifier = BugClassifier(model_path=_staging_path(classifier_path))
+        X = feature_extractor.fit_transform([preprocess_bug(b.summary, b.description) for b in bugs])
+        X = feature_extractor.select_features(X, labels)
+        metrics = classifier.fit(X, labels)
+
+        if progress:
+            progress("swapping")
+        with self.lock.write():
+            # The classifier goes last: its file is what marks a project as having a model
+            os.replace(feature_extractor.model_path, vectorizer_path)
+            os.replace(classifier.compiled_path, classifier_path.with_suffix(".npz"))
+            os.replace(classifier.model_path, classifier_path)
+            feature_extractor.model_path = vectorizer_path
+            classifier.model_path = classifier_path
+            self.project_models.put(project_id, ModelSet(feature_extractor, classifier))
+        return {"status": "trained", "project_id": project_id, "metrics": metrics}
+
+    def delete_project_model(self, project_id: int) -> bool:
+        """Serve the project from the shared pair again; ``False`` if it had no model."""
+        vectorizer_path, classifier_path = self._project_paths(project_id)
+        with self.lock.write():
+            existed = classifier_path.exists()
+            for path in (classifier_path, classifier_path.with_suffix(".npz"), vectorizer_path):
+                path.unlink(missing_ok=True)
+            self.project_models.invalidate(project_id)
+        return existed
+
+    def full_retrain_due(self, db: Session) -> bool:
+        if config.ml.incremental_learning and self.classifier.online is not None:
+            return self.active_learner.rebuild_due(db)
+        # Without an online model, incremental mode retrains like batch mode until one is fitted
+        return self.active_learner.should_retrain(db)
+
+    def update_incrementally(self, db: Session) -> dict:
+        """Fold new overrides into the serving model (incremental mode only).
+
+        Overrides are folded once ``incremental_batch_size`` of them are
+        pending. Like a retrain, the fold runs on a staged copy of the
+        classifier and only the swap takes the write lock. A fold that a
+        retrain or promotion overtook is dropped; its overrides are folded
+        into the new pair next time.
+        """
+        if not config.ml.incremental_learning:
+            return {"status": "not_needed"}
+        with self._fold_lock:
+            models = self.models
+            live = models.classifier
+            # Only the online half changes; the SVM and batch LR are shared, not copied
+            classifier = copy.copy(live)
+            classifier.online = copy.deepcopy(live.online)
+            classifier.model_path = _folding_path(live.model_path)
+            result = ActiveLearner(models.feature_extractor, classifier).update(
+                db, min_batch=config.ml.incremental_batch_size,
+            )
+            if result["status"] != "updated":
+                return result
+            with self.lock.write():
+                if self.models is not models:
+                    classifier.model_path.unlink(missing_ok=True)
+                    classifier.compiled_path.unlink(missing_ok=True)
+                    return {"status": "superseded"}
+                os.replace(classifier.compiled_path, live.compiled_path)
+                os.replace(classifier.model_path, live.model_path)
+                classifier.model_path = live.model_path
+                self._use_models(models.feature_extractor, classifier)
             return result
-        return {"status": "not_needed"}
+
+    def retrain_if_needed(self, db: Session) -> dict:
+        if self.full_retrain_due(db):
+            return self.retrain(db)
+        return self.update_incrementally(db)
@@ -7,17 +7,21 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from src.db.database import Base
 from src.db.models import (  # noqa: F401
-    Project, RegressionCycle, BugReport,
-    ClassificationAuditLog, ModelVersion, User,
+    Project, RegressionCycle, BugReport, BugFeatures, CachedPrediction,
+    ClassificationAuditLog, DocumentFrequencyUpdate, ModelVersion, ShadowScore, User,
 )
 
 
 @pytest.fixture
 def db_session():
-    engine = create_engine("sqlite:///:memory:")
+    # One shared connection, so background workers see the same database
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool,
+    )
     Base.metadata.create_all(bind=engine)
     Session = sessionmaker(bind=engine)
     session = Session()
@@ -4,6 +4,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import numpy as np
+from configs.config import config
 from src.ml.active_learner import ActiveLearner
 from src.ml.feature_extractor import FeatureExtractor
 from src.ml.classifier import BugClassifier
@@ -46,3 +47,72 @@ class TestActiveLearner:
         learner = ActiveLearner(extractor, classifier)
         result = learner.retrain(db_session)
         assert result["status"] == "skipped"
+
+    def test_retrain_caps_training_set(self, db_session, sample_cycle, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "training_cap", 12)
+        summaries = ["login fails", "payment timeout", "export empty", "button color", "font too small"]
+        bugs = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": sample_cycle.id, "summary": f"{summaries[i % 5]} case {i}"} for i in range(20)
+        ])
+        for i, bug in enumerate(bugs):
+            crud.override_bug_classification(db_session, bug.id, "valid" if i % 5 < 3 else "invalid", "reviewer")
+
+        learner = ActiveLearner(
+            FeatureExtractor(model_path=tmp_path / "tfidf.joblib"),
+            BugClassifier(model_path=tmp_path / "clf.joblib"),
+        )
+        result = learner.retrain(db_session)
+        assert result["status"] == "retrained"
+        assert result["training_set"]["available"] == 20
+        # Everything was overridden just now, yet the recent overrides stay within the cap
+        assert result["training_set"]["selected"] == result["training_set"]["recent"] == 12
+        monkeypatch.setattr(learner.training_set, "recent_days", -1)
+        result = learner.retrain(db_session)
+        assert result["training_set"]["selected"] == 12
+        assert result["metrics"]["training_samples"] == 12
+
+    def test_retrain_selects_features(self, db_session, sample_cycle, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "feature_selection", "chi2")
+        monkeypatch.setattr(config.ml, "selected_features", 6)
+        summaries = ["login fails", "payment timeout", "export empty", "button color", "font too small"]
+        bugs = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": sample_cycle.id, "summary": f"{summaries[i % 5]} case {i}"} for i in range(20)
+        ])
+        for i, bug in enumerate(bugs):
+            crud.override_bug_classification(db_session, bug.id, "valid" if i % 5 < 3 else "invalid", "reviewer")
+
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        result = ActiveLearner(extractor, classifier).retrain(db_session)
+        assert result["status"] == "retrained"
+        assert extractor.n_features == 6
+        assert len(classifier.predict(extractor.transform(["login fails"]))) == 1
+
+    def test_update_folds_new_overrides(self, db_session, sample_bugs, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        texts = [b.summary for b in sample_bugs] * 2
+        labels = np.array(["valid", "invalid", "valid", "valid", "invalid"] * 2)
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        classifier.fit(extractor.fit_transform(texts), labels)
+        learner = ActiveLearner(extractor, classifier)
+        assert learner.update(db_session) == {"status": "not_needed"}
+
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "invalid", "reviewer")
+        crud.override_bug_classification(db_session, sample_bugs[1].id, "valid", "reviewer")
+        assert learner.update(db_session, min_batch=3) == {"status": "pending", "pending": 2}
+        result = learner.update(db_session)
+        assert result["status"] == "updated"
+        assert result["samples"] == 2
+        assert classifier.folded_through == crud.get_latest_override_id(db_session)
+        # Already folded overrides are not applied twice
+        assert learner.update(db_session) == {"status": "not_needed"}
+
+    def test_rebuild_due(self, db_session, sample_bugs, monkeypatch):
+        learner = ActiveLearner(None, None)
+        assert learner.rebuild_due(db_session) is False
+        crud.create_model_version(db_session, "v1", 10, 0.9, 0.9, "clf.joblib")
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "invalid", "reviewer")
+        assert learner.rebuild_due(db_session) is False
+        monkeypatch.setattr(config.ml, "full_retrain_days", 0)
+        assert learner.rebuild_due(db_session) is True
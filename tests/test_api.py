@@ -3,6 +3,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import time
 from contextlib import asynccontextmanager
 
 import pytest
@@ -15,11 +16,13 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from configs.config import config
+from src.api.dependencies import get_pipeline
 from src.db.database import Base, get_db
 from src.db.models import (  # noqa: F401
     Project, RegressionCycle, BugReport,
     ClassificationAuditLog, ModelVersion, User,
 )
+from src.pipeline import Pipeline
 
 
 def create_test_app(get_db_override):
@@ -115,6 +118,15 @@ def client():
         yield c
 
 
+@pytest.fixture
+def pipeline_client(client, tmp_path, monkeypatch):
+    """``client`` served by a pipeline of its own that keeps its models in ``tmp_path``."""
+    monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+    pipeline = Pipeline()
+    client.app.dependency_overrides[get_pipeline] = lambda: pipeline
+    return client
+
+
 class TestProjectsAPI:
     def test_create_project(self, client):
         resp = client.post("/api/projects", json={"name": "Test Project", "description": "Desc"})
@@ -184,3 +196,57 @@ class TestPageRoutes:
     def test_index_page(self, client):
         resp = client.get("/")
         assert resp.status_code == 200
+
+
+class TestTrainingAPI:
+    def test_retrain_runs_in_background(self, pipeline_client):
+        resp = pipeline_client.post("/api/retrain")
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+        for _ in range(100):
+            job = pipeline_client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.02)
+        assert job["status"] == "succeeded"
+        assert job["result"]["status"] == "skipped"
+
+    def test_unknown_job(self, client):
+        assert client.get("/api/jobs/nope").status_code == 404
+
+    def test_model_versions(self, pipeline_client):
+        assert pipeline_client.get("/api/models").json() == []
+        assert pipeline_client.post("/api/models/v1/promote").status_code == 404
+        assert pipeline_client.post("/api/models/rollback").status_code == 400
+        assert pipeline_client.get("/api/models/v1/shadow").status_code == 404
+
+    def test_project_model_routes(self, pipeline_client):
+        assert pipeline_client.post("/api/projects/999/model").status_code == 404
+        assert pipeline_client.delete("/api/projects/999/model").status_code == 404
+        assert pipeline_client.get("/api/models/cache").json()["resident"] == []
+        stats = pipeline_client.get("/api/models/prediction-cache").json()
+        assert (stats["entries"], stats["hits"], stats["hit_rate"]) == (0, 0, 0.0)
+
+
+class TestBugsAPI:
+    def test_get_bug_rescores_stale_prediction(self, pipeline_client, monkeypatch):
+        labeled = [
+            {"summary": f"{s} case {i}", "label": label}
+            for i in range(3)
+            for s, label in (("Login fails", "valid"), ("Payment timeout", "valid"), ("Button color", "invalid"), ("Font too small", "invalid"))
+        ]
+        assert pipeline_client.post("/api/train-initial", json={"labeled_data": labeled}).status_code == 200
+        project = pipeline_client.post("/api/projects", json={"name": "P"}).json()
+        upload = pipeline_client.post(
+            "/api/upload",
+            files={"file": ("bugs.csv", b"id,summary,description\n1,Login fails on Safari,Cannot sign in\n", "text/csv")},
+            data={"project_id": str(project["id"]), "cycle_name": "C1"},
+        ).json()
+        bug_id = pipeline_client.get(f"/api/cycles/{upload['cycle_id']}/bugs").json()[0]["id"]
+        assert pipeline_client.get(f"/api/bugs/{bug_id}").json()["ml_model_version"] == "v1"
+
+        assert pipeline_client.post("/api/train-initial", json={"labeled_data": labeled[::-1]}).status_code == 200
+        monkeypatch.setattr(config.ml, "lazy_rescoring", True)
+        bug = pipeline_client.get(f"/api/bugs/{bug_id}").json()
+        assert bug["rescored"] and bug["ml_model_version"] == "v2"
+        assert pipeline_client.get(f"/api/bugs/{bug_id}").json()["rescored"] is False
@@ -0,0 +1,34 @@
+"""Tests for two-stage cascade scoring."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from src.ml.cascade import cascade_proba
+
+
+class TestCascadeProba:
+    def test_only_unsure_rows_reach_the_full_stage(self):
+        cheap = np.array([[0.9, 0.1], [0.55, 0.45], [0.2, 0.8]])
+        full = np.array([[0.1, 0.9], [0.1, 0.9], [0.1, 0.9]])
+        seen = []
+
+        def full_stage(X):
+            seen.append(X.copy())
+            return full[X[:, 0].astype(int)]
+
+        X = np.arange(3, dtype=float).reshape(-1, 1)
+        proba, stats = cascade_proba(X, lambda X: cheap.copy(), full_stage, margin=0.5)
+        assert [row.tolist() for row in seen[0]] == [[1.0]]
+        assert proba.tolist() == [[0.9, 0.1], [0.325, 0.675], [0.2, 0.8]]
+        assert (stats["full_stage"], stats["short_circuited"], stats["short_circuit_rate"]) == (1, 2, 0.6667)
+
+    def test_every_row_confident(self):
+        def full_stage(X):
+            raise AssertionError("the full stage should not run")
+
+        X = np.zeros((2, 1))
+        proba, stats = cascade_proba(X, lambda X: np.array([[1.0, 0.0], [0.0, 1.0]]), full_stage, margin=0.5)
+        assert stats["full_stage"] == 0
+        assert stats["estimated_seconds_saved"] is None
@@ -3,8 +3,12 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import scipy.sparse as sp
 import pytest
+from configs.config import config
 from src.ml.classifier import BugClassifier
 from src.ml.feature_extractor import FeatureExtractor
 from src.ml.preprocessor import preprocess_bug
@@ -41,6 +45,16 @@ class TestClassifier:
         X = extractor.fit_transform(texts)
         return X, labels, extractor
 
+    def test_concurrent_saves(self, tmp_path):
+        X, labels, _ = self._get_training_data(tmp_path)
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        classifier.fit(X, labels)
+        # Overrides and background retrains may save the same files at once
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: classifier._save(), range(32)))
+        assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("clf")) == ["clf.joblib", "clf.npz"]
+        assert BugClassifier(model_path=tmp_path / "clf.joblib").is_trained
+
     def test_fit_and_predict(self, tmp_path):
         X, labels, _ = self._get_training_data(tmp_path)
         classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
@@ -79,3 +93,92 @@ class TestClassifier:
         clf2 = BugClassifier(model_path=model_path)
         pred2 = clf2.predict(X[:2])
         assert pred1[0]["classification"] == pred2[0]["classification"]
+
+    def test_predict_sparse(self, tmp_path):
+        X, labels, _ = self._get_training_data(tmp_path)
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        classifier.fit(sp.csr_matrix(X), labels)
+        dense_preds = classifier.predict(X[:4])
+        sparse_preds = classifier.predict(sp.csr_matrix(X[:4]))
+        assert [p["classification"] for p in sparse_preds] == [p["classification"] for p in dense_preds]
+        assert classifier.predict_single(sp.csr_matrix(X[0]))["classification"] in ("valid", "invalid")
+
+    def test_partial_fit(self, tmp_path, monkeypatch):
+        X, labels, _ = self._get_training_data(tmp_path)
+        model_path = tmp_path / "clf.joblib"
+        classifier = BugClassifier(model_path=model_path)
+        classifier.fit(X, labels)
+        # Fitted without incremental mode: nothing to update yet
+        assert classifier.online is None
+        with pytest.raises(RuntimeError):
+            classifier.partial_fit(X[:1], labels[:1], folded_through=1)
+
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        classifier.fit(X, labels)
+        before = classifier.predict(X[:1])[0]["probabilities"]["invalid"]
+        online_before = classifier._lr_proba(X[:1])
+
+        # Reviewers keep relabeling the first bug as invalid
+        batch = np.repeat(X[:1], 20, axis=0)
+        result = classifier.partial_fit(batch, np.array(["invalid"] * 19 + ["wont_fix"]), folded_through=7)
+        assert result == {"samples": 19, "skipped": 1}
+        assert classifier.predict(X[:1])[0]["probabilities"]["invalid"] > before
+
+        reloaded = BugClassifier(model_path=model_path)
+        assert reloaded.folded_through == 7
+        assert reloaded.online is not None
+
+        # A full fit starts the online model again (the SVM half is not seeded, so compare LR only)
+        classifier.fit(X, labels)
+        assert classifier._lr_proba(X[:1]) == pytest.approx(online_before)
+
+    @pytest.mark.parametrize("n_classes", [2, 3])
+    def test_zero_step_update_keeps_probabilities(self, tmp_path, monkeypatch, n_classes):
+        X, labels, _ = self._get_training_data(tmp_path)
+        if n_classes == 3:
+            labels = np.array([label if i % 3 else "wont_fix" for i, label in enumerate(labels)])
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        monkeypatch.setattr(config.ml, "incremental_learning_rate", 1e-12)
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        classifier.fit(X, labels)
+        before = [p["probabilities"] for p in classifier.predict(X)]
+        classifier.partial_fit(X[:4], labels[:4], folded_through=1)
+        for got, expected in zip(classifier.predict(X), before):
+            assert got["probabilities"] == pytest.approx(expected)
+
+    def test_fast_training(self, tmp_path, monkeypatch):
+        X, labels, _ = self._get_training_data(tmp_path)
+        full = BugClassifier(model_path=tmp_path / "full.joblib")
+        full.fit(X, labels)
+
+        monkeypatch.setattr(config.ml, "fast_training", True)
+        monkeypatch.setattr(config.ml, "training_n_jobs", 2)
+        fast = BugClassifier(model_path=tmp_path / "fast.joblib")
+        metrics = fast.fit(X, labels)
+        assert 0.0 <= metrics["svm_f1"] <= 1.0
+        assert 0.0 <= metrics["lr_f1"] <= 1.0
+        assert metrics["training_samples"] == 20
+        assert metrics["fit_seconds"] >= 0.0
+        # Same served models, only the evaluation is cheaper
+        fast_preds, full_preds = fast.predict(X), full.predict(X)
+        assert [p["classification"] for p in fast_preds] == [p["classification"] for p in full_preds]
+        assert [p["confidence"] for p in fast_preds] == pytest.approx([p["confidence"] for p in full_preds], abs=1e-4)
+
+    def test_predict_cascade(self, tmp_path):
+        X, labels, _ = self._get_training_data(tmp_path)
+        classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+        classifier.fit(X, labels)
+        full = classifier.predict(X)
+
+        # A margin above 1 escalates every row: identical to the plain ensemble
+        preds, stats = classifier.predict_cascade(X, margin=1.1)
+        assert stats["full_stage"] == len(labels) and stats["short_circuited"] == 0
+        assert [p["confidence"] for p in preds] == pytest.approx([p["confidence"] for p in full])
+
+        # A zero margin trusts LR everywhere
+        preds, stats = classifier.predict_cascade(X, margin=0.0)
+        assert stats["short_circuited"] == len(labels)
+        assert stats["short_circuit_rate"] == 1.0
+        assert stats["estimated_seconds_saved"] is None
+        lr_proba = classifier.lr.predict_proba(X)
+        assert [p["confidence"] for p in preds] == pytest.approx(lr_proba.max(axis=1).tolist())
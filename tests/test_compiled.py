@@ -0,0 +1,85 @@
+"""Tests for the NumPy-only ensemble kernel."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import scipy.sparse as sp
+import pytest
+from configs.config import config
+from src.ml.classifier import BugClassifier
+from src.ml.compiled import CompiledEnsemble
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug
+
+
+SUMMARIES = [
+    ("Login fails with valid credentials on Firefox", "valid"),
+    ("Payment processing timeout after 30 seconds", "valid"),
+    ("Dashboard charts not rendering for large datasets", "valid"),
+    ("Report export produces empty CSV file", "valid"),
+    ("Search returns no results for exact match", "valid"),
+    ("File upload fails silently for large files", "valid"),
+    ("The button color should be darker blue", "invalid"),
+    ("I think the font size is too small", "invalid"),
+    ("Application is slow on my old laptop", "invalid"),
+    ("Would be nice to have keyboard shortcuts", "invalid"),
+    ("The loading spinner is not centered", "invalid"),
+    ("UI looks different than old mockup", "invalid"),
+    ("Login fails with valid credentials on Chrome", "duplicate"),
+    ("Payment processing timeout after 60 seconds", "duplicate"),
+    ("Report export produces empty PDF file", "duplicate"),
+    ("Dashboard charts not rendering for small datasets", "duplicate"),
+    ("Search returns no results for partial match", "duplicate"),
+    ("File upload fails silently for small files", "duplicate"),
+]
+
+
+def _trained(tmp_path, labels):
+    texts = [preprocess_bug(s) for s, _ in SUMMARIES]
+    X = FeatureExtractor(model_path=tmp_path / "tfidf.joblib").fit_transform(texts)
+    classifier = BugClassifier(model_path=tmp_path / "clf.joblib")
+    classifier.fit(X, np.array(labels))
+    return X, classifier
+
+
+class TestCompiledEnsemble:
+    @pytest.mark.parametrize("binary", [True, False])
+    def test_matches_classifier(self, tmp_path, binary):
+        labels = [label for _, label in SUMMARIES]
+        if binary:
+            labels = ["valid" if label == "duplicate" else label for label in labels]
+        X, classifier = _trained(tmp_path, labels)
+        assert classifier.compiled_path.exists()
+
+        compiled = CompiledEnsemble(classifier.compiled_path)
+        expected = classifier.predict(X)
+        got = compiled.predict_records(sp.csr_matrix(X))
+        assert [g["classification"] for g in got] == [e["classification"] for e in expected]
+        for g, e in zip(got, expected):
+            assert g["probabilities"] == pytest.approx(e["probabilities"])
+
+    def test_columnar_output(self, tmp_path):
+        X, classifier = _trained(tmp_path, [label for _, label in SUMMARIES])
+        columns = CompiledEnsemble(classifier.compiled_path).predict(X)
+        assert columns["probabilities"].shape == (len(SUMMARIES), 3)
+        assert columns["probabilities"].sum(axis=1) == pytest.approx(np.ones(len(SUMMARIES)))
+        assert columns["confidence"] == pytest.approx(columns["probabilities"].max(axis=1))
+
+    def test_follows_incremental_updates(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        X, classifier = _trained(tmp_path, [label for _, label in SUMMARIES])
+        classifier.partial_fit(X[:3], np.array(["invalid"] * 3), folded_through=1)
+        got = CompiledEnsemble(classifier.compiled_path).predict_records(X)
+        for g, e in zip(got, classifier.predict(X)):
+            assert g["probabilities"] == pytest.approx(e["probabilities"])
+
+    def test_cascade_matches_classifier(self, tmp_path):
+        X, classifier = _trained(tmp_path, [label for _, label in SUMMARIES])
+        compiled = CompiledEnsemble(classifier.compiled_path)
+        expected, expected_stats = classifier.predict_cascade(X, margin=0.3)
+        columns, stats = compiled.predict_cascade(X, margin=0.3)
+        assert stats["full_stage"] == expected_stats["full_stage"]
+        assert 0 < stats["full_stage"] + stats["short_circuited"] == len(SUMMARIES)
+        for g, e in zip(compiled.records(columns), expected):
+            assert g["probabilities"] == pytest.approx(e["probabilities"])
@@ -80,6 +80,39 @@ class TestCRUD:
         active = crud.get_active_model(db_session)
         assert active.version == "v2"
 
+    def test_next_model_version_and_activate(self, db_session):
+        assert crud.next_model_version(db_session) == "v1"
+        mv = crud.create_model_version(db_session, "v1", 100, 0.85, 0.83, "/p", artifact_digest="abc")
+        crud.create_model_version(db_session, "v2", 200, 0.90, 0.88, "/p")
+        assert crud.next_model_version(db_session) == "v3"
+        assert [m.version for m in crud.get_model_versions(db_session)] == ["v2", "v1"]
+
+        crud.activate_model_version(db_session, mv.id)
+        active = crud.get_active_model(db_session)
+        assert active.version == "v1" and active.artifact_digest == "abc"
+        assert sum(m.is_active for m in crud.get_model_versions(db_session)) == 1
+
+    def test_candidate_model_and_shadow_summary(self, db_session, sample_cycle):
+        crud.create_model_version(db_session, "v1", 100, 0.85, 0.83, "/p")
+        candidate = crud.create_model_version(db_session, "v2", 120, 0.86, 0.84, "/p", activate=False)
+        assert crud.get_active_model(db_session).version == "v1"
+        assert crud.get_candidate_model(db_session).id == candidate.id
+
+        for rows, agreement, shift in ((10, 1.0, 0.1), (30, 0.6, -0.1)):
+            crud.create_shadow_score(
+                db_session, cycle_id=sample_cycle.id, candidate_version="v2", active_version="v1",
+                rows=rows, agreement_rate=agreement, confidence_shift=shift,
+                active_seconds=0.01, candidate_seconds=0.02,
+            )
+        summary = crud.get_shadow_summary(db_session, "v2")
+        assert summary["cycles"] == 2 and summary["rows"] == 40
+        assert summary["agreement_rate"] == 0.7
+        assert summary["confidence_shift"] == -0.05
+        assert crud.get_shadow_summary(db_session, "v9")["agreement_rate"] is None
+
+        crud.activate_model_version(db_session, candidate.id)
+        assert crud.get_candidate_model(db_session) is None
+
     def test_create_user(self, db_session):
         user = crud.create_user(db_session, "testuser", "Test User", "reviewer")
         assert user.role == "reviewer"
@@ -97,3 +130,108 @@ class TestCRUD:
         assert counts["total"] == 5
         assert counts["valid"] == 3
         assert counts["invalid"] == 2
+
+    def test_bulk_update_bugs(self, db_session, sample_bugs):
+        rows = [
+            {"id": sample_bugs[0].id, "ml_classification": "valid", "ml_confidence": 0.9},
+            {"id": sample_bugs[1].id, "ml_classification": "invalid", "ml_confidence": 0.7},
+        ]
+        assert crud.bulk_update_bugs(db_session, rows) == 2
+        assert crud.get_bug(db_session, sample_bugs[0].id).ml_classification == "valid"
+        assert crud.get_bug(db_session, sample_bugs[1].id).ml_confidence == 0.7
+        assert crud.get_bug(db_session, sample_bugs[2].id).ml_classification is None
+        assert crud.bulk_update_bugs(db_session, []) == 0
+
+    def test_get_fingerprint_originals(self, db_session, sample_project, sample_cycle, sample_bugs):
+        sample_bugs[1].stack_fingerprint = "f1"
+        sample_bugs[3].stack_fingerprint = "f1"
+        sample_bugs[4].stack_fingerprint = "f2"
+        sample_bugs[4].duplicate_of_id = sample_bugs[0].id
+        db_session.commit()
+        later = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+
+        found = crud.get_fingerprint_originals(db_session, sample_project.id, ["f1", "f2", "f3"], later.id)
+        assert found == {"f1": sample_bugs[1].id}
+        assert crud.get_fingerprint_originals(db_session, sample_project.id, ["f1"], sample_cycle.id) == {}
+
+    def test_get_stale_bugs(self, db_session, sample_bugs):
+        crud.bulk_update_bugs(db_session, [
+            {"id": sample_bugs[0].id, "ml_classification": "valid", "ml_model_version": "v2"},
+            {"id": sample_bugs[1].id, "ml_classification": "valid", "ml_model_version": "v1"},
+            {"id": sample_bugs[2].id, "ml_classification": "valid", "ml_model_version": None},
+            {"id": sample_bugs[3].id, "ml_classification": "valid", "ml_model_version": "project"},
+        ])
+        sample_bugs[4].ml_classification = "duplicate"
+        sample_bugs[4].duplicate_of_id = sample_bugs[0].id
+        db_session.commit()
+
+        stale = crud.get_stale_bugs(db_session, "v2", limit=10, keep=("project",))
+        assert [b.id for b in stale] == [sample_bugs[1].id, sample_bugs[2].id]
+        assert len(crud.get_stale_bugs(db_session, "v2", limit=1)) == 1
+        assert len(crud.get_stale_bugs(db_session, "v2", limit=10)) == 3
+
+    def test_get_duplicate_group(self, db_session, sample_bugs):
+        group_id = sample_bugs[0].id
+        for bug in (sample_bugs[3], sample_bugs[0], sample_bugs[1]):
+            bug.duplicate_group_id = group_id
+        db_session.commit()
+        family = crud.get_duplicate_group(db_session, group_id)
+        assert [b.id for b in family] == [sample_bugs[0].id, sample_bugs[1].id, sample_bugs[3].id]
+        assert crud.get_duplicate_group(db_session, sample_bugs[2].id) == []
+
+    def test_bug_features(self, db_session, sample_bugs):
+        rows = [
+            {"bug_id": bug.id, "extractor_version": version, "text": bug.summary,
+             "counts_json": {"size": 2, "indices": [0], "values": [1.0]}}
+            for bug, version in ((sample_bugs[0], "a"), (sample_bugs[1], "a"), (sample_bugs[0], "b"))
+        ]
+        assert crud.bulk_create_bug_features(db_session, rows) == 3
+        assert crud.bulk_create_bug_features(db_session, rows[:1]) == 0
+        assert set(crud.get_bug_features(db_session, [sample_bugs[0].id, sample_bugs[1].id], "a")) == {
+            sample_bugs[0].id, sample_bugs[1].id,
+        }
+        assert crud.get_stored_texts(db_session, [sample_bugs[1].id]) == {sample_bugs[1].id: sample_bugs[1].summary}
+        assert crud.get_bug_ids_missing_features(db_session, "b", limit=10) == [sample_bugs[1].id]
+        crud.override_bug_classification(db_session, sample_bugs[2].id, "valid", "reviewer")
+        assert crud.get_bug_ids_missing_features(db_session, "b", limit=10) == [sample_bugs[1].id, sample_bugs[2].id]
+        assert crud.delete_stale_bug_features(db_session, "b") == 2
+
+    def test_cached_predictions(self, db_session):
+        rows = [
+            {"text_hash": h, "model_key": "m1", "classification": "valid", "confidence": 0.8,
+             "probabilities": {"valid": 0.8, "invalid": 0.2}, "explanation": ""}
+            for h in ("a", "b", "c")
+        ]
+        assert crud.bulk_create_cached_predictions(db_session, rows) == 3
+        assert crud.bulk_create_cached_predictions(db_session, rows[:1]) == 0
+        assert set(crud.get_cached_predictions(db_session, ["a", "c", "z"], "m1")) == {"a", "c"}
+        assert crud.get_cached_predictions(db_session, ["a"], "m2") == {}
+        assert crud.trim_cached_predictions(db_session, 2) == 1
+        assert crud.count_cached_predictions(db_session) == 2
+        assert set(crud.get_cached_predictions(db_session, ["a", "b", "c"], "m1")) == {"b", "c"}
+
+    def test_get_reviewed_bugs_for_project(self, db_session, sample_project, sample_bugs):
+        other = crud.create_project(db_session, "Other")
+        other_cycle = crud.create_cycle(db_session, other.id, "C", "generic", "o.csv")
+        [other_bug] = crud.bulk_create_bugs(db_session, [{"cycle_id": other_cycle.id, "summary": "x"}])
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "valid", "reviewer")
+        crud.override_bug_classification(db_session, other_bug.id, "invalid", "reviewer")
+        assert len(crud.get_reviewed_bugs(db_session)) == 2
+        assert [b.id for b in crud.get_reviewed_bugs(db_session, project_id=other.id)] == [other_bug.id]
+
+    def test_get_review_history(self, db_session, sample_bugs):
+        crud.bulk_update_bugs(db_session, [
+            {"id": b.id, "ml_classification": "invalid", "final_classification": "invalid"}
+            for b in sample_bugs[:3]
+        ])
+        crud.override_bug_classification(db_session, sample_bugs[2].id, "valid", "reviewer")
+        crud.override_bug_classification(db_session, sample_bugs[1].id, "invalid", "reviewer")
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "valid", "reviewer")
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "valid", "reviewer")
+        history = crud.get_review_history(db_session)
+        assert [(bug_id, label) for bug_id, label, _, _ in history] == [
+            (sample_bugs[0].id, "valid"), (sample_bugs[1].id, "invalid"), (sample_bugs[2].id, "valid"),
+        ]
+        assert all(at is not None for _, _, at, _ in history)
+        # A confirmation is no override; a later confirmation does not undo one
+        assert [overridden for *_, overridden in history] == [True, False, True]
@@ -0,0 +1,37 @@
+"""Tests for database initialization and schema upgrades."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db import crud
+from src.db.database import init_db
+
+
+class TestInitDb:
+    def test_adds_columns_to_existing_tables(self):
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        # Tables as an earlier release created them, with one row each
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE model_versions (id INTEGER PRIMARY KEY, version VARCHAR(50) NOT NULL, "
+                "trained_at DATETIME, training_samples INTEGER, accuracy FLOAT, f1_score FLOAT, "
+                "model_path VARCHAR(500), is_active BOOLEAN)"
+            ))
+            conn.execute(text("INSERT INTO model_versions (version, is_active) VALUES ('v1', 1)"))
+        init_db(engine)
+
+        columns = {c["name"] for c in inspect(engine).get_columns("model_versions")}
+        assert {"artifact_digest", "is_candidate"} <= columns
+        assert "bug_reports" in inspect(engine).get_table_names()
+        db = sessionmaker(bind=engine)()
+        try:
+            active = crud.get_active_model(db)
+            assert active.version == "v1" and active.is_candidate is False
+        finally:
+            db.close()
+        # A second run finds nothing left to add
+        init_db(engine)
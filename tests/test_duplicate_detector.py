@@ -4,6 +4,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import numpy as np
+import pytest
 from src.ml.duplicate_detector import DuplicateDetector
 from src.ml.feature_extractor import FeatureExtractor
 from src.ml.preprocessor import preprocess_bug
@@ -58,3 +59,168 @@ class TestDuplicateDetector:
     def test_single_input(self):
         detector = DuplicateDetector()
         assert detector.find_duplicates(np.array([[1.0, 0.0]]), [1]) == []
+
+    def test_sparse_input(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib", sparse=True)
+        texts = [
+            preprocess_bug("Login fails with valid credentials"),
+            preprocess_bug("Button color should be blue"),
+            preprocess_bug("Login is broken with valid credentials"),
+        ]
+        vectors = extractor.fit_transform(texts)
+        detector = DuplicateDetector(threshold=0.30)
+        assert detector.find_duplicates(vectors, [1, 2, 3]) == detector.find_duplicates(vectors.toarray(), [1, 2, 3])
+        assert detector.check_single(vectors[2], vectors[:2], [1, 2]) is not None
+
+    def test_links_to_earliest_non_duplicate(self):
+        vectors = np.array([
+            [1.0, 0.0, 0.0],
+            [1.0, 0.1, 0.0],   # duplicate of 1
+            [1.0, 0.1, 0.0],   # identical to 2, but 2 is already a duplicate
+            [0.0, 0.0, 1.0],
+        ])
+        for block_size in (1, 2, 1024):
+            detector = DuplicateDetector(threshold=0.9, block_size=block_size)
+            dups = detector.find_duplicates(vectors, [1, 2, 3, 4])
+            assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(2, 1), (3, 1)]
+
+    def test_block_size_does_not_change_result(self):
+        rng = np.random.default_rng(0)
+        base = rng.random((20, 15)) * (rng.random((20, 15)) < 0.4)
+        vectors = base[rng.integers(0, 20, 120)] + 0.01 * rng.random((120, 15))
+        bug_ids = list(range(1, 121))
+        expected = DuplicateDetector(threshold=0.95, block_size=1024).find_duplicates(vectors, bug_ids)
+        assert expected
+        for block_size in (1, 7, 50):
+            dups = DuplicateDetector(threshold=0.95, block_size=block_size).find_duplicates(vectors, bug_ids)
+            assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [
+                (d["bug_id"], d["duplicate_of_id"]) for d in expected
+            ]
+
+    def test_lsh_mode_matches_exact(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        texts = [
+            preprocess_bug("Login fails with valid credentials"),
+            preprocess_bug("Button color should be blue"),
+            preprocess_bug("Login fails with valid credentials"),
+            preprocess_bug("Payment processing timeout"),
+            preprocess_bug("Payment processing timeout"),
+        ]
+        vectors = extractor.fit_transform(texts)
+        exact = DuplicateDetector(threshold=0.9, mode="exact").find_duplicates(vectors, [1, 2, 3, 4, 5])
+        lsh = DuplicateDetector(threshold=0.9, mode="lsh").find_duplicates(vectors, [1, 2, 3, 4, 5], texts=texts)
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in lsh] == [(3, 1), (5, 4)]
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in exact] == [(3, 1), (5, 4)]
+
+    def test_lsh_mode_requires_texts(self):
+        detector = DuplicateDetector(mode="lsh")
+        with pytest.raises(ValueError):
+            detector.find_duplicates(np.eye(2), [1, 2])
+
+    def test_find_exact_duplicates(self):
+        detector = DuplicateDetector()
+        texts = ["login fails", "payment timeout", "login fails", "", "", "login fails"]
+        dups, keep = detector.find_exact_duplicates(texts, [1, 2, 3, 4, 5, 6])
+        assert [(d["bug_id"], d["duplicate_of_id"], d["similarity"]) for d in dups] == [
+            (3, 1, 1.0), (6, 1, 1.0),
+        ]
+        # Empty texts are never grouped
+        assert keep == [0, 1, 3, 4]
+
+    def test_verbatim_group_follows_its_original(self):
+        vectors = np.array([
+            [1.0, 0.0],
+            [1.0, 0.05],
+            [1.0, 0.05],
+            [0.0, 0.0],
+            [0.0, 0.0],
+        ])
+        texts = ["login fails", "login failing", "login failing", "zzz qqq", "zzz qqq"]
+        dups = DuplicateDetector(threshold=0.9).find_duplicates(vectors, [1, 2, 3, 4, 5], texts=texts)
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(2, 1), (3, 1), (5, 4)]
+
+    def test_fingerprint_groups(self):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]])
+        texts = ["checkout crash", "payment page error", "different words"]
+        dups = DuplicateDetector(threshold=0.99).find_duplicates(
+            vectors, [1, 2, 3], texts=texts, fingerprints=["abc", None, "abc"],
+        )
+        assert dups == [{"bug_id": 3, "duplicate_of_id": 1, "similarity": 1.0, "match": "stack_trace"}]
+
+    def test_fingerprint_group_follows_similar_first_member(self):
+        vectors = np.array([[1.0, 0.0], [1.0, 0.05], [0.0, 1.0]])
+        texts = ["payment timeout", "payment timeouts", "order page empty"]
+        dups = DuplicateDetector(threshold=0.9).find_duplicates(
+            vectors, [1, 2, 3], texts=texts, fingerprints=[None, "abc", "abc"],
+        )
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(2, 1), (3, 1)]
+        # Bug 1 does not share bug 3's trace: the link is the chain through bug 2
+        assert "match" not in dups[1]
+        assert dups[1]["similarity"] == dups[0]["similarity"] < 1.0
+
+    def test_clustering_joins_chained_duplicates(self):
+        vectors = np.array([
+            [1.0, 0.0, 0.0],
+            [0.0, 0.0, 1.0],
+            [1.0, 0.4, 0.0],   # close to 1 and 4, but 1 and 4 are not close
+            [1.0, 0.8, 0.0],
+        ])
+        pairwise = DuplicateDetector(threshold=0.9, clustering=False).find_duplicates(vectors, [1, 2, 3, 4])
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in pairwise] == [(3, 1)]
+        for block_size in (1, 3, 1024):
+            detector = DuplicateDetector(threshold=0.9, block_size=block_size, clustering=True)
+            dups = detector.find_duplicates(vectors, [1, 2, 3, 4])
+            assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(3, 1), (4, 1)]
+            # Bug 4 reached the group through bug 3
+            assert dups[1]["similarity"] == pytest.approx(vectors[2] @ vectors[3] / (
+                np.linalg.norm(vectors[2]) * np.linalg.norm(vectors[3])
+            ))
+
+    def test_clustering_merges_key_groups(self):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 1.0], [0.1, 1.0]])
+        texts = ["checkout crash", "payment error", "payment error", "payment errors"]
+        dups = DuplicateDetector(threshold=0.9, clustering=True).find_duplicates(
+            vectors, [1, 2, 3, 4], texts=texts, fingerprints=["abc", None, None, "abc"],
+        )
+        # 4 shares a crash with 1 and text with 2, so all four are one family
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(2, 1), (3, 1), (4, 1)]
+        assert dups[2]["match"] == "stack_trace"
+
+    def test_clustering_crash_mates_of_other_original(self):
+        vectors = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.05, 1.0, 0.0], [0.0, 0.0, 1.0]])
+        texts = ["checkout crash", "payment error", "payment errors", "order page empty"]
+        dups = DuplicateDetector(threshold=0.9, clustering=True).find_duplicates(
+            vectors, [1, 2, 3, 4], texts=texts, fingerprints=["abc", None, "xyz", "xyz"],
+        )
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(3, 2), (4, 2)]
+        # Neither shares bug 2's trace; 4 only reaches it through its crash mate 3
+        assert not any("match" in d for d in dups)
+        assert dups[1]["similarity"] == dups[0]["similarity"] < 1.0
+
+    def test_clustering_pinned_to_earlier_original(self):
+        vectors = np.array([[1.0, 0.0], [1.0, 0.05], [0.0, 1.0]])
+        texts = ["payment timeout", "payment timeouts", "order page empty"]
+        prior = {"bug_id": 2, "duplicate_of_id": 99, "similarity": 0.95}
+        dups = DuplicateDetector(threshold=0.9, clustering=True).find_clusters(
+            vectors, [1, 2, 3], texts=texts, pinned={2: prior},
+        )
+        # Bug 1 resembles the pinned bug 2, so it joins bug 99's family too
+        assert dups[1] == prior
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in dups] == [(1, 99), (2, 99)]
+        assert dups[0]["similarity"] > 0.9 and "match" not in dups[0]
+
+    def test_clustering_lsh_mode(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        texts = [
+            preprocess_bug("Login fails with valid credentials"),
+            preprocess_bug("Button color should be blue"),
+            preprocess_bug("Login fails with valid credentials today"),
+            preprocess_bug("Login fails with valid credentials"),
+        ]
+        vectors = extractor.fit_transform(texts)
+        exact = DuplicateDetector(threshold=0.7, clustering=True).find_duplicates(vectors, [1, 2, 3, 4])
+        lsh = DuplicateDetector(threshold=0.7, mode="lsh", clustering=True).find_duplicates(
+            vectors, [1, 2, 3, 4], texts=texts,
+        )
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in exact] == [(3, 1), (4, 1)]
+        assert [(d["bug_id"], d["duplicate_of_id"]) for d in lsh] == [(3, 1), (4, 1)]
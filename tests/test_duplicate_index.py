@@ -0,0 +1,92 @@
+"""Tests for the persistent cross-cycle duplicate index."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.ml.duplicate_detector import DuplicateDetector
+from src.ml.duplicate_index import DuplicateIndex
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug
+
+
+SUMMARIES = [
+    "Login fails with valid credentials",
+    "Payment processing timeout",
+    "Dashboard charts not rendering",
+]
+
+
+def _extractor(tmp_path):
+    extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+    extractor.fit([preprocess_bug(s) for s in SUMMARIES + ["Button color should be blue"]])
+    return extractor
+
+
+class TestDuplicateIndex:
+    def test_query_matches_prior_cycle(self, tmp_path):
+        extractor = _extractor(tmp_path)
+        index = DuplicateIndex(1, index_dir=tmp_path, detector=DuplicateDetector(threshold=0.9))
+        index.add(extractor.transform([preprocess_bug(s) for s in SUMMARIES]), [1, 2, 3], cycle_id=1)
+
+        queries = extractor.transform([
+            preprocess_bug("Payment processing timeout"),
+            preprocess_bug("Button color should be blue"),
+        ])
+        matches = index.query(queries, before_cycle_id=2)
+        assert matches[0]["duplicate_of_id"] == 2
+        assert matches[0]["similarity"] >= 0.9
+        assert matches[1] is None
+
+    def test_query_ignores_same_and_later_cycles(self, tmp_path):
+        extractor = _extractor(tmp_path)
+        index = DuplicateIndex(1, index_dir=tmp_path, detector=DuplicateDetector(threshold=0.9))
+        index.add(extractor.transform([preprocess_bug(SUMMARIES[0])]), [10], cycle_id=5)
+        query = extractor.transform([preprocess_bug(SUMMARIES[0])])
+        assert index.query(query, before_cycle_id=5) == [None]
+        assert index.query(query, before_cycle_id=6)[0]["duplicate_of_id"] == 10
+
+    def test_add_replaces_existing_rows(self, tmp_path):
+        extractor = _extractor(tmp_path)
+        index = DuplicateIndex(1, index_dir=tmp_path)
+        vectors = extractor.transform([preprocess_bug(s) for s in SUMMARIES])
+        index.add(vectors, [1, 2, 3], cycle_id=1)
+        index.add(vectors[:2], [1, 2], cycle_id=1)
+        assert len(index) == 3
+        assert sorted(index.bug_ids.tolist()) == [1, 2, 3]
+
+    def test_persistence(self, tmp_path):
+        extractor = _extractor(tmp_path)
+        index = DuplicateIndex(7, index_dir=tmp_path)
+        index.reset(extractor.version)
+        index.add(extractor.transform([preprocess_bug(s) for s in SUMMARIES]), [1, 2, 3], cycle_id=1)
+        index.save()
+
+        reloaded = DuplicateIndex(7, index_dir=tmp_path)
+        assert reloaded.version == extractor.version
+        assert reloaded.bug_ids.tolist() == [1, 2, 3]
+        assert np.allclose(reloaded.vectors.toarray(), index.vectors.toarray())
+
+    def test_empty_index(self, tmp_path):
+        extractor = _extractor(tmp_path)
+        index = DuplicateIndex(1, index_dir=tmp_path)
+        assert index.query(extractor.transform(["login"]), before_cycle_id=1) == [None]
+
+    def test_dense_embeddings(self, tmp_path):
+        index = DuplicateIndex(3, index_dir=tmp_path, detector=DuplicateDetector(threshold=0.9))
+        index.reset("v1", dense=True)
+        rows = np.array([[1.0, 0.0, 0.0], [0.0, 2.0, 0.0]], dtype=np.float32)
+        index.add(rows, [1, 2], cycle_id=1)
+        index.add(np.array([[0.0, 0.0, 1.0]], dtype=np.float32), [3], cycle_id=2)
+        assert index.dense and index.vectors.dtype == np.float32
+
+        queries = np.array([[0.0, 1.0, 0.1], [0.0, 0.0, 1.0]], dtype=np.float32)
+        matches = index.query(queries, before_cycle_id=2)
+        assert matches[0]["duplicate_of_id"] == 2
+        assert matches[1] is None
+        index.save()
+
+        reloaded = DuplicateIndex(3, index_dir=tmp_path, detector=DuplicateDetector(threshold=0.9))
+        assert reloaded.dense and reloaded.version == "v1"
+        assert np.array_equal(reloaded.vectors, index.vectors)
+        assert reloaded.query(queries, before_cycle_id=3)[1]["duplicate_of_id"] == 3
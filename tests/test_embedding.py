@@ -0,0 +1,57 @@
+"""Tests for the TruncatedSVD similarity embedding."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import scipy.sparse as sp
+import pytest
+
+from src.ml.embedding import SvdEmbedding
+
+
+def _matrix(n_rows=20, n_cols=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Only the first 50 columns are ever used, like a sparse hashed space
+    X = sp.random(n_rows, 50, density=0.2, random_state=seed, format="csr")
+    X.data = rng.random(X.nnz)
+    return sp.hstack([X, sp.csr_matrix((n_rows, n_cols - 50))], format="csr")
+
+
+class TestSvdEmbedding:
+    def test_transform_shape_and_dtype(self):
+        X = _matrix()
+        embedding = SvdEmbedding(8).fit(X)
+        Z = embedding.transform(X)
+        assert Z.shape == (20, 8)
+        assert embedding.dim == 8
+        assert Z.dtype == np.float32 and Z.flags.c_contiguous
+
+    def test_rows_are_unit_length(self):
+        X = _matrix()
+        Z = SvdEmbedding(8).fit(X).transform(X)
+        assert np.allclose(np.linalg.norm(Z, axis=1), 1.0, atol=1e-5)
+
+    def test_keeps_only_seen_columns(self):
+        X = _matrix()
+        embedding = SvdEmbedding(8).fit(X)
+        assert embedding.columns.max() < 50
+        assert embedding.components.shape == (len(embedding.columns), 8)
+
+    def test_dense_input_matches_sparse(self):
+        X = _matrix()
+        embedding = SvdEmbedding(8).fit(X)
+        assert np.allclose(embedding.transform(X.toarray()), embedding.transform(X), atol=1e-5)
+
+    def test_unseen_row_stays_zero(self):
+        embedding = SvdEmbedding(8).fit(_matrix())
+        unseen = sp.csr_matrix(([1.0], ([0], [999])), shape=(1, 1000))
+        assert not embedding.transform(unseen).any()
+
+    def test_dim_capped_by_data(self):
+        embedding = SvdEmbedding(64).fit(_matrix(n_rows=5))
+        assert embedding.dim == 4
+
+    def test_too_small_raises(self):
+        with pytest.raises(ValueError):
+            SvdEmbedding(8).fit(sp.csr_matrix(np.ones((1, 3))))
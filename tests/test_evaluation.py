@@ -0,0 +1,78 @@
+"""Tests for offline evaluation helpers."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+from src.ml.evaluation import (
+    best_earlier_similarity, feature_selection_report, load_labeled_csv, lsh_recall,
+    threshold_sweep, training_cap_report,
+)
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.preprocessor import preprocess_bug
+
+
+class TestEvaluation:
+    def test_load_labeled_csv(self, tmp_path):
+        csv_file = tmp_path / "labeled.csv"
+        csv_file.write_text(
+            "Issue key,Summary,Description,Issue Type,_true_label\n"
+            "P-1,Login fails,Cannot login,Bug,valid\n"
+            "P-2,Login fails,,Bug,duplicate\n"
+        )
+        records = load_labeled_csv([csv_file])
+        assert [r["label"] for r in records] == ["valid", "duplicate"]
+        assert records[0]["description"] == "Cannot login"
+
+    def test_lsh_recall(self, tmp_path):
+        texts = [preprocess_bug(s) for s in (
+            "Login fails with valid credentials",
+            "Payment processing timeout",
+            "Login fails with valid credentials",
+            "Dashboard charts not rendering",
+        )]
+        vectors = FeatureExtractor(model_path=tmp_path / "tfidf.joblib").fit_transform(texts)
+        [report] = lsh_recall(vectors, texts, [1, 2, 3, 4], [(64, 16)], threshold=0.9)
+        assert report["exact_duplicates"] == 1
+        assert report["pair_recall"] == 1.0
+        assert report["rows_per_band"] == 4
+
+    def test_best_earlier_similarity(self):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]])
+        expected = [0.0, 0.0, np.sqrt(0.5), 1.0]
+        for block_size in (1, 3, 1024):
+            assert best_earlier_similarity(vectors, block_size) == pytest.approx(expected)
+
+    def test_threshold_sweep(self):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.9], [1.0, 0.0], [0.1, 1.0]])
+        labels = ["valid", "valid", "valid", "duplicate", None]
+        rows = threshold_sweep(vectors, labels, [0.999, 0.9, 0.5])
+        assert [r["threshold"] for r in rows] == [0.5, 0.9, 0.999]
+        assert [r["duplicates"] for r in rows] == [3, 2, 1]
+        assert rows[2]["precision"] == 1.0 and rows[2]["recall"] == 1.0
+        # Bug 3 is labeled valid, bug 5 is unreviewed and left out of precision
+        assert rows[0]["precision"] == 0.5
+        assert rows[1]["precision"] == 1.0
+
+    def test_training_cap_report(self):
+        valid = ["login fails", "payment timeout", "export empty", "search broken", "upload fails"]
+        invalid = ["button color", "font too small", "spinner off centre", "nice to have", "looks different"]
+        texts = [f"{s} case {i}" for i in range(4) for s in valid + invalid]
+        labels = (["valid"] * 5 + ["invalid"] * 5) * 4
+        ages = np.arange(len(texts))[::-1].astype(float)
+        rows = training_cap_report(texts, labels, ages, [12, 0], holdout_fraction=0.25, recent_days=-1)
+        assert [r["cap"] for r in rows] == [12, "all"]
+        assert [r["training_samples"] for r in rows] == [12, 30]
+        assert all(r["test_samples"] == 10 and 0.0 <= r["f1"] <= 1.0 for r in rows)
+
+    def test_feature_selection_report(self):
+        valid = ["login fails", "payment timeout", "export empty", "search broken", "upload fails"]
+        invalid = ["button color", "font too small", "spinner off centre", "nice to have", "looks different"]
+        texts = [f"{s} case {i}" for i in range(4) for s in valid + invalid]
+        labels = (["valid"] * 5 + ["invalid"] * 5) * 4
+        rows = feature_selection_report(texts, labels, [5, 0], method="chi2", holdout_fraction=0.25)
+        assert [r["method"] for r in rows] == ["chi2", "none"]
+        assert rows[0]["features"] == 5 and rows[1]["features"] > 5
+        assert rows[0]["model_kb"] < rows[1]["model_kb"]
+        assert all(0.0 <= r["f1"] <= 1.0 and r["predict_ms_per_bug"] > 0 for r in rows)
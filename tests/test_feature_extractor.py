@@ -3,8 +3,11 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import numpy as np
+import scipy.sparse as sp
 import pytest
-from src.ml.feature_extractor import FeatureExtractor
+from configs.config import config
+from src.ml.feature_extractor import FeatureExtractor, vector_to_json
 
 
 class TestFeatureExtractor:
@@ -44,3 +47,134 @@ class TestFeatureExtractor:
         names = extractor.get_feature_names()
         assert len(names) > 0
         assert all(isinstance(n, str) for n in names)
+
+    def test_transform_pair_matches_transform(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        full_texts = [
+            "login fails valid credentials enter password",
+            "payment timeout checkout hangs",
+            "button color darker",
+            "dashboard chart rendering",
+        ]
+        summary_texts = ["login fails", "payment timeout", "button color darker", ""]
+        extractor.fit(full_texts + summary_texts)
+        X_full, X_summary = extractor.transform_pair(full_texts, summary_texts)
+        assert np.array_equal(X_full, extractor.transform(full_texts))
+        assert np.array_equal(X_summary, extractor.transform(summary_texts))
+
+    def test_sparse_output(self, tmp_path):
+        texts = ["login failure", "payment error", "color issue"]
+        dense = FeatureExtractor(model_path=tmp_path / "dense.joblib", sparse=False)
+        sparse = FeatureExtractor(model_path=tmp_path / "sparse.joblib", sparse=True)
+        X_dense = dense.fit_transform(texts)
+        X_sparse = sparse.fit_transform(texts)
+        assert sp.issparse(X_sparse)
+        assert np.array_equal(X_sparse.toarray(), X_dense)
+        X_full, X_summary = sparse.transform_pair(texts, ["login", "payment", "color"])
+        assert sp.issparse(X_full) and sp.issparse(X_summary)
+
+    def test_hashing_mode(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 12)
+        extractor = FeatureExtractor(model_path=tmp_path / "hashing.joblib", sparse=False)
+        full_texts = ["login fails valid credentials", "payment timeout checkout"]
+        summary_texts = ["login fails", "payment timeout"]
+        X = extractor.fit_transform(full_texts)
+        assert sp.issparse(X) and X.shape[1] == 2 ** 12
+        X_full, X_summary = extractor.transform_pair(full_texts, summary_texts)
+        assert np.array_equal(X_full.toarray(), extractor.transform(full_texts).toarray())
+        assert np.array_equal(X_summary.toarray(), extractor.transform(summary_texts).toarray())
+
+        version = extractor.version
+        extractor.partial_fit(["login timeout"])
+        reloaded = FeatureExtractor(model_path=tmp_path / "hashing.joblib")
+        assert reloaded.vectorizer.n_documents == 3
+        assert reloaded.version == version
+
+    def test_record_documents_reaches_every_worker(self, tmp_path, monkeypatch, db_session):
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 12)
+        path = tmp_path / "hashing.joblib"
+        FeatureExtractor(model_path=path).fit(["login fails", "payment timeout"])
+        # Two workers loaded from the same file, each logging its own upload
+        first, second = FeatureExtractor(model_path=path), FeatureExtractor(model_path=path)
+        version, idf_version = first.version, first.idf_version
+        first.record_documents(db_session, ["login timeout"])
+        second.record_documents(db_session, ["export empty", "login again"])
+        assert first.refresh_documents(db_session) == 1
+        assert first.vectorizer.n_documents == second.vectorizer.n_documents == 5
+        assert np.array_equal(first.vectorizer.idf_, second.vectorizer.idf_)
+        assert first.version == version and first.idf_version != idf_version
+        assert first.idf_version == second.idf_version
+
+        reloaded = FeatureExtractor(model_path=path)
+        reloaded.refresh_documents(db_session)
+        assert reloaded.vectorizer.n_documents == 5
+
+    def test_partial_fit_requires_hashing(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        extractor.fit(["login failure", "payment error"])
+        with pytest.raises(RuntimeError):
+            extractor.partial_fit(["color issue"])
+
+    def test_vector_to_json(self):
+        assert vector_to_json(np.array([0.0, 0.5])) == [0.0, 0.5]
+        assert vector_to_json(sp.csr_matrix([[0.0, 0.5, 0.0]])) == {
+            "size": 3, "indices": [1], "values": [0.5],
+        }
+
+    def test_embedding_round_trip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "embedding_dim", 2)
+        model_path = tmp_path / "tfidf.joblib"
+        texts = ["login failure", "payment error", "color issue", "login payment"]
+        extractor = FeatureExtractor(model_path=model_path, sparse=True)
+        X = extractor.fit_transform(texts)
+        Z = extractor.similarity_vectors(X)
+        assert Z.shape == (4, 2) and Z.dtype == np.float32
+        assert extractor.similarity_version != extractor.version
+
+        reloaded = FeatureExtractor(model_path=model_path, sparse=True)
+        assert np.allclose(reloaded.embed(reloaded.transform(texts)), Z)
+        assert reloaded.similarity_version == extractor.similarity_version
+
+    def test_without_embedding(self, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib", sparse=True)
+        X = extractor.fit_transform(["login failure", "payment error"])
+        assert extractor.embedding is None
+        assert extractor.similarity_vectors(X) is X
+        assert extractor.similarity_version == extractor.version
+        with pytest.raises(RuntimeError):
+            extractor.embed(X)
+
+    @pytest.mark.parametrize("method", ["chi2", "mutual_info"])
+    def test_select_features(self, tmp_path, method):
+        texts = [
+            "login fails error", "payment fails error", "export fails error",
+            "button color nice", "font size nice", "spinner color nice",
+        ]
+        labels = np.array(["valid"] * 3 + ["invalid"] * 3)
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib", sparse=True)
+        X = extractor.fit_transform(texts)
+        X = extractor.select_features(X, labels, k=4, method=method)
+        assert extractor.n_features == 4 and X.shape == (6, 4)
+        assert {"fails", "nice"} <= set(extractor.get_feature_names())
+        assert np.allclose(X.toarray(), extractor.transform(texts).toarray())
+
+        reloaded = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        assert reloaded.n_features == 4
+        assert reloaded.version == extractor.version
+
+    def test_select_features_noop(self, tmp_path, monkeypatch):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        X = extractor.fit_transform(["login failure", "payment error"])
+        labels = np.array(["valid", "invalid"])
+        assert extractor.select_features(X, labels, k=2, method="none") is X
+        assert extractor.select_features(X, labels, k=100, method="chi2") is X
+        with pytest.raises(ValueError):
+            extractor.select_features(X, labels, k=1, method="entropy")
+
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 10)
+        hashing = FeatureExtractor(model_path=tmp_path / "hashing.joblib")
+        X = hashing.fit_transform(["login failure", "payment error"])
+        assert hashing.select_features(X, labels, k=1, method="chi2") is X
@@ -0,0 +1,56 @@
+"""Tests for the per-bug feature store."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from configs.config import config
+from src.db import crud
+from src.db.models import BugFeatures
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.feature_store import FeatureStore
+from src.ml.preprocessor import preprocess_bug
+
+
+def _texts(bugs):
+    return [preprocess_bug(b.summary, b.description) for b in bugs]
+
+
+class TestFeatureStore:
+    def test_transform_matches_extractor(self, db_session, sample_bugs, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        extractor.fit(_texts(sample_bugs))
+        store = FeatureStore(extractor)
+        expected = extractor.transform(_texts(sample_bugs))
+        assert np.allclose(store.transform(db_session, sample_bugs), expected)
+        assert db_session.query(BugFeatures).count() == len(sample_bugs)
+        # Second read comes from the stored rows
+        assert np.allclose(store.transform(db_session, sample_bugs[::-1]), expected[::-1])
+        assert db_session.query(BugFeatures).count() == len(sample_bugs)
+
+    def test_rebuild_after_refit(self, db_session, sample_bugs, tmp_path):
+        extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+        extractor.fit(_texts(sample_bugs[:3]))
+        store = FeatureStore(extractor, batch_size=2)
+        store.transform(db_session, sample_bugs)
+        old_version = extractor.version
+
+        extractor.fit(_texts(sample_bugs))
+        assert extractor.version != old_version
+        result = store.rebuild(db_session)
+        assert result == {"version": extractor.version, "rebuilt": len(sample_bugs), "removed": len(sample_bugs)}
+        assert crud.get_bug_features(db_session, [b.id for b in sample_bugs], old_version) == {}
+        assert np.allclose(store.transform(db_session, sample_bugs), extractor.transform(_texts(sample_bugs)))
+
+    def test_fit_transform_hashing_reuses_counts(self, db_session, sample_bugs, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 12)
+        extractor = FeatureExtractor(model_path=tmp_path / "hashing.joblib")
+        extractor.fit(_texts(sample_bugs[:2]))
+        store = FeatureStore(extractor)
+        store.counts(db_session, sample_bugs)
+
+        X = store.fit_transform(db_session, sample_bugs)
+        assert extractor.vectorizer.n_documents == len(sample_bugs)
+        reference = FeatureExtractor(model_path=tmp_path / "reference.joblib")
+        assert np.allclose(X.toarray(), reference.fit_transform(_texts(sample_bugs)).toarray())
@@ -0,0 +1,68 @@
+"""Tests for hashed TF-IDF features with running IDF."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pickle
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from src.ml.hashing import HashingTfidf
+
+
+TEXTS = [
+    "login fails with valid credentials",
+    "payment processing timeout error",
+    "login page timeout on firefox",
+]
+
+
+class TestHashingTfidf:
+    def test_bucket_matches_hasher(self):
+        vectorizer = HashingTfidf(n_features=2 ** 12)
+        X = vectorizer.hasher.transform(["login"])
+        assert X.indices.tolist() == [vectorizer.bucket("login")]
+
+    def test_matches_tfidf_without_collisions(self):
+        vectorizer = HashingTfidf(n_features=2 ** 20).fit(TEXTS)
+        reference = TfidfVectorizer(
+            ngram_range=(1, 2), sublinear_tf=True, strip_accents="unicode",
+        ).fit(TEXTS)
+        X, R = vectorizer.transform(TEXTS), reference.transform(TEXTS)
+        assert np.allclose((X @ X.T).toarray(), (R @ R.T).toarray())
+
+    def test_partial_fit_accumulates_document_frequencies(self):
+        vectorizer = HashingTfidf(n_features=2 ** 12).fit(TEXTS[:2])
+        before = vectorizer.idf_[vectorizer.bucket("login")]
+        vectorizer.partial_fit(TEXTS[2:])
+        assert vectorizer.n_documents == 3
+        assert vectorizer.idf_[vectorizer.bucket("login")] < before
+        vectorizer.fit(TEXTS[:1])
+        assert vectorizer.n_documents == 1
+
+    def test_increments_match_partial_fit(self):
+        vectorizer = HashingTfidf(n_features=2 ** 12).fit(TEXTS[:2])
+        generation = vectorizer.generation
+        n_docs, increments, terms = vectorizer.increments(TEXTS[2:])
+        assert vectorizer.n_documents == 2
+        assert vectorizer.bucket("firefox") in terms and vectorizer.bucket("login") not in terms
+        expected = HashingTfidf(n_features=2 ** 12).fit(TEXTS)
+        vectorizer.add(n_docs, increments, terms, applied_through=4)
+        assert np.array_equal(vectorizer.idf_, expected.idf_)
+        assert vectorizer.applied_through == 4
+        # A new fit starts a new generation the old updates no longer apply to
+        vectorizer.fit(TEXTS)
+        assert vectorizer.generation != generation and vectorizer.applied_through == 0
+
+    def test_feature_names(self):
+        vectorizer = HashingTfidf(n_features=2 ** 12).fit(TEXTS)
+        names = vectorizer.get_feature_names_out()
+        assert len(names) == 2 ** 12
+        assert names[vectorizer.bucket("timeout")] == "timeout"
+
+    def test_pickle_round_trip(self):
+        vectorizer = HashingTfidf(n_features=2 ** 12).fit(TEXTS)
+        restored = pickle.loads(pickle.dumps(vectorizer))
+        assert restored.n_documents == 3
+        assert np.array_equal(restored.idf_, vectorizer.idf_)
+        restored.partial_fit(["another report"])
@@ -0,0 +1,85 @@
+"""Tests for background training jobs."""
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.jobs import ReadWriteLock, TrainingJobs
+
+
+def _wait(jobs, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+class TestReadWriteLock:
+    def test_readers_share(self):
+        lock = ReadWriteLock()
+        with lock.read():
+            with lock.read():
+                pass
+
+    def test_writer_waits_for_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def write():
+            with lock.write():
+                events.append("write")
+
+        with lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            events.append("read done")
+        writer.join(1)
+        assert events == ["read done", "write"]
+
+
+class TestTrainingJobs:
+    def test_job_reports_progress_and_result(self):
+        jobs = TrainingJobs()
+        release = threading.Event()
+
+        def work(progress):
+            progress("fitting")
+            release.wait(1)
+            return {"status": "retrained"}
+
+        job = jobs.submit("retrain", work)
+        assert job["status"] == "queued"
+        time.sleep(0.05)
+        assert jobs.get(job["id"])["stage"] == "fitting"
+        # A second request while one is in flight reuses it
+        assert jobs.submit("retrain", work)["id"] == job["id"]
+        release.set()
+
+        done = _wait(jobs, job["id"])
+        assert done["status"] == "succeeded"
+        assert done["result"] == {"status": "retrained"}
+        assert done["finished_at"] is not None
+
+    def test_failed_job(self):
+        jobs = TrainingJobs()
+
+        def work(progress):
+            raise ValueError("boom")
+
+        job = _wait(jobs, jobs.submit("retrain", work)["id"])
+        assert job["status"] == "failed"
+        assert job["error"] == "boom"
+
+    def test_unknown_job(self):
+        assert TrainingJobs().get("missing") is None
+
+    def test_forgets_oldest_finished_jobs(self):
+        jobs = TrainingJobs(max_finished=2)
+        ids = [jobs.submit(f"job-{i}", lambda progress: {})["id"] for i in range(4)]
+        assert _wait(jobs, ids[-1])["status"] == "succeeded"
+        assert [jobs.get(job_id) is not None for job_id in ids] == [False, False, True, True]
@@ -0,0 +1,42 @@
+"""Tests for MinHash signatures and LSH candidate search."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+from src.ml.minhash import MinHashLSH, shingles
+
+
+class TestMinHash:
+    def test_shingles(self):
+        assert shingles("login fails firefox") == {
+            "login", "fails", "firefox", "login fails", "fails firefox",
+        }
+        assert shingles("") == set()
+
+    def test_identical_texts_share_signature(self):
+        lsh = MinHashLSH(num_perm=64, bands=16)
+        sigs = lsh.signatures(["login fails firefox", "login fails firefox", "payment timeout"])
+        assert np.array_equal(sigs[0], sigs[1])
+        assert not np.array_equal(sigs[0], sigs[2])
+
+    def test_candidates_are_earlier_rows(self):
+        lsh = MinHashLSH(num_perm=64, bands=32)
+        texts = [
+            "login fails valid credentials firefox",
+            "payment processing timeout",
+            "login fails valid credentials chrome",
+            "",
+            "",
+        ]
+        candidates = lsh.candidates(lsh.signatures(texts))
+        assert candidates[0] == []
+        assert 0 in candidates[2]
+        assert 1 not in candidates[2]
+        # Empty texts never collide with each other
+        assert candidates[4] == []
+
+    def test_bands_must_divide_permutations(self):
+        with pytest.raises(ValueError):
+            MinHashLSH(num_perm=100, bands=32)
@@ -0,0 +1,51 @@
+"""Tests for the per-project model cache."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ml.model_cache import ModelCache
+
+
+class TestModelCache:
+    def _cache(self, max_size=2, known=(1, 2, 3)):
+        loads = []
+
+        def loader(project_id):
+            loads.append(project_id)
+            return f"models-{project_id}" if project_id in known else None
+
+        return ModelCache(loader, max_size=max_size), loads
+
+    def test_hit_after_first_load(self):
+        cache, loads = self._cache()
+        assert cache.get(1) == "models-1"
+        assert cache.get(1) == "models-1"
+        assert loads == [1]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache, loads = self._cache()
+        cache.get(1)
+        cache.get(2)
+        cache.get(1)
+        cache.get(3)
+        assert cache.stats()["resident"] == [1, 3]
+        assert cache.stats()["evictions"] == 1
+        cache.get(2)
+        assert loads == [1, 2, 3, 2]
+
+    def test_projects_without_a_model_are_not_cached(self):
+        cache, loads = self._cache()
+        assert cache.get(9) is None
+        assert cache.get(9) is None
+        assert loads == [9, 9]
+        assert cache.stats()["misses"] == 0
+
+    def test_put_and_invalidate(self):
+        cache, loads = self._cache()
+        cache.put(1, "fresh")
+        assert cache.get(1) == "fresh"
+        cache.invalidate(1)
+        assert cache.get(1) == "models-1"
+        assert loads == [1]
@@ -0,0 +1,555 @@
+"""Tests for the classification pipeline orchestrator."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from io import BytesIO
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from configs.config import config
+from src.db import crud
+from src.db.database import Base
+from src.ml.duplicate_index import DuplicateIndex
+from src.ml.active_learner import ActiveLearner
+from src.ml.classifier import BugClassifier
+from src.pipeline import PROJECT_MODEL_STAMP, Pipeline
+
+
+TRAINING_DATA = [
+    {"summary": "Login fails with valid credentials on Firefox", "label": "valid"},
+    {"summary": "Payment processing timeout after 30 seconds", "label": "valid"},
+    {"summary": "Dashboard charts not rendering for large datasets", "label": "valid"},
+    {"summary": "Report export produces empty CSV file", "label": "valid"},
+    {"summary": "Search returns no results for exact match", "label": "valid"},
+    {"summary": "File upload fails silently for large files", "label": "valid"},
+    {"summary": "The button color should be darker blue", "label": "invalid"},
+    {"summary": "I think the font size is too small", "label": "invalid"},
+    {"summary": "Application is slow on my old laptop", "label": "invalid"},
+    {"summary": "Would be nice to have keyboard shortcuts", "label": "invalid"},
+    {"summary": "The loading spinner is not centered", "label": "invalid"},
+    {"summary": "UI looks different than old mockup", "label": "invalid"},
+]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+    return Pipeline()
+
+
+@pytest.fixture
+def trained_pipeline(pipeline, db_session):
+    pipeline.train_initial_model(db_session, TRAINING_DATA)
+    return pipeline
+
+
+class TestPipeline:
+    def test_classify_cycle(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        result = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["classified"] + result["duplicates_found"] == len(sample_bugs)
+        assert result["rows_written"] == len(sample_bugs)
+        assert result["rows_per_second"] > 0
+
+        for bug in crud.get_bugs_for_cycle(db_session, sample_cycle.id):
+            assert bug.ml_classification is not None
+            assert bug.final_classification is not None
+            if bug.duplicate_of_id is None:
+                assert bug.tfidf_vector_json is not None
+
+    def test_classify_marks_duplicates(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        trained_pipeline.duplicate_detector.threshold = 0.30
+        result = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["duplicates_found"] >= 1
+        dup = crud.get_bug(db_session, sample_bugs[3].id)
+        assert dup.duplicate_of_id == sample_bugs[0].id
+        assert dup.final_classification == "duplicate"
+        assert dup.ml_explanation.startswith("Marked as DUPLICATE")
+        assert dup.duplicate_group_id == sample_bugs[0].id
+        assert crud.get_bug(db_session, sample_bugs[0].id).duplicate_group_id == sample_bugs[0].id
+
+    def test_classify_matches_earlier_cycles(self, trained_pipeline, db_session, sample_project, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "cross_cycle_duplicates", True)
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        next_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        [rerun] = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": next_cycle.id, "summary": "Payment timeout after 30 seconds"},
+        ])
+        result = trained_pipeline.classify_cycle(db_session, next_cycle.id)
+        assert result["duplicates_found"] == 1
+        assert crud.get_bug(db_session, rerun.id).duplicate_of_id == sample_bugs[2].id
+        family = crud.get_duplicate_group(db_session, sample_bugs[2].id)
+        assert [b.id for b in family] == [sample_bugs[2].id, rerun.id]
+
+    def test_duplicate_index_rebuilt_after_database_reset(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "cross_cycle_duplicates", True)
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+
+        # A fresh database hands out the same project and bug ids again
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        project = crud.create_project(db, "Test Project")
+        cycle = crud.create_cycle(db, project.id, "Cycle 1")
+        crud.bulk_create_bugs(db, [
+            {"cycle_id": cycle.id, "summary": f"Unrelated report number {i}"} for i in range(len(sample_bugs))
+        ])
+        trained_pipeline.classify_cycle(db, cycle.id)
+        next_cycle = crud.create_cycle(db, project.id, "Cycle 2")
+        [rerun] = crud.bulk_create_bugs(db, [{"cycle_id": next_cycle.id, "summary": sample_bugs[2].summary}])
+        trained_pipeline.classify_cycle(db, next_cycle.id)
+        assert crud.get_bug(db, rerun.id).duplicate_of_id is None
+        db.close()
+
+    def test_duplicate_index_drops_deleted_bugs(self, trained_pipeline, db_session, sample_project, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "cross_cycle_duplicates", True)
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        db_session.delete(crud.get_bug(db_session, sample_bugs[2].id))
+        db_session.commit()
+
+        next_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        [rerun] = crud.bulk_create_bugs(db_session, [{"cycle_id": next_cycle.id, "summary": sample_bugs[2].summary}])
+        trained_pipeline.classify_cycle(db_session, next_cycle.id)
+        assert crud.get_bug(db_session, rerun.id).duplicate_of_id is None
+        assert sample_bugs[2].id not in DuplicateIndex(sample_project.id).bug_ids
+
+    def test_duplicate_index_keeps_concurrent_cycles(self, trained_pipeline, db_session, sample_project, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "cross_cycle_duplicates", True)
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        fe = trained_pipeline.feature_extractor
+        # A cycle that queried the index before another cycle saved to it
+        slow_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        [slow] = crud.bulk_create_bugs(db_session, [{"cycle_id": slow_cycle.id, "summary": "Export hangs on large reports"}])
+        fast_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 3")
+        [fast] = crud.bulk_create_bugs(db_session, [{"cycle_id": fast_cycle.id, "summary": "Search box ignores accents"}])
+        trained_pipeline.classify_cycle(db_session, fast_cycle.id)
+
+        vectors = fe.similarity_vectors(fe.transform(["export hangs on large reports"]))
+        trained_pipeline._add_to_index(db_session, sample_project, fe, vectors, [slow.id], slow_cycle.id)
+        assert {slow.id, fast.id} <= set(DuplicateIndex(sample_project.id).bug_ids.tolist())
+
+    def test_classify_matches_stack_traces_across_cycles(self, trained_pipeline, db_session, sample_project, sample_cycle):
+        trace = "at com.acme.pay.Checkout.submit(Checkout.java:{})\nat com.acme.web.Handler.handle(Handler.java:9)"
+        [crash] = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": sample_cycle.id, "summary": "Checkout crashes", "description": trace.format(42)},
+        ])
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert crud.get_bug(db_session, crash.id).stack_fingerprint is not None
+
+        next_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        [again] = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": next_cycle.id, "summary": "Order page throws an exception", "description": trace.format(57)},
+        ])
+        trained_pipeline.classify_cycle(db_session, next_cycle.id)
+        again = crud.get_bug(db_session, again.id)
+        assert again.duplicate_of_id == crash.id
+        assert "same stack trace" in again.ml_explanation
+
+    def test_clustering_family_spans_cycles(self, trained_pipeline, db_session, sample_project, sample_cycle):
+        trained_pipeline.duplicate_detector.clustering = True
+        trace = "at com.acme.pay.Checkout.submit(Checkout.java:{})\nat com.acme.web.Handler.handle(Handler.java:9)"
+        [crash] = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": sample_cycle.id, "summary": "Checkout crashes", "description": trace.format(42)},
+        ])
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+
+        next_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        again, reworded = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": next_cycle.id, "summary": "Order page throws an exception", "description": trace.format(57)},
+            {"cycle_id": next_cycle.id, "summary": "Order page throws an exception"},
+        ])
+        result = trained_pipeline.classify_cycle(db_session, next_cycle.id)
+        assert result["duplicates_found"] == 2
+        # The second bug only resembles the first, which matched the earlier crash
+        reworded = crud.get_bug(db_session, reworded.id)
+        assert reworded.duplicate_of_id == crash.id
+        assert "same stack trace" not in reworded.ml_explanation
+        family = crud.get_duplicate_group(db_session, crash.id)
+        assert [b.id for b in family] == [crash.id, again.id, reworded.id]
+
+    def test_crash_mate_of_similar_duplicate(self, trained_pipeline, db_session, sample_project):
+        trained_pipeline.duplicate_detector.threshold = 0.6
+        trace = "at com.acme.pay.Checkout.submit(Checkout.java:42)\nat com.acme.web.Handler.handle(Handler.java:9)"
+        cycle = crud.create_cycle(db_session, sample_project.id, "Crash cycle")
+        original, similar, mate = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": cycle.id, "summary": "Payment processing timeout on checkout page"},
+            {"cycle_id": cycle.id, "summary": "Payment processing timeout on checkout", "description": trace},
+            {"cycle_id": cycle.id, "summary": "Order history page is empty", "description": trace},
+        ])
+        trained_pipeline.classify_cycle(db_session, cycle.id)
+        assert crud.get_bug(db_session, similar.id).duplicate_of_id == original.id
+        mate = crud.get_bug(db_session, mate.id)
+        # Reported against the similar bug's original, which has no stack trace
+        assert mate.duplicate_of_id == original.id
+        assert "same stack trace" not in mate.ml_explanation
+        assert mate.duplicate_similarity < 1.0
+
+    def test_classify_keeps_human_label(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        crud.override_bug_classification(db_session, sample_bugs[2].id, "wont_fix", "reviewer")
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        bug = crud.get_bug(db_session, sample_bugs[2].id)
+        assert bug.final_classification == "wont_fix"
+        assert bug.classification_source == "human"
+        assert bug.ml_classification in ("valid", "invalid")
+
+    def test_classify_sparse_features(self, tmp_path, monkeypatch, db_session, sample_cycle, sample_bugs):
+        monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+        monkeypatch.setattr(config.ml, "sparse_features", True)
+        pipeline = Pipeline()
+        pipeline.train_initial_model(db_session, TRAINING_DATA)
+        result = pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["classified"] + result["duplicates_found"] == len(sample_bugs)
+        bug = crud.get_bug(db_session, sample_bugs[0].id)
+        assert set(bug.tfidf_vector_json) == {"size", "indices", "values"}
+        assert bug.ml_explanation.startswith("Classified as")
+
+    def test_classify_stores_embeddings(self, tmp_path, monkeypatch, db_session, sample_project, sample_cycle, sample_bugs):
+        monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+        monkeypatch.setattr(config.ml, "sparse_features", True)
+        monkeypatch.setattr(config.ml, "embedding_dim", 8)
+        monkeypatch.setattr(config.ml, "cross_cycle_duplicates", True)
+        pipeline = Pipeline()
+        pipeline.train_initial_model(db_session, TRAINING_DATA)
+        result = pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["classified"] + result["duplicates_found"] == len(sample_bugs)
+        bug = crud.get_bug(db_session, sample_bugs[0].id)
+        assert len(bug.embedding) == 8 * 4
+        assert bug.tfidf_vector_json is None
+
+        next_cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 2")
+        [rerun] = crud.bulk_create_bugs(db_session, [
+            {"cycle_id": next_cycle.id, "summary": sample_bugs[2].summary},
+        ])
+        pipeline.classify_cycle(db_session, next_cycle.id)
+        assert crud.get_bug(db_session, rerun.id).duplicate_of_id == sample_bugs[2].id
+
+    def test_train_with_feature_selection(self, pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "feature_selection", "mutual_info")
+        monkeypatch.setattr(config.ml, "selected_features", 10)
+        pipeline.train_initial_model(db_session, TRAINING_DATA)
+        assert pipeline.feature_extractor.n_features == 10
+        result = pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["classified"] + result["duplicates_found"] == len(sample_bugs)
+
+    def test_upload_updates_hashing_idf(self, tmp_path, monkeypatch, db_session, sample_project):
+        monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 12)
+        pipeline = Pipeline()
+        pipeline.train_initial_model(db_session, TRAINING_DATA)
+        version = pipeline.feature_extractor.version
+        csv = BytesIO(
+            b"Issue key,Summary,Description,Status\n"
+            b"T-1,Login fails on Safari,Cannot sign in,Open\nT-2,Export is empty,No rows,Open\n"
+        )
+        result = pipeline.process_upload(db_session, csv, "bugs.csv", sample_project.id, "Cycle 2", "jira")
+        assert result["classified"] + result["duplicates_found"] == 2
+        assert pipeline.feature_extractor.vectorizer.n_documents == len(TRAINING_DATA) + 2
+        assert pipeline.feature_extractor.version == version
+
+    def test_classify_empty_cycle(self, trained_pipeline, db_session, sample_cycle):
+        assert trained_pipeline.classify_cycle(db_session, sample_cycle.id) == {"classified": 0}
+
+    def test_classify_clusters_duplicates(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        trained_pipeline.duplicate_detector.threshold = 0.30
+        trained_pipeline.duplicate_detector.clustering = True
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        family = crud.get_duplicate_group(db_session, sample_bugs[0].id)
+        assert family[0].id == sample_bugs[0].id
+        assert sample_bugs[3].id in [b.id for b in family]
+        assert all(b.duplicate_of_id == sample_bugs[0].id for b in family[1:])
+
+    def test_incremental_retrain_if_needed(self, trained_pipeline, db_session, sample_bugs, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        assert trained_pipeline.retrain_if_needed(db_session) == {"status": "not_needed"}
+        crud.override_bug_classification(db_session, sample_bugs[1].id, "valid", "reviewer")
+        # Trained before incremental mode: overrides wait for a full fit
+        assert trained_pipeline.retrain_if_needed(db_session) == {"status": "needs_full_fit"}
+
+        trained_pipeline.train_initial_model(db_session, TRAINING_DATA)
+        assert trained_pipeline.classifier.online is not None
+        monkeypatch.setattr(config.ml, "incremental_batch_size", 3)
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "invalid", "reviewer")
+        # Two pending overrides are not a batch yet
+        assert trained_pipeline.retrain_if_needed(db_session) == {"status": "pending", "pending": 2}
+        crud.override_bug_classification(db_session, sample_bugs[2].id, "valid", "reviewer")
+        old_classifier = trained_pipeline.classifier
+        result = trained_pipeline.retrain_if_needed(db_session)
+        assert result["status"] == "updated" and result["samples"] == 3
+        # The fold was staged and swapped in, not applied to the serving classifier in place
+        assert trained_pipeline.classifier is not old_classifier
+        assert old_classifier.folded_through == 0
+        saved = BugClassifier(model_path=trained_pipeline.classifier.model_path)
+        assert saved.folded_through == crud.get_latest_override_id(db_session)
+        assert not list(tmp_path.glob("*.folding.*"))
+
+    def test_fold_overtaken_by_swap_is_dropped(self, trained_pipeline, db_session, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "incremental_learning", True)
+        monkeypatch.setattr(config.ml, "incremental_batch_size", 1)
+        trained_pipeline.train_initial_model(db_session, TRAINING_DATA)
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "invalid", "reviewer")
+        update = ActiveLearner.update
+
+        def update_then_swap(learner, db, **kwargs):
+            result = update(learner, db, **kwargs)
+            # A retrain publishes its pair while the fold is running
+            trained_pipeline._use_models(
+                trained_pipeline.feature_extractor,
+                BugClassifier(model_path=trained_pipeline.classifier.model_path),
+            )
+            return result
+
+        monkeypatch.setattr(ActiveLearner, "update", update_then_swap)
+        published = trained_pipeline.classifier.model_path.read_bytes()
+        assert trained_pipeline.update_incrementally(db_session) == {"status": "superseded"}
+        # The newer pair is kept; its overrides are folded next time
+        assert trained_pipeline.classifier.model_path.read_bytes() == published
+        assert trained_pipeline.classifier.folded_through == 0
+        assert not list(trained_pipeline.classifier.model_path.parent.glob("*.folding.*"))
+
+    def test_retrain_swaps_staged_models(self, trained_pipeline, db_session, sample_bugs):
+        old_classifier = trained_pipeline.classifier
+        labels = ["valid", "invalid"]
+        for i, bug in enumerate(sample_bugs * 2):
+            crud.override_bug_classification(db_session, bug.id, labels[i % 2], "reviewer")
+        for i in range(6):
+            [extra] = crud.bulk_create_bugs(db_session, [{"cycle_id": sample_bugs[0].cycle_id, "summary": TRAINING_DATA[i]["summary"]}])
+            crud.override_bug_classification(db_session, extra.id, TRAINING_DATA[i]["label"], "reviewer")
+
+        stages = []
+        result = trained_pipeline.retrain(db_session, progress=stages.append)
+        assert result["status"] == "retrained"
+        assert stages == ["fitting", "swapping", "recording"]
+        assert trained_pipeline.classifier is not old_classifier
+        assert trained_pipeline.active_learner.classifier is trained_pipeline.classifier
+        assert trained_pipeline.classifier.model_path == old_classifier.model_path
+        assert crud.get_active_model(db_session).model_path == str(old_classifier.model_path)
+        assert not list(config.ml.model_dir.glob("*.staging.*"))
+
+    def test_promote_and_rollback(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        first = crud.get_active_model(db_session)
+        assert first.version == "v1" and first.artifact_digest
+        expected = [r["classification"] for r in trained_pipeline.classifier.predict(
+            trained_pipeline.feature_extractor.transform(["login fails", "font too small"]))]
+
+        trained_pipeline.train_initial_model(db_session, TRAINING_DATA[6:] + TRAINING_DATA[:6] + [
+            {"summary": "Spinner position is off by a pixel", "label": "invalid"},
+            {"summary": "Checkout crashes on submit", "label": "valid"},
+        ])
+        assert crud.get_active_model(db_session).version == "v2"
+
+        result = trained_pipeline.rollback(db_session)
+        assert result["status"] == "promoted" and result["version"] == "v1"
+        assert crud.get_active_model(db_session).id == first.id
+        assert trained_pipeline.active_learner.classifier is trained_pipeline.classifier
+        assert [r["classification"] for r in trained_pipeline.classifier.predict(
+            trained_pipeline.feature_extractor.transform(["login fails", "font too small"]))] == expected
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+
+        assert trained_pipeline.promote(db_session, "v2")["version"] == "v2"
+        with pytest.raises(LookupError):
+            trained_pipeline.promote(db_session, "v9")
+
+    def test_classify_stamps_model_version(self, trained_pipeline, db_session, sample_cycle, sample_bugs):
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        for bug in crud.get_bugs_for_cycle(db_session, sample_cycle.id):
+            if bug.duplicate_of_id is None:
+                assert bug.ml_model_version == "v1"
+
+    def test_lazy_rescoring(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        retrain_data = TRAINING_DATA + [{"summary": "Checkout crashes on submit", "label": "valid"}]
+        trained_pipeline.train_initial_model(db_session, retrain_data)
+        # Nothing is re-scored unless lazy rescoring is on
+        bug = crud.get_bug(db_session, sample_bugs[0].id)
+        assert bug.ml_model_version == "v1"
+        assert trained_pipeline.rescore_if_stale(db_session, bug) is False
+
+        monkeypatch.setattr(config.ml, "lazy_rescoring", True)
+        assert trained_pipeline.rescore_if_stale(db_session, bug) is True
+        assert bug.ml_model_version == "v2"
+        assert trained_pipeline.rescore_if_stale(db_session, bug) is False
+
+        monkeypatch.setattr(config.ml, "rescore_batch_size", 2)
+        result = trained_pipeline.train_initial_model(db_session, retrain_data[1:])
+        assert result["rescore_scheduled"]
+        sweep = trained_pipeline.sweep.result()
+        originals = [b for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id) if b.duplicate_of_id is None]
+        assert sweep["version"] == "v3" and sweep["rescored"] == len(originals)
+        assert sweep["batches"] == -(-len(originals) // 2)
+        db_session.expire_all()
+        assert all(b.ml_model_version == "v3" for b in originals)
+        assert trained_pipeline.rescore_stale(db_session)["rescored"] == 0
+
+    def test_rescored_override_stays_in_capped_sample(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        bug = crud.get_bug(db_session, sample_bugs[1].id)
+        human = "invalid" if bug.ml_classification == "valid" else "valid"
+        crud.override_bug_classification(db_session, bug.id, human, "reviewer")
+        crud.override_bug_classification(db_session, sample_bugs[2].id, sample_bugs[2].final_classification, "reviewer")
+
+        # A model that has learned the override re-scores the bug with the human label
+        models = trained_pipeline.models
+        predict = models.predict
+        monkeypatch.setattr(models, "predict", lambda X: (
+            [{**p, "classification": human} for p in predict(X)[0]], None,
+        ))
+        trained_pipeline._rescore_bugs(db_session, [bug])
+        db_session.expire_all()
+        assert crud.get_bug(db_session, bug.id).ml_classification == human
+
+        learner = trained_pipeline.active_learner
+        monkeypatch.setattr(learner.training_set, "cap", 1)
+        bugs, stats = learner._training_bugs(db_session)
+        assert stats["recent"] == 1
+        assert bug.id in [b.id for b in bugs]
+
+    def test_model_fingerprint(self, trained_pipeline, db_session):
+        fingerprint = trained_pipeline.models.fingerprint
+        assert Pipeline().models.fingerprint == fingerprint
+        trained_pipeline.models.reset()
+        assert trained_pipeline.models.fingerprint == fingerprint
+        retrain_data = TRAINING_DATA + [{"summary": "Checkout crashes on submit", "label": "valid"}]
+        trained_pipeline.train_initial_model(db_session, retrain_data)
+        assert trained_pipeline.models.fingerprint != fingerprint
+
+    def test_prediction_cache(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "prediction_cache", True)
+        first = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert first["prediction_cache"] == {"hits": 0, "misses": first["classified"]}
+        before = {b.id: (b.ml_classification, b.ml_explanation) for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id)}
+
+        # Unchanged texts are answered from the cache
+        second = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert second["prediction_cache"] == {"hits": first["classified"], "misses": 0}
+        db_session.expire_all()
+        after = {b.id: (b.ml_classification, b.ml_explanation) for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id)}
+        assert after == before
+
+        # A new model misses the old entries
+        retrain_data = TRAINING_DATA + [{"summary": "Checkout crashes on submit", "label": "valid"}]
+        trained_pipeline.train_initial_model(db_session, retrain_data)
+        third = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert third["prediction_cache"]["hits"] == 0
+        assert trained_pipeline.prediction_cache.stats(db_session)["hits"] == first["classified"]
+
+    def test_prediction_cache_skipped_in_hashing_mode(self, tmp_path, monkeypatch, db_session, sample_project):
+        monkeypatch.setattr(config.ml, "model_dir", tmp_path)
+        monkeypatch.setattr(config.ml, "feature_mode", "hashing")
+        monkeypatch.setattr(config.ml, "hashing_n_features", 2 ** 12)
+        monkeypatch.setattr(config.ml, "prediction_cache", True)
+        pipeline = Pipeline()
+        pipeline.train_initial_model(db_session, TRAINING_DATA)
+        cycle = crud.create_cycle(db_session, sample_project.id, "Cycle 1", "generic", "bugs.csv")
+        crud.bulk_create_bugs(db_session, [{"cycle_id": cycle.id, "summary": "Checkout crashes on submit"}])
+        assert "prediction_cache" not in pipeline.classify_cycle(db_session, cycle.id)
+        assert crud.count_cached_predictions(db_session) == 0
+
+        # The key still follows the IDF, which every upload moves
+        fingerprint = pipeline.models.fingerprint
+        version = pipeline.feature_extractor.version
+        pipeline.feature_extractor.partial_fit(["checkout crashes again", "submit button broken"])
+        assert pipeline.feature_extractor.version == version
+        assert pipeline.models.fingerprint != fingerprint
+
+    def test_rollback_without_history(self, trained_pipeline, db_session):
+        with pytest.raises(LookupError):
+            trained_pipeline.rollback(db_session)
+
+    def test_project_model(self, trained_pipeline, db_session, sample_project, sample_cycle, monkeypatch):
+        monkeypatch.setattr(config.ml, "per_project_models", True)
+        other = crud.create_project(db_session, "Other Project")
+        other_cycle = crud.create_cycle(db_session, other.id, "Cycle 1", "generic", "other.csv")
+        for item in TRAINING_DATA:
+            [bug] = crud.bulk_create_bugs(db_session, [{"cycle_id": sample_cycle.id, "summary": item["summary"]}])
+            crud.override_bug_classification(db_session, bug.id, item["label"], "reviewer")
+        assert trained_pipeline.models_for(sample_project.id) is trained_pipeline.models
+
+        stages = []
+        result = trained_pipeline.train_project_model(db_session, sample_project.id, progress=stages.append)
+        assert result["status"] == "trained"
+        assert result["metrics"]["training_samples"] == len(TRAINING_DATA)
+        assert stages == ["fitting", "swapping"]
+        models = trained_pipeline.models_for(sample_project.id)
+        assert models is not trained_pipeline.models
+        assert trained_pipeline.models_for(other.id) is trained_pipeline.models
+        assert trained_pipeline.train_project_model(db_session, other.id)["status"] == "skipped"
+        assert trained_pipeline.classify_cycle(db_session, sample_cycle.id)["classified"] > 0
+        assert trained_pipeline.classify_cycle(db_session, other_cycle.id) == {"classified": 0}
+        stamps = {b.ml_model_version for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id)}
+        assert stamps <= {PROJECT_MODEL_STAMP, None}
+
+        # A fresh pipeline finds the saved pair on disk
+        fresh = Pipeline()
+        assert fresh.models_for(sample_project.id).classifier.is_trained
+        assert fresh.project_models.stats()["misses"] == 1
+
+        assert trained_pipeline.delete_project_model(sample_project.id)
+        assert trained_pipeline.models_for(sample_project.id) is trained_pipeline.models
+        assert not trained_pipeline.delete_project_model(sample_project.id)
+
+    def test_shadow_mode_scores_candidate(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "shadow_mode", True)
+        active_classifier = trained_pipeline.classifier
+        for i, item in enumerate(TRAINING_DATA):
+            [bug] = crud.bulk_create_bugs(db_session, [{"cycle_id": sample_cycle.id, "summary": item["summary"]}])
+            crud.override_bug_classification(db_session, bug.id, item["label"], "reviewer")
+
+        stages = []
+        result = trained_pipeline.retrain(db_session, progress=stages.append)
+        assert result["status"] == "retrained" and result["activated"] is False
+        assert stages == ["fitting", "staging", "recording"]
+        assert trained_pipeline.classifier is active_classifier
+        assert crud.get_active_model(db_session).version == "v1"
+        assert crud.get_candidate_model(db_session).version == result["version"]
+        assert not list(config.ml.model_dir.glob("*.staging.*"))
+
+        classified = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert classified["shadow_version"] == result["version"]
+        trained_pipeline.shadow.drain()
+        [score] = crud.get_shadow_scores(db_session, result["version"])
+        assert score.active_version == "v1"
+        assert score.rows == classified["classified"]
+        assert 0.0 <= score.agreement_rate <= 1.0
+        # Refit on the same texts, so the candidate's feature space matches the active one
+        assert score.reused_features is True
+
+        trained_pipeline.promote(db_session, result["version"])
+        assert crud.get_candidate_model(db_session) is None
+        assert "shadow_version" not in trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+
+    def test_retrain_rebuilds_feature_store(self, trained_pipeline, db_session, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "feature_store", True)
+        labels = ["valid", "invalid"]
+        for i in range(12):
+            [extra] = crud.bulk_create_bugs(db_session, [{"cycle_id": sample_bugs[0].cycle_id, "summary": TRAINING_DATA[i]["summary"]}])
+            crud.override_bug_classification(db_session, extra.id, labels[i // 6], "reviewer")
+        trained_pipeline.retrain(db_session)
+        crud.override_bug_classification(db_session, sample_bugs[0].id, "invalid", "reviewer")
+
+        stages = []
+        result = trained_pipeline.retrain(db_session, progress=stages.append)
+        assert stages[-1] == "features"
+        assert result["features"] == {
+            "version": trained_pipeline.feature_extractor.version, "rebuilt": 13, "removed": 12,
+        }
+        stored = crud.get_bug_features(db_session, [sample_bugs[0].id], trained_pipeline.feature_extractor.version)
+        assert sample_bugs[0].id in stored
+
+    def test_classify_compiled_inference(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        expected = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        labels = [b.ml_classification for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id)]
+        monkeypatch.setattr(config.ml, "compiled_inference", True)
+        result = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        assert result["classified"] == expected["classified"]
+        assert [b.ml_classification for b in crud.get_bugs_for_cycle(db_session, sample_cycle.id)] == labels
+
+    def test_classify_cascade_reports_stages(self, trained_pipeline, db_session, sample_cycle, sample_bugs, monkeypatch):
+        monkeypatch.setattr(config.ml, "cascade_inference", True)
+        result = trained_pipeline.classify_cycle(db_session, sample_cycle.id)
+        stats = result["cascade"]
+        assert stats["cheap_stage"] == result["classified"]
+        assert stats["short_circuited"] + stats["full_stage"] == result["classified"]
@@ -0,0 +1,48 @@
+"""Tests for the persistent prediction cache."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ml.prediction_cache import PredictionCache
+
+
+def _entry(label="valid", confidence=0.9):
+    return {
+        "classification": label, "confidence": confidence,
+        "probabilities": {label: confidence}, "explanation": f"because {label}",
+    }
+
+
+class TestPredictionCache:
+    def test_text_hash_is_stable(self):
+        assert PredictionCache.text_hash("login fails") == PredictionCache.text_hash("login fails")
+        assert PredictionCache.text_hash("login fails") != PredictionCache.text_hash("login works")
+        assert len(PredictionCache.text_hash("")) == 32
+
+    def test_store_then_lookup(self, db_session):
+        cache = PredictionCache(max_rows=100)
+        a, b = PredictionCache.text_hash("a"), PredictionCache.text_hash("b")
+        assert cache.lookup(db_session, [a, b], "m1") == {}
+        assert cache.store(db_session, "m1", {a: _entry()}) == 1
+        assert cache.lookup(db_session, [a, b], "m1") == {a: _entry()}
+        # Entries belong to the model that produced them
+        assert cache.lookup(db_session, [a], "m2") == {}
+
+        stats = cache.stats(db_session)
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 4)
+        assert stats["hit_rate"] == 0.2
+
+    def test_store_skips_existing(self, db_session):
+        cache = PredictionCache(max_rows=100)
+        a = PredictionCache.text_hash("a")
+        cache.store(db_session, "m1", {a: _entry()})
+        assert cache.store(db_session, "m1", {a: _entry("invalid")}) == 0
+        assert cache.lookup(db_session, [a], "m1")[a]["classification"] == "valid"
+
+    def test_trims_oldest_rows(self, db_session):
+        cache = PredictionCache(max_rows=3)
+        hashes = [PredictionCache.text_hash(str(i)) for i in range(5)]
+        for h in hashes:
+            cache.store(db_session, "m1", {h: _entry()})
+        assert cache.stats(db_session)["entries"] == 3
+        assert set(cache.lookup(db_session, hashes, "m1")) == set(hashes[2:])
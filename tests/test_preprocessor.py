@@ -4,7 +4,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.ml.preprocessor import (
-    preprocess_text, preprocess_bug, strip_html, strip_urls, strip_jira_keys,
+    preprocess_text, preprocess_bug, preprocess_bug_pair,
+    strip_html, strip_urls, strip_jira_keys, text_hash,
+    extract_stack_frames, stack_fingerprint,
 )
 
 
@@ -45,3 +47,48 @@ class TestPreprocessor:
         result = preprocess_text("I a am in it to go so")
         # All 1-2 char stop words should be removed
         assert result.strip() == "" or all(len(w) > 1 for w in result.split())
+
+    def test_preprocess_bug_pair_matches_separate_calls(self):
+        cases = [
+            ("Login fails", "Steps: enter <b>credentials</b> PROJ-12"),
+            ("Only a summary", ""),
+            ("", "Only a description"),
+            ("Tag opens <span", "and closes> later"),
+        ]
+        for summary, description in cases:
+            full, summary_only = preprocess_bug_pair(summary, description)
+            assert full == preprocess_bug(summary, description)
+            assert summary_only == preprocess_bug(summary)
+
+    def test_text_hash(self):
+        assert text_hash("login fails") == text_hash("login fails")
+        assert text_hash("login fails") != text_hash("login failed")
+        assert len(text_hash("")) == 32
+
+    def test_extract_java_frames(self):
+        trace = (
+            "java.lang.NullPointerException\n"
+            "\tat com.acme.pay.Checkout.submit(Checkout.java:42)\n"
+            "\tat com.acme.pay.Checkout$1.run(Checkout.java:10)\n"
+            "\tat java.base/java.lang.Thread.run(Thread.java:833)\n"
+        )
+        assert extract_stack_frames(trace) == [
+            "com.acme.pay.Checkout.submit", "com.acme.pay.Checkout.run", "java.lang.Thread.run",
+        ]
+        assert extract_stack_frames(trace, top_n=1) == ["com.acme.pay.Checkout.submit"]
+
+    def test_extract_python_frames_innermost_first(self):
+        trace = (
+            'Traceback (most recent call last):\n'
+            '  File "/srv/app/api/views.py", line 12, in post\n'
+            '  File "/srv/app/core/pay.py", line 99, in charge\n'
+            'ValueError: bad amount\n'
+        )
+        assert extract_stack_frames(trace) == ["pay.py:charge", "views.py:post"]
+
+    def test_stack_fingerprint_ignores_line_numbers(self):
+        first = "at com.acme.A.run(A.java:10)\nat com.acme.B.call(B.java:20)"
+        second = "Crash again: at com.acme.A.run(A.java:11) at com.acme.B.call(B.java:25)"
+        assert stack_fingerprint(first) == stack_fingerprint(second)
+        assert stack_fingerprint("at com.acme.A.run(A.java:10)") is None
+        assert stack_fingerprint("No trace here") is None
@@ -0,0 +1,53 @@
+"""Tests for the content-addressed model registry."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.ml.registry import ModelRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(root=tmp_path / "registry")
+
+
+def _write(path: Path, content: bytes) -> Path:
+    path.write_bytes(content)
+    return path
+
+
+class TestModelRegistry:
+    def test_commit_stores_files_under_their_names(self, registry, tmp_path):
+        staged = _write(tmp_path / "tfidf.staging.joblib", b"vectorizer")
+        digest = registry.commit({"tfidf.joblib": staged})
+        assert (registry.path(digest) / "tfidf.joblib").read_bytes() == b"vectorizer"
+
+    def test_identical_content_is_stored_once(self, registry, tmp_path):
+        first = registry.commit({"a.joblib": _write(tmp_path / "x", b"same")})
+        second = registry.commit({"a.joblib": _write(tmp_path / "y", b"same")})
+        other = registry.commit({"a.joblib": _write(tmp_path / "z", b"changed")})
+        assert first == second != other
+        assert len(list((registry.root / "objects").iterdir())) == 2
+
+    def test_activate_replaces_targets(self, registry, tmp_path):
+        live = _write(tmp_path / "classifier.joblib", b"old")
+        digest = registry.commit({"classifier.joblib": _write(tmp_path / "new", b"new")})
+        live.write_bytes(b"newer")
+        registry.activate(digest, [live])
+        assert live.read_bytes() == b"new"
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_activated_file_survives_later_replacement(self, registry, tmp_path):
+        live = tmp_path / "classifier.joblib"
+        digest = registry.commit({"classifier.joblib": _write(tmp_path / "new", b"trained")})
+        registry.activate(digest, [live])
+        # Writers replace the live file rather than rewriting it
+        _write(tmp_path / "update", b"updated").replace(live)
+        assert (registry.path(digest) / "classifier.joblib").read_bytes() == b"trained"
+
+    def test_activate_missing_file(self, registry, tmp_path):
+        digest = registry.commit({"tfidf.joblib": _write(tmp_path / "x", b"v")})
+        with pytest.raises(FileNotFoundError):
+            registry.activate(digest, [tmp_path / "classifier.joblib"])
@@ -0,0 +1,80 @@
+"""Tests for shadow scoring of candidate models."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+
+from src.db import crud
+from src.ml.classifier import BugClassifier
+from src.ml.feature_extractor import FeatureExtractor
+from src.ml.model_cache import ModelSet
+from src.ml.shadow import ShadowScorer, compare_predictions
+
+
+TEXTS = [
+    "login fails valid credentials", "payment timeout seconds", "export empty csv",
+    "search returns nothing", "upload fails silently", "charts not rendering",
+    "button color darker", "font size small", "would be nice shortcuts",
+    "spinner not centered", "looks different mockup", "slow old laptop",
+]
+LABELS = np.array(["valid"] * 6 + ["invalid"] * 6)
+
+
+@pytest.fixture
+def candidate(tmp_path):
+    feature_extractor = FeatureExtractor(model_path=tmp_path / "tfidf.joblib")
+    classifier = BugClassifier(model_path=tmp_path / "classifier.joblib")
+    classifier.fit(feature_extractor.fit_transform(TEXTS), LABELS)
+    return ModelSet(feature_extractor, classifier)
+
+
+class TestComparePredictions:
+    def test_agreement_and_shift(self):
+        active = [{"classification": "valid", "confidence": 0.6}, {"classification": "invalid", "confidence": 0.8}]
+        candidate = [{"classification": "valid", "confidence": 0.9}, {"classification": "valid", "confidence": 0.7}]
+        result = compare_predictions(active, candidate)
+        assert result["rows"] == 2
+        assert result["agreement_rate"] == 0.5
+        assert result["confidence_shift"] == pytest.approx(0.1)
+
+    def test_empty(self):
+        assert compare_predictions([], [])["agreement_rate"] is None
+
+
+class TestShadowScorer:
+    def test_reuses_matching_features(self, candidate, db_session, sample_cycle):
+        X = candidate.feature_extractor.transform(TEXTS[:4])
+        active, _ = candidate.predict(X)
+        score = ShadowScorer().score(
+            db_session, candidate, "v2", sample_cycle.id, X, TEXTS[:4],
+            active, "v1", 0.01, candidate.feature_extractor.version,
+        )
+        assert score.reused_features is True
+        assert score.agreement_rate == 1.0
+        assert score.confidence_shift == 0.0
+        assert score.rows == 4
+
+    def test_transforms_texts_for_other_feature_space(self, candidate, db_session, sample_cycle):
+        X = candidate.feature_extractor.transform(TEXTS[:4])
+        active, _ = candidate.predict(X)
+        score = ShadowScorer().score(
+            db_session, candidate, "v2", sample_cycle.id, None, TEXTS[:4],
+            active, "v1", 0.01, "another-version",
+        )
+        assert score.reused_features is False
+        assert score.agreement_rate == 1.0
+
+    def test_submit_records_in_background(self, candidate, db_session, sample_cycle):
+        from sqlalchemy.orm import sessionmaker
+
+        X = candidate.feature_extractor.transform(TEXTS)
+        active, _ = candidate.predict(X)
+        scorer = ShadowScorer()
+        scorer.submit(
+            sessionmaker(bind=db_session.get_bind()), candidate, "v2", sample_cycle.id,
+            X, TEXTS, active, "v1", 0.01, candidate.feature_extractor.version,
+        )
+        scorer.drain()
+        assert crud.get_shadow_summary(db_session, "v2")["rows"] == len(TEXTS)
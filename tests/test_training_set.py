@@ -0,0 +1,70 @@
+"""Tests for the bounded training-set manager."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from src.ml.training_set import MIN_PER_CLASS, TrainingSetManager, review_ages
+
+
+LABELS = np.array(["valid"] * 800 + ["invalid"] * 180 + ["duplicate"] * 20)
+# Row i was reviewed (999 - i) days ago, so later rows are newer
+AGES = np.arange(len(LABELS))[::-1].astype(float)
+
+
+class TestTrainingSetManager:
+    def test_no_cap_keeps_everything(self):
+        chosen, stats = TrainingSetManager(cap=0).select(LABELS, AGES)
+        assert len(chosen) == len(LABELS)
+        assert stats["selected"] == stats["available"] == len(LABELS)
+
+    def test_cap_is_stratified(self):
+        manager = TrainingSetManager(cap=100, recent_days=-1, half_life_days=100)
+        chosen, stats = manager.select(LABELS, AGES)
+        assert stats["selected"] == 100
+        counts = dict(zip(*np.unique(LABELS[chosen], return_counts=True)))
+        # Proportional split after every class gets its floor
+        assert counts == {"valid": 74, "invalid": 20, "duplicate": 6}
+        assert min(counts.values()) >= MIN_PER_CLASS
+
+    def test_recent_reviews_always_kept(self):
+        manager = TrainingSetManager(cap=100, recent_days=30, half_life_days=100)
+        chosen, stats = manager.select(LABELS, AGES)
+        recent = np.flatnonzero(AGES <= 30)
+        assert set(recent) <= set(chosen)
+        assert stats["recent"] == len(recent)
+        assert stats["selected"] == 100
+
+    def test_recent_confirmations_not_forced(self):
+        manager = TrainingSetManager(cap=100, recent_days=30, half_life_days=100)
+        overrides = np.zeros(len(LABELS), dtype=bool)
+        overrides[-5:] = True
+        chosen, stats = manager.select(LABELS, AGES, overrides=overrides)
+        assert stats["recent"] == 5
+        assert set(np.flatnonzero(overrides)) <= set(chosen)
+        assert stats["selected"] == 100
+
+    def test_recent_overrides_bounded_by_cap(self):
+        manager = TrainingSetManager(cap=100, recent_days=500, half_life_days=100)
+        chosen, stats = manager.select(LABELS, AGES, overrides=np.ones(len(LABELS), dtype=bool))
+        assert stats["recent"] == 100
+        # The newest overrides win, topped up only to each class's floor
+        assert set(np.flatnonzero(AGES < 100)) <= set(chosen)
+        assert stats["selected"] <= 100 + 3 * MIN_PER_CLASS
+
+    def test_sample_favours_recent_reviews(self):
+        chosen, _ = TrainingSetManager(cap=200, recent_days=-1, half_life_days=50).select(LABELS, AGES)
+        assert AGES[chosen].mean() < AGES.mean() / 2
+
+    def test_sample_is_deterministic(self):
+        manager = TrainingSetManager(cap=100, recent_days=5, half_life_days=100)
+        assert np.array_equal(manager.select(LABELS, AGES)[0], manager.select(LABELS, AGES)[0])
+
+    def test_review_ages(self):
+        now = datetime(2025, 1, 10, tzinfo=timezone.utc)
+        ages = review_ages([now - timedelta(days=2), datetime(2025, 1, 9), None], now=now)
+        assert ages[:2] == pytest.approx([2.0, 1.0])
+        assert ages[2] == np.inf